@@ -0,0 +1,57 @@
+"""
+Local stand-in for the xrpscan assets API used by XRPClient.getXrpscanBalance.
+
+Every account holds the same configured balances from one issuer, optionally
+after a fixed delay to mimic the round trip to the real API.
+"""
+
+from asyncio import sleep
+
+from aiohttp import web
+
+
+class BalanceStub:
+    def __init__(
+        self,
+        balances: dict,
+        issuer: str,
+        host: str = "127.0.0.1",
+        port: int = 8089,
+        responseDelay: float = 0.0,
+    ) -> None:
+        self.balances = balances
+        self.issuer = issuer
+        self.host = host
+        self.port = port
+        self.responseDelay = responseDelay
+
+        self.requests = 0
+        self.runner = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/api/v1"
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/api/v1/account/{xrpId}/assets", self._assets)
+
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    async def _assets(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.responseDelay:
+            await sleep(self.responseDelay)
+
+        return web.json_response(
+            [
+                {"currency": currency, "counterparty": self.issuer, "value": str(value)}
+                for currency, value in self.balances.items()
+            ]
+        )
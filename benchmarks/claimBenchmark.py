@@ -0,0 +1,213 @@
+"""
+Offline end-to-end claim benchmark.
+
+Starts a fake XRPL websocket server, a stubbed balance API and a seeded SQLite
+XparrotDB, then fires N concurrent fake interactions at the slash command
+handlers in main.py and reports latency percentiles and claims per second.
+
+    python benchmarks/claimBenchmark.py --claims 500 --ledger-close 3.5
+"""
+
+from argparse import ArgumentParser
+from asyncio import gather, run
+from os import chdir, path
+from tempfile import mkdtemp
+from time import perf_counter
+import sys
+
+BENCHMARK_DIR = path.dirname(path.abspath(__file__))
+SOURCE_DIR = path.join(path.dirname(BENCHMARK_DIR), "src")
+
+XRAIN = "585241494E000000000000000000000000000000"
+XRAIN_LP = "03B1E0C5C9A2BA4B4A4D2B6D6F6C1D4C6F7A8B9C"
+
+CONFIG_TEMPLATE = """
+[BOT]
+token = benchmark
+verbose = False
+command_cooldown = 1
+
+[XRPL]
+testnet_link = {xrplUrl}
+mainnet_link = {xrplUrl}
+test_mode = False
+verbose = False
+seed = {seed}
+coin_issuer = {issuer}
+lp_issuer = {issuer}
+balance_source = {balanceSource}
+balance_api = {balanceUrl}
+
+[COINS]
+XRAIN = {xrain}
+XRAIN_LP = {xrainLp}
+min_nft_count = 1
+min_xrain_count = 1
+min_lp_count = 1
+daily_multiplier = 0.01
+xrain_multiplier = 0.01
+xrain_buy_link = https://example.invalid
+
+[DATABASE]
+db_server = localhost
+db_name = benchmark
+db_username = benchmark
+db_password =
+verbose = False
+
+[LOGGING]
+level = WARNING
+file = {workDir}/benchmark.log
+"""
+
+
+class FakeAuthor:
+    def __init__(self, userId: int) -> None:
+        self.id = userId
+        self.display_name = f"bench_user_{userId}"
+
+
+class FakeInteractionContext:
+    # The subset of InteractionContext the command handlers touch
+    def __init__(self, commandName: str, userId: int, xrpId: str) -> None:
+        self._command_name = commandName
+        self.author_id = userId
+        self.channel_id = 0
+        self.author = FakeAuthor(userId)
+        self.args = [xrpId]
+        self.responses = []
+
+    async def defer(self, *args, **kwargs) -> None:
+        pass
+
+    async def send(self, *args, **kwargs) -> None:
+        self.responses.append((args, kwargs))
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def timedClaim(handler, ctx) -> float:
+    start = perf_counter()
+    await handler(ctx)
+    return perf_counter() - start
+
+
+async def runBenchmark(args) -> None:
+    from xrpl.wallet import Wallet
+
+    from fakeXrplServer import FakeXrplServer
+    from balanceStub import BalanceStub
+
+    issuer = Wallet.create().classic_address
+    xrplServer = FakeXrplServer(
+        port=args.xrpl_port,
+        ledgerClose=args.ledger_close,
+        responseDelay=args.xrpl_delay,
+        trustlines={XRAIN: "1000000", XRAIN_LP: "1000"},
+        issuer=issuer,
+    )
+    balanceStub = BalanceStub(
+        {XRAIN: 1000, XRAIN_LP: 1000},
+        issuer,
+        port=args.balance_port,
+        responseDelay=args.balance_delay,
+    )
+    await xrplServer.start()
+    await balanceStub.start()
+
+    # main.py reads config.ini from the working directory on import
+    workDir = mkdtemp(prefix="xrain-bench-")
+    with open(path.join(workDir, "config.ini"), "w") as configFile:
+        configFile.write(
+            CONFIG_TEMPLATE.format(
+                xrplUrl=xrplServer.url,
+                balanceUrl=balanceStub.url,
+                balanceSource=args.balance_source,
+                seed=Wallet.create().seed,
+                issuer=issuer,
+                xrain=XRAIN,
+                xrainLp=XRAIN_LP,
+                workDir=workDir,
+            )
+        )
+    chdir(workDir)
+
+    import main
+    from fakeDatabase import createBenchmarkDB
+    from utils.metrics import metrics
+
+    dbInstance, xrpIds = await createBenchmarkDB(
+        path.join(workDir, "benchmark.sqlite3"),
+        holders=max(args.claims, 1),
+        nftsPerHolder=args.nfts_per_holder,
+    )
+    main.dbInstance = dbInstance
+
+    await main.xrplInstance.registerSeed(main.xrplConfig["seed"])
+    await main.xrplInstance.start()
+    await dbInstance.refreshClaimQuotes()
+
+    commands = {
+        "bonus-xrain": main.bonusXrain.callback,
+        "daily-xrain-traits": main.biweeklyXrainTraits.callback,
+        "xrain-amm-claim": main.xrain_amm_claim.callback,
+    }
+
+    print(
+        f"{args.claims} claims per command, ledger close {args.ledger_close}s, "
+        f"balance source {args.balance_source}"
+    )
+    print(f"{'command':<20} {'p50':>8} {'p99':>8} {'max':>8} {'claims/s':>9}")
+
+    for commandName, handler in commands.items():
+        contexts = [
+            FakeInteractionContext(commandName, userId, xrpIds[userId])
+            for userId in range(args.claims)
+        ]
+
+        start = perf_counter()
+        latencies = await gather(*(timedClaim(handler, ctx) for ctx in contexts))
+        elapsed = perf_counter() - start
+
+        print(
+            f"{commandName:<20} {percentile(latencies, 0.5):>7.3f}s "
+            f"{percentile(latencies, 0.99):>7.3f}s {max(latencies):>7.3f}s "
+            f"{len(latencies) / elapsed:>9.1f}"
+        )
+
+    print()
+    print(metrics.summary())
+    print()
+    print(
+        f"XRPL submits: {xrplServer.submitted}, "
+        f"balance API requests: {balanceStub.requests}"
+    )
+
+    await main.xrplInstance.close()
+    await dbInstance.dbEngine.dispose()
+    await balanceStub.stop()
+    await xrplServer.stop()
+
+
+def parseArgs():
+    parser = ArgumentParser(description="Offline claim throughput benchmark")
+    parser.add_argument("--claims", type=int, default=200)
+    parser.add_argument("--ledger-close", type=float, default=3.5)
+    parser.add_argument("--xrpl-delay", type=float, default=0.0)
+    parser.add_argument("--balance-delay", type=float, default=0.05)
+    parser.add_argument("--balance-source", default="xrpscan")
+    parser.add_argument("--nfts-per-holder", type=int, default=20)
+    parser.add_argument("--xrpl-port", type=int, default=6006)
+    parser.add_argument("--balance-port", type=int, default=8089)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    sys.path[:0] = [SOURCE_DIR, BENCHMARK_DIR]
+    run(runBenchmark(parseArgs()))
@@ -0,0 +1,109 @@
+"""
+SQLite (aiosqlite) backed XparrotDB seeded with synthetic holders.
+
+The MySQL functions the queries rely on (UTC_TIMESTAMP, SUBDATE) are
+registered on every SQLite connection so XparrotDB runs unmodified.
+"""
+
+from datetime import datetime, timedelta, timezone
+from random import Random
+
+from sqlalchemy import event, insert
+from xrpl.core.addresscodec import encode_classic_address
+
+from database.db import XparrotDB
+from database.models.rewardstable import RewardsTable
+from database.models.nftTraitList import NFTTraitList
+from database.models.claimQuotes import ClaimQuotes
+
+
+SQLITE_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+GROUPS = ("XParrots", "XChameleons", "3D XParrots", "XRPL Moonbirds")
+TAXONS = (0, 1, 2, 3)
+
+
+def utcTimestamp() -> str:
+    return datetime.now(timezone.utc).strftime(SQLITE_FORMAT)
+
+
+def subdate(value: str, days: int) -> str:
+    value = datetime.fromisoformat(value.replace("T", " "))
+    return (value - timedelta(days=days)).strftime(SQLITE_FORMAT)
+
+
+def registerFunctions(dbapiConnection, connectionRecord) -> None:
+    dbapiConnection.create_function("utc_timestamp", 0, utcTimestamp)
+    dbapiConnection.create_function("subdate", 2, subdate)
+
+
+async def createBenchmarkDB(
+    path: str,
+    holders: int = 1000,
+    nftsPerHolder: int = 20,
+    quotesPerTaxon: int = 25,
+    seed: int = 0,
+) -> tuple[XparrotDB, list[str]]:
+    random = Random(seed)
+
+    dbInstance = XparrotDB(
+        host=None,
+        dbName=None,
+        username=None,
+        password=None,
+        verbose=False,
+        sqlLink=f"sqlite+aiosqlite:///{path}",
+    )
+    event.listen(dbInstance.dbEngine.sync_engine, "connect", registerFunctions)
+
+    async with dbInstance.dbEngine.begin() as connection:
+        for model in (RewardsTable, NFTTraitList, ClaimQuotes):
+            await connection.run_sync(model.metadata.drop_all)
+            await connection.run_sync(model.metadata.create_all)
+
+    xrpIds = [encode_classic_address(random.randbytes(20)) for _ in range(holders)]
+
+    rewards = []
+    nfts = []
+    for xrpId in xrpIds:
+        nftCount = max(1, int(random.expovariate(1 / nftsPerHolder)))
+        rewards.append(
+            {
+                "xrpId": xrpId,
+                "penaltyTraits3DRewards": nftCount,
+                "penaltyReputationRewards": random.randint(10, 500),
+                "reputationFlag": 0,
+            }
+        )
+        for index in range(nftCount):
+            group = random.choice(GROUPS)
+            nfts.append(
+                {
+                    "uri": f"{xrpId}-{index}",
+                    "tokenId": f"{random.getrandbits(256):064X}",
+                    "taxonId": random.choice(TAXONS),
+                    "xrpId": xrpId,
+                    "nftlink": f"ipfs://bafybench{random.getrandbits(64):016x}/{index}.png",
+                    "nftGroupName": group,
+                    "totalXRAIN": random.randint(1, 100),
+                }
+            )
+
+    quotes = [
+        {
+            "quoteId": taxonId * quotesPerTaxon + index,
+            "taxonId": taxonId,
+            "nftGroupName": GROUPS[taxonId % len(GROUPS)],
+            "description": f"Benchmark quote {index} for taxon {taxonId}",
+        }
+        for taxonId in TAXONS
+        for index in range(quotesPerTaxon)
+    ]
+
+    async with dbInstance.asyncSessionMaker() as session:
+        async with session.begin():
+            await session.execute(insert(RewardsTable), rewards)
+            await session.execute(insert(NFTTraitList), nfts)
+            await session.execute(insert(ClaimQuotes), quotes)
+
+    return dbInstance, xrpIds
@@ -0,0 +1,249 @@
+"""
+Local stand-in for a rippled websocket endpoint.
+
+Answers the requests the bot makes while paying a claim (server_info, fee,
+ledger, account_info, account_lines, submit, tx, ping, subscribe) and closes
+a ledger every `ledgerClose` seconds, validating whatever was applied since
+the last close and announcing it on the ledger stream. Sequences are
+enforced per account so tefPAST_SEQ and terPRE_SEQ behave like mainnet.
+"""
+
+from asyncio import create_task, sleep, Task
+from hashlib import sha512
+import json
+
+import websockets
+from xrpl.core.binarycodec import decode
+
+
+class FakeXrplServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 6006,
+        ledgerClose: float = 3.5,
+        responseDelay: float = 0.0,
+        trustlines: dict | None = None,
+        issuer: str = "rIssuer",
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.ledgerClose = ledgerClose
+        self.responseDelay = responseDelay
+
+        # currency -> balance string returned by account_lines for every account
+        self.trustlines = trustlines or {}
+        self.issuer = issuer
+
+        self.ledgerIndex = 1000
+        self.sequences: dict[str, int] = {}
+
+        # hash -> {"result", "ledger"}, ledger is None until the next close
+        self.transactions: dict[str, dict] = {}
+        self.held: dict[str, dict[int, tuple]] = {}
+
+        # Websockets subscribed to the ledger stream
+        self.subscribers = set()
+
+        self.submitted = 0
+        self.server = None
+        self.closeTask: Task | None = None
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        self.server = await websockets.serve(self._handle, self.host, self.port)
+        self.closeTask = create_task(self._closeLedgers())
+
+    async def stop(self) -> None:
+        if self.closeTask is not None:
+            self.closeTask.cancel()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _closeLedgers(self) -> None:
+        while True:
+            await sleep(self.ledgerClose)
+            self.ledgerIndex += 1
+
+            for transaction in self.transactions.values():
+                if transaction["ledger"] is None:
+                    transaction["ledger"] = self.ledgerIndex
+
+            # Held transactions past their LastLedgerSequence are dropped
+            for account, held in self.held.items():
+                for sequence, (txHash, lastLedger) in list(held.items()):
+                    if lastLedger is not None and lastLedger < self.ledgerIndex:
+                        del held[sequence]
+
+            message = json.dumps({"type": "ledgerClosed", **self._ledgerStream()})
+            for websocket in list(self.subscribers):
+                try:
+                    await websocket.send(message)
+                except websockets.ConnectionClosed:
+                    self.subscribers.discard(websocket)
+
+    def _ledgerStream(self) -> dict:
+        return {
+            "fee_base": 10,
+            "ledger_index": self.ledgerIndex,
+            "ledger_hash": f"{self.ledgerIndex:064X}",
+            "reserve_base": 10000000,
+            "reserve_inc": 2000000,
+        }
+
+    async def _handle(self, websocket, path=None) -> None:
+        try:
+            await self._serve(websocket)
+        finally:
+            self.subscribers.discard(websocket)
+
+    async def _serve(self, websocket) -> None:
+        async for message in websocket:
+            request = json.loads(message)
+            if self.responseDelay:
+                await sleep(self.responseDelay)
+
+            try:
+                if request["command"] == "subscribe":
+                    self.subscribers.add(websocket)
+                    result = {
+                        **self._ledgerStream(),
+                        "load_base": 256,
+                        "load_factor": 256,
+                    }
+                else:
+                    result = self._dispatch(request)
+                response = {"result": result, "status": "success"}
+            except LookupError as e:
+                response = {"error": str(e), "status": "error", "request": request}
+
+            response["type"] = "response"
+            response["id"] = request.get("id")
+            await websocket.send(json.dumps(response))
+
+    def _dispatch(self, request: dict) -> dict:
+        command = request["command"]
+
+        if command == "ping":
+            return {}
+
+        if command == "server_info":
+            return {
+                "info": {
+                    "build_version": "2.2.0",
+                    "network_id": 1,
+                    "load_factor": 1,
+                    "validated_ledger": {
+                        "seq": self.ledgerIndex,
+                        "base_fee_xrp": 0.00001,
+                        "reserve_base_xrp": 10,
+                        "reserve_inc_xrp": 2,
+                    },
+                }
+            }
+
+        if command == "fee":
+            return {
+                "current_ledger_size": "10",
+                "current_queue_size": "0",
+                "drops": {
+                    "base_fee": "10",
+                    "median_fee": "5000",
+                    "minimum_fee": "10",
+                    "open_ledger_fee": "10",
+                },
+                "expected_ledger_size": "1000",
+                "ledger_current_index": self.ledgerIndex + 1,
+                "max_queue_size": "2000",
+            }
+
+        if command == "ledger":
+            return {
+                "ledger_index": self.ledgerIndex,
+                "ledger_hash": f"{self.ledgerIndex:064X}",
+                "validated": True,
+            }
+
+        if command == "account_info":
+            account = request["account"]
+            return {
+                "account_data": {
+                    "Account": account,
+                    "Balance": "100000000000",
+                    "Flags": 0,
+                    "OwnerCount": 0,
+                    "Sequence": self.sequences.setdefault(account, 1),
+                },
+                "ledger_current_index": self.ledgerIndex + 1,
+                "validated": False,
+            }
+
+        if command == "account_lines":
+            return {
+                "account": request["account"],
+                "lines": [
+                    {"account": self.issuer, "currency": currency, "balance": balance}
+                    for currency, balance in self.trustlines.items()
+                ],
+            }
+
+        if command == "submit":
+            return self._submit(request["tx_blob"])
+
+        if command == "tx":
+            transaction = self.transactions.get(request["transaction"])
+            if transaction is None:
+                raise LookupError("txnNotFound")
+            validated = transaction["ledger"] is not None
+            return {
+                "hash": request["transaction"],
+                "validated": validated,
+                "ledger_index": transaction["ledger"],
+                "meta": {"TransactionResult": transaction["result"]},
+            }
+
+        raise LookupError("unknownCmd")
+
+    def _submit(self, txBlob: str) -> dict:
+        self.submitted += 1
+        txJson = decode(txBlob)
+        txHash = sha512(bytes.fromhex("54584E00" + txBlob)).hexdigest()[:64].upper()
+
+        account = txJson["Account"]
+        sequence = txJson["Sequence"]
+        expected = self.sequences.setdefault(account, 1)
+
+        if txHash in self.transactions:
+            engineResult = "tefALREADY"
+        elif sequence < expected:
+            engineResult = "tefPAST_SEQ"
+        elif sequence > expected:
+            # Held until the gap below it is filled, like rippled's local queue
+            held = self.held.setdefault(account, {})
+            held[sequence] = (txHash, txJson.get("LastLedgerSequence"))
+            engineResult = "terPRE_SEQ"
+        else:
+            self._apply(account, txHash)
+            engineResult = "tesSUCCESS"
+
+        return {
+            "engine_result": engineResult,
+            "tx_blob": txBlob,
+            "tx_json": {**txJson, "hash": txHash},
+            "accepted": engineResult == "tesSUCCESS",
+        }
+
+    def _apply(self, account: str, txHash: str) -> None:
+        self.transactions[txHash] = {"result": "tesSUCCESS", "ledger": None}
+        self.sequences[account] += 1
+
+        # Anything held on the next sequence can now apply as well
+        held = self.held.get(account, {})
+        while self.sequences[account] in held:
+            heldHash, x = held.pop(self.sequences[account])
+            self.transactions[heldHash] = {"result": "tesSUCCESS", "ledger": None}
+            self.sequences[account] += 1
@@ -0,0 +1,256 @@
+"""
+Bulk distribution of the traits and biweekly rewards.
+
+Streams every holder whose reward can be paid now, reserves them in batches
+and hands the payouts to the settlement workers through a durable outbox.
+Progress is checkpointed after every batch, so running the same command again
+resumes an interrupted run. Payouts are signed by the bulk_seeds wallets, never
+by the hot wallets of a running bot.
+
+    python bulkPayout.py traits
+    python bulkPayout.py biweekly --workers 100 --checkpoint biweekly.json
+"""
+
+from argparse import ArgumentParser
+from asyncio import run, sleep
+from datetime import datetime
+from os import path, replace
+import json
+
+from database.db import XparrotDB
+from utils.xrplCommands import XRPClient
+from utils.config import xrplConfig, dbConfig, coinsConfig
+from utils.logging import loggingInstance
+from utils.payoutOutbox import PayoutOutbox, SettlementWorkers
+
+
+BIWEEKLY_MULTIPLIER = coinsConfig.getfloat("biweekly_multiplier", fallback=1.0)
+
+# Holders below it are not paid the biweekly reward. /daily-xrain-traits has
+# no minimum, it only needs an NFT to show
+MIN_NFT_COUNT = coinsConfig.getint("min_nft_count")
+
+ELIGIBILITY = {
+    "traits": {"minNftCount": None, "withNFT": True},
+    "biweekly": {"minNftCount": MIN_NFT_COUNT, "withNFT": True},
+}
+
+MEMOS = {
+    "traits": "XRPLRainforest Bonus Biweekly Trait Rewards",
+    "biweekly": "XRPLRainforest Bonus Biweekly Reputation Rewards",
+}
+
+
+def precision(value, precision=6):
+    return round(float(value), precision)
+
+
+def rewardAmount(rewardType, amount):
+    # Traits as /daily-xrain-traits pays them. The biweekly reward has no slash
+    # command, its amount is the holder's reputation reward times
+    # biweekly_multiplier
+    if rewardType == "traits":
+        return max(precision(amount / 30), 0.01)
+    return precision(amount * BIWEEKLY_MULTIPLIER)
+
+
+def seedList(value):
+    return [seed.strip() for seed in value.split(",") if seed.strip()]
+
+
+def bulkSeeds():
+    # Wallets only this command signs with. The bot's hot wallets have their
+    # own sequence allocator in the running bot, signing from both would
+    # burn each other's sequences
+    seeds = seedList(xrplConfig.get("bulk_seeds", fallback=""))
+    if not seeds:
+        raise SystemExit("bulk_seeds must list wallets the bot does not sign with")
+
+    botSeeds = seedList(xrplConfig.get("seeds", fallback=""))
+    botSeeds.append(xrplConfig.get("seed", fallback=""))
+    if set(seeds) & set(botSeeds):
+        raise SystemExit("bulk_seeds must not include the bot's hot wallet seeds")
+    return seeds
+
+
+def payoutKey(rewardType, xrpId, lastClaim):
+    # Same key as main.payClaim, a holder is paid once per reward period
+    return f"{rewardType}:{xrpId}:{lastClaim}"
+
+
+def loadCheckpoint(checkpointPath, rewardType):
+    if path.exists(checkpointPath):
+        with open(checkpointPath) as checkpointFile:
+            checkpoint = json.load(checkpointFile)
+        if checkpoint["rewardType"] != rewardType:
+            raise ValueError(
+                f"{checkpointPath} belongs to a {checkpoint['rewardType']} run"
+            )
+        return checkpoint
+
+    return {
+        "rewardType": rewardType,
+        "lastXrpId": None,
+        "reserving": [],
+        "review": [],
+        "enqueued": 0,
+        "skipped": 0,
+        "total": 0.0,
+    }
+
+
+def saveCheckpoint(checkpointPath, checkpoint):
+    # Written next to the target and swapped in, a crash never leaves half a file
+    checkpoint["updatedAt"] = datetime.now().isoformat()
+    temporaryPath = f"{checkpointPath}.tmp"
+    with open(temporaryPath, "w") as checkpointFile:
+        json.dump(checkpoint, checkpointFile, indent=2)
+    replace(temporaryPath, checkpointPath)
+
+
+async def reviewInterrupted(checkpoint, outbox):
+    # A batch reserved but not enqueued when the last run died. Whether those
+    # holders were reserved by us or claimed in between cannot be told apart,
+    # so they are listed for a manual check instead of being paid blindly
+    rewardType = checkpoint["rewardType"]
+    for xrpId, lastClaim in checkpoint["reserving"]:
+        if not await outbox.contains(payoutKey(rewardType, xrpId, lastClaim)):
+            checkpoint["review"].append(xrpId)
+
+    if checkpoint["review"]:
+        loggingInstance.warning(
+            f"{len(checkpoint['review'])} holders need a manual check, see the checkpoint"
+        )
+    checkpoint["reserving"] = []
+
+
+async def bulkPayout(args):
+    rewardType = args.reward
+    checkpoint = loadCheckpoint(args.checkpoint, rewardType)
+
+    dbInstance = XparrotDB(
+        host=dbConfig["db_server"],
+        dbName=dbConfig["db_name"],
+        username=dbConfig["db_username"],
+        password=dbConfig["db_password"],
+        verbose=False,
+    )
+
+    if args.dry_run:
+        holders, total = 0, 0.0
+        async for batch in dbInstance.streamClaimable(
+            rewardType,
+            checkpoint["lastXrpId"],
+            args.batch_size,
+            **ELIGIBILITY[rewardType],
+        ):
+            holders += len(batch)
+            total += sum(rewardAmount(rewardType, amount) for x, amount, y in batch)
+        print(f"{holders} holders eligible for {precision(total)} XRAIN")
+        await dbInstance.dbEngine.dispose()
+        return
+
+    xrplInstance = XRPClient(xrplConfig)
+    await xrplInstance.registerSeeds(bulkSeeds())
+    await xrplInstance.start()
+
+    outbox = PayoutOutbox(args.outbox)
+    await reviewInterrupted(checkpoint, outbox)
+    saveCheckpoint(args.checkpoint, checkpoint)
+
+    async def onSettled(payout, result):
+        if not result["result"]:
+            lastClaim = payout["lastClaim"]
+            await dbInstance.releaseClaim(
+                payout["xrpId"],
+                payout["rewardType"],
+                datetime.fromisoformat(lastClaim) if lastClaim else None,
+            )
+
+    # Payouts left pending or signed by an earlier run are settled first
+    settlementWorkers = SettlementWorkers(
+        outbox, xrplInstance, workers=args.workers, onSettled=onSettled
+    )
+    settlementWorkers.start()
+
+    async for batch in dbInstance.streamClaimable(
+        rewardType, checkpoint["lastXrpId"], args.batch_size, **ELIGIBILITY[rewardType]
+    ):
+        lastClaims = {xrpId: lastClaim for xrpId, x, lastClaim in batch}
+        amounts = {
+            xrpId: rewardAmount(rewardType, amount) for xrpId, amount, x in batch
+        }
+
+        checkpoint["reserving"] = [
+            [xrpId, str(lastClaim)] for xrpId, lastClaim in lastClaims.items()
+        ]
+        saveCheckpoint(args.checkpoint, checkpoint)
+
+        reserved = await dbInstance.reserveClaims(list(lastClaims), rewardType)
+        for xrpId in reserved:
+            lastClaim = lastClaims[xrpId]
+            await outbox.enqueue(
+                {
+                    "payoutKey": payoutKey(rewardType, xrpId, lastClaim),
+                    "xrpId": xrpId,
+                    "rewardType": rewardType,
+                    "amount": amounts[xrpId],
+                    "coinHex": coinsConfig["XRAIN"],
+                    "memos": MEMOS[rewardType],
+                    "lastClaim": lastClaim.isoformat() if lastClaim else None,
+                }
+            )
+        settlementWorkers.notify()
+
+        checkpoint["lastXrpId"] = batch[-1][0]
+        checkpoint["reserving"] = []
+        checkpoint["enqueued"] += len(reserved)
+        checkpoint["skipped"] += len(batch) - len(reserved)
+        checkpoint["total"] = precision(
+            checkpoint["total"] + sum(amounts[xrpId] for xrpId in reserved)
+        )
+        saveCheckpoint(args.checkpoint, checkpoint)
+        loggingInstance.info(
+            f"Bulk {rewardType}: {checkpoint['enqueued']} enqueued up to {checkpoint['lastXrpId']}"
+        )
+
+        # Keep the outbox from running far ahead of the workers
+        while await openPayouts(outbox) > args.backlog:
+            await sleep(0.5)
+
+    while await openPayouts(outbox):
+        await sleep(1)
+
+    counts = await outbox.counts()
+    print(
+        f"Bulk {rewardType} done: {counts.get('settled', 0)} settled, "
+        f"{counts.get('failed', 0)} failed, {checkpoint['total']} XRAIN enqueued"
+    )
+
+    await settlementWorkers.close()
+    await outbox.close()
+    await xrplInstance.close()
+    await dbInstance.dbEngine.dispose()
+
+
+async def openPayouts(outbox):
+    counts = await outbox.counts()
+    return counts.get("pending", 0) + counts.get("signed", 0)
+
+
+def parseArgs():
+    parser = ArgumentParser(description="Pay a reward to every eligible holder")
+    parser.add_argument("reward", choices=sorted(MEMOS))
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--outbox", default="bulk-payouts.sqlite3")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=50)
+    parser.add_argument("--backlog", type=int, default=2000)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    args.checkpoint = args.checkpoint or f"bulk-{args.reward}.json"
+    return args
+
+
+if __name__ == "__main__":
+    run(bulkPayout(parseArgs()))
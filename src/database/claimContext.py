@@ -0,0 +1,52 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from database.models.rewardstable import RewardsTable
+
+
+# Flag column and clock used by each reward type, the bonus keeps the DB local
+# time while the other rewards are tracked in UTC
+REWARD_TYPES = {
+    "bonus": (RewardsTable.dailyBonusFlagDate, "now"),
+    "traits": (RewardsTable.dailyTraitFlagDate, "utc"),
+    "biweekly": (RewardsTable.dailyRepFlagDate, "utc"),
+    "amm": (RewardsTable.ammFlagDate, "utc"),
+}
+
+# Amount column of the rewards that can be distributed in bulk
+BULK_REWARD_AMOUNTS = {
+    "traits": RewardsTable.penaltyTraits3DRewards,
+    "biweekly": RewardsTable.penaltyReputationRewards,
+}
+
+
+@dataclass
+class ClaimContext:
+    xrpId: str
+    rewardType: str
+
+    # Same structure returned by the get*Status methods
+    status: dict = field(
+        default_factory=lambda: {
+            "result": "",
+            "timeRemaining": {"hour": 0, "minute": 0, "second": 0},
+        }
+    )
+
+    lastClaim: datetime | None = None
+    dbTime: datetime | None = None
+
+    nftCount: int | None = None
+    traitsAmount: int | None = None
+    reputationAmount: int | None = None
+    reputationFlag: int | None = None
+
+    # {"nftLink", "tokenId", "taxonId", "amount"} of the NFT shown with the claim
+    nft: dict | None = None
+
+    # {"nftGroupName", "description"} of the quote shown with the claim
+    quote: dict | None = None
+
+    @property
+    def claimable(self) -> bool:
+        return self.status["result"] == "Claimable"
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone
+
+from pytz import timezone as tz
+
+from database.claimContext import REWARD_TYPES
+from database.dbClock import DBClock
+
+
+COOLDOWN = timedelta(days=1)
+
+# Flag dates MySQL hands back for a zeroed DATETIME
+ZERO_DATES = ("0000-00-00 00:00:00", "0000-00-00")
+
+
+class CooldownEngine:
+    # Evaluates claim cooldowns in-process against the DB clock. Every time is
+    # handled as naive UTC, flag dates kept in DB local time are shifted by the
+    # offset DBClock measured, so the bonus and the other rewards agree
+    def __init__(
+        self,
+        clock: DBClock,
+        redemptionZone: str = "US/Eastern",
+        redemptionHour: int = 19,
+    ) -> None:
+        self.clock = clock
+        self.redemptionZone = tz(redemptionZone)
+        self.redemptionHour = redemptionHour
+
+    def now(self) -> datetime:
+        # DB UTC when the clock has been read, this host's clock until then
+        if self.clock.readAt is None:
+            return datetime.now(timezone.utc).replace(tzinfo=None)
+        return self.clock.now("utc")
+
+    def lastRedemption(self, now: datetime | None = None) -> datetime:
+        # Most recent 19:00 ET at or before now
+        now = now or self.now()
+        current = now.replace(tzinfo=timezone.utc).astimezone(self.redemptionZone)
+        redemption = self._redemptionOn(current.date())
+        if current < redemption:
+            redemption = self._redemptionOn(current.date() - timedelta(days=1))
+
+        return redemption.astimezone(timezone.utc).replace(tzinfo=None)
+
+    def parse(self, lastClaim) -> datetime | None:
+        # None when the holder never claimed
+        if not lastClaim or lastClaim in ZERO_DATES:
+            return None
+        if isinstance(lastClaim, str):
+            return datetime.strptime(lastClaim, "%Y-%m-%d %H:%M:%S")
+        return lastClaim
+
+    def toUtc(self, rewardType: str, lastClaim) -> datetime | None:
+        lastClaim = self.parse(lastClaim)
+        if lastClaim is None:
+            return None
+        if lastClaim.tzinfo is not None:
+            return lastClaim.astimezone(timezone.utc).replace(tzinfo=None)
+        if REWARD_TYPES[rewardType][1] == "now":
+            return lastClaim - self.clock.localOffset()
+        return lastClaim
+
+    def nextClaim(self, rewardType: str, lastClaim) -> datetime | None:
+        # The bonus flag holds the claim time and the other flags the 19:00 ET
+        # redemption claimed for, either way a day on is what reserveClaim's
+        # UPDATE checks, so the answer here never disagrees with it
+        lastClaim = self.toUtc(rewardType, lastClaim)
+        if lastClaim is None:
+            return None
+        return lastClaim + COOLDOWN
+
+    def check(self, rewardType, lastClaim, funcResult, found=True, now=None) -> dict:
+        # Fills a claim status structure with the result and time remaining
+        if not found:
+            funcResult["result"] = "XrpIdNotFound"
+            return funcResult
+
+        nextClaim = self.nextClaim(rewardType, lastClaim)
+        now = now or self.now()
+        if nextClaim is None or nextClaim <= now:
+            funcResult["result"] = "Claimable"
+            return funcResult
+
+        timeDiff = nextClaim - now
+        funcResult["result"] = "NotReady"
+        funcResult["timeRemaining"]["hour"] = timeDiff.seconds // 3600 + (
+            timeDiff.days * 24
+        )
+        funcResult["timeRemaining"]["minute"] = (timeDiff.seconds // 60) % 60
+        funcResult["timeRemaining"]["second"] = timeDiff.seconds % 60
+        return funcResult
+
+    def _redemptionOn(self, date) -> datetime:
+        # localize rather than tzinfo=, which would pin pytz to the zone's LMT
+        return self.redemptionZone.localize(
+            datetime(date.year, date.month, date.day, self.redemptionHour)
+        )
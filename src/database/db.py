@@ -1,41 +1,67 @@
+from sqlalchemy import exists
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
-from sqlalchemy import update
 from database.models.rewardstable import RewardsTable
 from database.models.nftTraitList import NFTTraitList
-from database.models.claimQuotes import ClaimQuotes
-from sqlalchemy.sql import func
-from datetime import timedelta, datetime, timezone
+from database.claimContext import ClaimContext, REWARD_TYPES, BULK_REWARD_AMOUNTS
+from database.nftIndex import NFTIndex
+from database.nftLinks import LinkValidator
+from database.quoteCatalogue import ClaimQuoteCatalogue
+from database.eligibilitySnapshot import EligibilitySnapshot
+from database.dbClock import DBClock
+from database.cooldownEngine import CooldownEngine
+from database.dbPool import MonitoredQueuePool, validateIdle, warmConnections
+from database.statements import (
+    CLAIM_FLAG,
+    LOCK_CLAIMABLE,
+    RESERVE_CLAIM,
+    RESERVE_CLAIMS,
+    RESTORE_FLAG,
+    REWARDS_ROW,
+    ROW_KEYS,
+    cooldownElapsed,
+)
+from datetime import datetime, timezone
 from sqlalchemy.future import select
-from pytz import timezone as tz
+from sqlalchemy.sql import func
 
 from utils.logging import loggingInstance
-from utils.config import coinsConfig
-
-default_images = {
-    "3D XChameleons": "https://drive.google.com/drive-viewer/AKGpihY9B0Ok1Q5d1q7ymGOY0l9Ctjk8URE0peEQEWYEP9HlL3qOt7aMuezmZOX6Xtc_MKbkHWrPSuyk8bdku4ezTxoJv-1VZo0q1PY=w1111-h917-rw-v1",
-    "3D Bad XParrots": "https://drive.google.com/drive-viewer/AKGpihbmFwk13czo8620g1bd7BnxjwaWhL_3c_YL9mEknxsMGq7lKs-RQKJGHwcjMMlsL9GKzz1zYpNPXZF0cSW57x1PSXbwvzmUAko=w1111-h917-rw-v1",
-    "3D Good XParrots": "https://drive.google.com/drive-viewer/AKGpihbmFwk13czo8620g1bd7BnxjwaWhL_3c_YL9mEknxsMGq7lKs-RQKJGHwcjMMlsL9GKzz1zYpNPXZF0cSW57x1PSXbwvzmUAko=w1111-h917-rw-v1",
-    "3D XParrots": "https://drive.google.com/drive-viewer/AKGpihbmFwk13czo8620g1bd7BnxjwaWhL_3c_YL9mEknxsMGq7lKs-RQKJGHwcjMMlsL9GKzz1zYpNPXZF0cSW57x1PSXbwvzmUAko=w1111-h917-rw-v1",
-    "OG Genesis Keys": "https://drive.google.com/drive-viewer/AKGpihZ8KgzCsAJ6sATShe3xwMXuWV90NqdFpQ5GeixB4vwg26u13G4Z5nNSO-alJJu4VPsp6leeOUGnwLD_YgYbqImNTrSpiNIMVSM=w1111-h917-rw-v1",
-    "XRPL Moonbirds": "https://drive.google.com/drive-viewer/AKGpihYQS43mnX_m3_Z_JcedI_Pd0OoRJWTr6yp-JS3Qz-ubs9ltZTcjfjDwMcfLOSTTzr9f3oMlF6T1U5ZMtXYQOOVMqBUtPETa-wA=w1111-h917",
-    "XRPLMoonbirds": "https://drive.google.com/drive-viewer/AKGpihYQS43mnX_m3_Z_JcedI_Pd0OoRJWTr6yp-JS3Qz-ubs9ltZTcjfjDwMcfLOSTTzr9f3oMlF6T1U5ZMtXYQOOVMqBUtPETa-wA=w1111-h917",
-    "XChameleons": "https://drive.google.com/drive-viewer/AKGpihZNZl7cb0eP-a3jEDT19ycxxztsJBcXyd-5AsZUyKoKhsM5x9l961FuzghfzfthggvnmHF47Jytg_UsJ3TLO77klPn3ns_sIXE=w1111-h917",
-    "Collab XParrots": "https://drive.google.com/drive-viewer/AKGpihZMuhRvrfffWz8hg2QbwDtOtMswvY4d38V8e_PybgHwXHok5MiGlpVYOraFXv_8rn8bUkj21kLplcBbmucFrOkhcvXgaFwu4GQ=w1111-h917",
-    "XParrots": "https://drive.google.com/drive-viewer/AKGpihZMuhRvrfffWz8hg2QbwDtOtMswvY4d38V8e_PybgHwXHok5MiGlpVYOraFXv_8rn8bUkj21kLplcBbmucFrOkhcvXgaFwu4GQ=w1111-h917",
-}
+from utils.metrics import metrics
+from utils.config import dbConfig
+from utils.coordinator import ReleaseFeed
+from utils.ttlCache import TTLCache
+
+MISSING = object()
 
 
 class XparrotDB:
-    def __init__(self, host, dbName, username, password, verbose):
+    def __init__(
+        self,
+        host,
+        dbName,
+        username,
+        password,
+        verbose,
+        sqlLink=None,
+        coordinator=None,
+    ):
 
         #                   username          if empty, do not add :, else :password      host   dbName
-        sqlLink = f"mysql+aiomysql://{username}{'' if password in ['', None] else f':{password}'}@{host}/{dbName}"
+        sqlLink = (
+            sqlLink
+            or f"mysql+aiomysql://{username}{'' if password in ['', None] else f':{password}'}@{host}/{dbName}"
+        )
         loggingInstance.info(f"DB Link: {sqlLink}")
+        # Idle connections are validated by the keepalive task rather than
+        # pinged on every checkout, pool_pre_ping is left as an opt-in
         self.dbEngine = create_async_engine(
             sqlLink,
             echo=verbose,
-            pool_recycle=600,
-            pool_pre_ping=True,
+            poolclass=MonitoredQueuePool,
+            pool_size=dbConfig.getint("pool_size", fallback=10),
+            max_overflow=dbConfig.getint("pool_max_overflow", fallback=10),
+            pool_timeout=dbConfig.getfloat("pool_timeout", fallback=30.0),
+            pool_recycle=dbConfig.getint("pool_recycle", fallback=600),
+            pool_pre_ping=dbConfig.getboolean("pool_pre_ping", fallback=False),
             pool_use_lifo=True,
         )
 
@@ -44,424 +70,356 @@ class XparrotDB:
         )
         self.verbose = verbose
 
-    def check_cooldown(self, result, funcResult):
-        if result:
-            lastClaim = result[0]
-            currentTime = result[1]
-
-            if lastClaim and not lastClaim == "0000-00-00 00:00:00":
-                lastClaim = (
-                    datetime.strptime(lastClaim, "%Y-%m-%d %H:%M:%S")
-                    if type(lastClaim) == str
-                    else lastClaim
-                )
-                nextClaim = lastClaim + timedelta(days=1)
-
-                # Check if the currentTime is past than nextClaim
-                if nextClaim > currentTime:
-
-                    # compute the remaining time
-                    timeDiff: timedelta = nextClaim - currentTime
-
-                    remainingHour = timeDiff.seconds // 3600 + (timeDiff.days * 24)
-                    remainingMin = (timeDiff.seconds // 60) % 60
-                    remainingSec = timeDiff.seconds % 60
-
-                    # Ready the return structure
-                    funcResult["result"] = "NotReady"
-                    funcResult["timeRemaining"]["hour"] = remainingHour
-                    funcResult["timeRemaining"]["minute"] = remainingMin
-                    funcResult["timeRemaining"]["second"] = remainingSec
-
-                else:
-                    funcResult["result"] = "Claimable"
-            else:
-                funcResult["result"] = "Claimable"
-        else:
-            funcResult["result"] = "XrpIdNotFound"
-
-        return funcResult
-
-    async def getBonusStatus(self, xrpId: str) -> dict:
-        # Return structure
-        funcResult = {
-            "result": "",
-            "timeRemaining": {
-                "hour": 0,
-                "minute": 0,
-                "second": 0,
-            },
-        }
+        # Per-holder NFT rows for random picks without ORDER BY RAND()
+        self.nftIndex = NFTIndex(
+            ttl=dbConfig.getfloat("nft_index_ttl", fallback=300.0),
+            maxHolders=dbConfig.getint("nft_index_size", fallback=50000),
+        )
 
-        async with self.asyncSessionMaker() as session:
-            # Query the required columns
-            query = select(
-                RewardsTable.dailyBonusFlagDate,
-                func.now(),
-                RewardsTable.penaltyTraits3DRewards,
-            ).filter(RewardsTable.xrpId == xrpId)
-            result = await session.execute(query)
-            result = result.first()
-
-            loggingInstance.info(f"Query Result: {result}") if self.verbose else None
-
-            # Check if there are results
-            # No result would only mean that xrpId is not found
-            funcResult = self.check_cooldown(result, funcResult)
-            if funcResult["result"] == "Claimable":
-                x, y, nftCount = result
-                if nftCount < coinsConfig.getfloat("min_nft_count"):
-                    funcResult["result"] = "minNFTCount"
-
-            loggingInstance.info(f"getBonusStatus({xrpId}): {funcResult['result']}")
-
-            return funcResult
-
-    async def getBonusAmount(self, xrpId: str) -> dict:
-        async with self.asyncSessionMaker() as session:
-            funcResult = {
-                "result": None,
-                "amount": None,
-                "nftLink": None,
-                "tokenId": None,
-                "taxonId": None,
-            }
-            query = (
-                select(
-                    NFTTraitList.totalXRAIN,
-                    NFTTraitList.nftlink,
-                    NFTTraitList.tokenId,
-                    NFTTraitList.taxonId,
-                    NFTTraitList.nftGroupName,
-                )
-                .filter(NFTTraitList.xrpId == xrpId, NFTTraitList.nftlink != "")
-                .order_by(func.random())
-                .limit(1)
-            )
-            queryResult = await session.execute(query)
-            queryResult = queryResult.first()
+        # Checks the indexed image links when nft_link_validation is on
+        self.linkValidator = LinkValidator(
+            self.nftIndex.deadLinks,
+            recheckInterval=dbConfig.getfloat("nft_link_recheck", fallback=86400.0),
+            batchSize=dbConfig.getint("nft_link_batch", fallback=500),
+        )
 
-            (
-                loggingInstance.info(f"Query Result: {queryResult}")
-                if self.verbose
-                else None
-            )
+        # Claim quotes rarely change, so they are kept in memory by taxonId
+        self.quoteCatalogue = ClaimQuoteCatalogue()
 
-            if queryResult:
-                xrainValue, nftLink, tokenId, taxonId, nftGroupName = queryResult
+        # DB time told from one reading, so cooldowns need no NOW() query
+        self.dbClock = DBClock(
+            maxAge=dbConfig.getfloat("db_clock_max_age", fallback=300.0)
+        )
 
-                if nftLink == "":
-                    funcResult["result"] = "ImageLinkNotFound"
-                    (
-                        loggingInstance.error(
-                            f"getBonusAmount({xrpId}): {funcResult['result']}"
-                        )
-                        if self.verbose
-                        else None
-                    )
-                    return funcResult
-
-                funcResult["result"] = "Success"
-                funcResult["nftLink"] = update_nftLink(nftLink, nftGroupName)
-                funcResult["amount"] = xrainValue
-                funcResult["tokenId"] = tokenId
-                funcResult["taxonId"] = taxonId
-                (
-                    loggingInstance.info(
-                        f"getBonusAmount({xrpId}): {funcResult['result']}"
-                    )
-                    if self.verbose
-                    else None
-                )
-                return funcResult
-            else:
-                funcResult["result"] = "XrpIdNotFound"
-                (
-                    loggingInstance.info(
-                        f"    getBonusAmount({xrpId}): {funcResult['result']}"
-                    )
-                    if self.verbose
-                    else None
-                )
-                return funcResult
-
-    async def getBiWeeklyStatus(self, xrpId) -> dict:
-        funcResult = {
-            "result": "",
-            "timeRemaining": {
-                "hour": 0,
-                "minute": 0,
-                "second": 0,
-            },
-        }
+        # Recently used RewardsTable rows, claim writes go through to it
+        self.rowCache = TTLCache(
+            ttl=dbConfig.getfloat("row_cache_ttl", fallback=60.0),
+            maxSize=dbConfig.getint("row_cache_size", fallback=10000),
+        )
 
-        async with self.asyncSessionMaker() as session:
-            query = select(
-                RewardsTable.dailyRepFlagDate,
-                func.utc_timestamp(),
-                RewardsTable.penaltyReputationRewards,
-                RewardsTable.reputationFlag,
-            ).filter(RewardsTable.xrpId == xrpId)
-            queryResult = await session.execute(query)
-            queryResult = queryResult.first()
+        # Cooldowns are judged in-process against the DB clock
+        self.cooldowns = CooldownEngine(self.dbClock)
 
-            funcResult = self.check_cooldown(queryResult, funcResult)
+        # Flag dates and eligibility columns of every holder, empty until loaded
+        self.eligibility = EligibilitySnapshot(
+            self.dbClock,
+            rebuildInterval=dbConfig.getfloat(
+                "eligibility_rebuild_interval", fallback=900.0
+            ),
+        )
 
-            if queryResult:
-                x, y, funcResult["amount"], reputationFlag = queryResult
-                if reputationFlag:
-                    funcResult["result"] = "flagged"
+        # Releases made by the other worker processes, through the coordinator
+        self.releaseFeed = ReleaseFeed(coordinator) if coordinator else None
 
-            loggingInstance.info(f"getBonusStatus({xrpId}): {funcResult['result']}")
+    async def validateLinks(self) -> int:
+        return await self.linkValidator.validate(self.nftIndex.links())
 
-            return funcResult
+    async def warmPool(self) -> int:
+        # Opens the connections the first claims would otherwise wait on,
+        # overflow connections are closed on return so it stops at pool_size
+        poolSize = self.dbEngine.sync_engine.pool.size()
+        connections = min(
+            dbConfig.getint("pool_warm_connections", fallback=poolSize), poolSize
+        )
+        opened = await warmConnections(self.dbEngine, connections)
+        loggingInstance.info(f"DB pool warmed, {opened}/{connections} connections")
+        return opened
 
-    async def biweeklySet(self, xrpId) -> None:
-        async with self.asyncSessionMaker() as session:
-            async with session.begin():
-                try:
-                    await session.execute(
-                        update(RewardsTable)
-                        .where(RewardsTable.xrpId == xrpId)
-                        .values(dailyRepFlagDate=self.getLastRedemption())
-                    )
-                    if self.verbose:
-                        loggingInstance.info(f"biweeklySet({xrpId}): Success")
-                except Exception as e:
-                    if self.verbose:
-                        loggingInstance.error(f"biweeklySet({xrpId}): {e}")
-                    await session.rollback()
+    async def keepalive(self) -> int:
+        return await validateIdle(self.dbEngine)
 
-    async def bonusSet(self, xrpId) -> None:
-        async with self.asyncSessionMaker() as session:
-            async with session.begin():
-                try:
-                    await session.execute(
-                        update(RewardsTable)
-                        .where(RewardsTable.xrpId == xrpId)
-                        .values(dailyBonusFlagDate=func.now())
-                    )
-                    if self.verbose:
-                        loggingInstance.info(f"bonusSet({xrpId}): Success")
-                except Exception as e:
-                    if self.verbose:
-                        loggingInstance.error(f"bonusSet({xrpId}): {e}")
-                    await session.rollback()
+    def poolStats(self) -> dict:
+        return self.dbEngine.sync_engine.pool.stats()
 
-    async def getRandomNFT(self, xrpId) -> dict:
+    async def loadNFTIndex(self) -> None:
         async with self.asyncSessionMaker() as session:
-            funcResult = {"nftLink": None, "tokenId": None, "taxonId": None}
-            query = (
-                select(
-                    NFTTraitList.nftlink,
-                    NFTTraitList.tokenId,
-                    NFTTraitList.taxonId,
-                    NFTTraitList.nftGroupName,
-                )
-                .filter(NFTTraitList.xrpId == xrpId, NFTTraitList.nftlink != "")
-                .order_by(func.random())
-                .limit(1)
-            )
-            queryResult = await session.execute(query)
-            queryResult = queryResult.first()
-
-            (
-                loggingInstance.info(f"Query Result: {queryResult}")
-                if self.verbose
-                else None
+            await self.nftIndex.load(session)
+
+    @metrics.timed("db_claim_context")
+    async def getClaimContext(
+        self,
+        xrpId: str,
+        rewardType: str,
+        minNftCount: float | None = None,
+        withNFT: bool = True,
+        withQuote: bool = False,
+    ) -> ClaimContext:
+        flagColumn, clock = REWARD_TYPES[rewardType]
+
+        # Cooldowns are answered from the snapshot without touching the DB, a
+        # claim that may go through is still settled by reserveClaim. NFT
+        # counts and flags change without a claim, so those refusals are only
+        # made from the DB
+        snapshotContext = self.eligibility.context(xrpId, rewardType)
+        if snapshotContext is not None:
+            snapshotContext.status = self.cooldowns.check(
+                rewardType, snapshotContext.lastClaim, snapshotContext.status
             )
+            if snapshotContext.status["result"] == "NotReady":
+                metrics.increment("xrain_snapshot_rejections_total")
+                return snapshotContext
 
-            if queryResult:
-                nftLink, tokenId, taxonId, nftGroupName = queryResult
+        context = ClaimContext(xrpId=xrpId, rewardType=rewardType)
 
-                if nftLink == "":
-                    (
-                        loggingInstance.error(f"getRandomNFT({xrpId}): NoNFTFound")
-                        if self.verbose
-                        else None
-                    )
-                    return "NoNFTFound"
-
-                funcResult["nftLink"] = update_nftLink(nftLink, nftGroupName)
-                funcResult["tokenId"] = tokenId
-                funcResult["taxonId"] = taxonId
-                (
-                    loggingInstance.info(f"getRandomNFT({xrpId}): {funcResult}")
-                    if self.verbose
-                    else None
-                )
-                return funcResult
-
-            (
-                loggingInstance.error(f"getRandomNFT({xrpId}): NoNFTFound")
-                if self.verbose
-                else None
-            )
-            return "NoNFTFound"
-
-    async def getClaimQuote(self, taxonId) -> dict:
+        # Everything a claim needs is read in one session, the NFT and quote
+        # are only fetched once the claim is known to go through
         async with self.asyncSessionMaker() as session:
-            # Query the rows of taxonId
-            query = select(ClaimQuotes.taxonId).group_by(ClaimQuotes.taxonId)
-            taxonIdList = await session.execute(query)
-
-            # Get, parse, and put them into a list
-            taxonIdList = [row[0] for row in taxonIdList.all()]
-
-            # Retain taxonId if it is in the list, else 0
-            taxonId = taxonId if taxonId in taxonIdList else 0
+            row = await self.getRewardsRow(session, xrpId)
+
+            loggingInstance.info(f"Query Result: {row}") if self.verbose else None
+
+            if row:
+                context.lastClaim = row[flagColumn.key]
+                context.nftCount = row["penaltyTraits3DRewards"]
+                context.reputationAmount = row["penaltyReputationRewards"]
+                context.reputationFlag = row["reputationFlag"]
+                context.traitsAmount = context.nftCount
+                context.dbTime = self.dbClock.now(clock)
+
+            self.checkClaimRules(context, found=bool(row), minNftCount=minNftCount)
+
+            if context.claimable and (withNFT or withQuote):
+                nftRow = await self.nftIndex.pick(session, xrpId)
+
+                if nftRow:
+                    tokenId, taxonId, nftLink, nftGroupName, xrainValue = nftRow
+                    context.nft = {
+                        "nftLink": nftLink,
+                        "tokenId": tokenId,
+                        "taxonId": taxonId,
+                        "amount": xrainValue,
+                    }
+
+            if context.nft and withQuote:
+                if self.quoteCatalogue.loadedAt is None:
+                    await self.quoteCatalogue.load(session)
+
+                context.quote = self.quoteCatalogue.pick(context.nft["taxonId"])
+                if context.quote is None:
+                    loggingInstance.error(
+                        f"getClaimContext({context.nft['taxonId']}): ClaimQuoteError"
+                    )
 
-            funcResult = {"nftGroupName": None, "description": None}
-            query = (
-                select(ClaimQuotes.nftGroupName, ClaimQuotes.description)
-                .filter(
-                    ClaimQuotes.taxonId == taxonId,
-                )
-                .order_by(func.random())
-                .limit(1)
-            )
-            queryResult = await session.execute(query)
-            queryResult = queryResult.first()
+        loggingInstance.info(
+            f"getClaimContext({xrpId}, {rewardType}): {context.status['result']}"
+        )
+        return context
 
-            if not queryResult:
-                loggingInstance.error(f"getClaimQuote({taxonId}): ClaimQuoteError")
-                raise Exception("ClaimQuoteError")
+    def checkClaimRules(self, context, found, minNftCount=None) -> None:
+        # Cooldown first, then the per-reward rules on a claimable context
+        context.status = self.cooldowns.check(
+            context.rewardType, context.lastClaim, context.status, found=found
+        )
 
-            nftGroupName, description = queryResult
+        if context.claimable:
+            if context.rewardType == "biweekly" and context.reputationFlag:
+                context.status["result"] = "flagged"
+            elif minNftCount is not None and context.nftCount < minNftCount:
+                context.status["result"] = "minNFTCount"
 
-            funcResult["description"] = description
-            funcResult["nftGroupName"] = nftGroupName
+    async def getRewardsRow(self, session, xrpId) -> dict | None:
+        # The whole RewardsTable row, shared by every status check of a holder
+        row = self.rowCache.get(xrpId, MISSING)
+        if row is not MISSING:
+            await self.dbClock.ensureSynced(session)
+            return row
 
-            loggingInstance.info(f"getClaimQuote({taxonId}): {description}")
-            return funcResult
+        result = await session.execute(REWARDS_ROW, {"b_xrpId": xrpId})
+        result = result.first()
 
-    async def getPenaltyStatus(self, xrpId):
-        funcResult = {
-            "result": "",
-            "timeRemaining": {
-                "hour": 0,
-                "minute": 0,
-                "second": 0,
-            },
+        row = None
+        if result:
+            *values, localTime, utcTime = result
+            self.dbClock.record(localTime, utcTime)
+            row = dict(zip(ROW_KEYS, values))
+        else:
+            await self.dbClock.ensureSynced(session)
+
+        # Unknown xrpIds are cached too, repeated lookups stay off the DB
+        self.rowCache.set(xrpId, row)
+        return row
+
+    def recordClaim(self, xrpId, rewardType, lastClaim) -> None:
+        # Write-through of a flag date set or restored by this process
+        flagColumn, clock = REWARD_TYPES[rewardType]
+        if lastClaim is not None and not isinstance(lastClaim, datetime):
+            # A SQL expression such as NOW(), stand in the DB time it resolves to
+            if self.dbClock.readAt is None:
+                # Nothing to tell it from yet, the row is read again instead
+                self.rowCache.invalidate(xrpId)
+                return
+            lastClaim = self.dbClock.now(clock)
+        elif lastClaim is not None and lastClaim.tzinfo is not None:
+            lastClaim = lastClaim.astimezone(timezone.utc).replace(tzinfo=None)
+
+        row = self.rowCache.peek(xrpId)
+        if row is not None:
+            row[flagColumn.key] = lastClaim
+        self.eligibility.recordClaim(xrpId, rewardType, lastClaim)
+
+    def cacheStats(self) -> dict:
+        return {
+            "rowHits": self.rowCache.hits,
+            "rowMisses": self.rowCache.misses,
+            "rows": len(self.rowCache),
         }
 
+    async def loadEligibility(self) -> None:
+        if self.releaseFeed is not None:
+            # Releases up to now are in the load, the feed starts from here
+            await self.releaseFeed.released()
         async with self.asyncSessionMaker() as session:
-            query = select(
-                RewardsTable.dailyTraitFlagDate,
-                func.utc_timestamp(),
-                RewardsTable.penaltyTraits3DRewards,
-            ).filter(RewardsTable.xrpId == xrpId)
-            queryResult = await session.execute(query)
-            queryResult = queryResult.first()
-
-            funcResult = self.check_cooldown(queryResult, funcResult)
-
-            if queryResult:
-                x, y, funcResult["amount"] = queryResult
+            await self.eligibility.load(session)
 
-            loggingInstance.info(f"getBonusStatus({xrpId}): {funcResult['result']}")
-
-            return funcResult
+    async def refreshEligibility(self) -> None:
+        released = []
+        if self.releaseFeed is not None:
+            released = await self.releaseFeed.released()
+        async with self.asyncSessionMaker() as session:
+            await self.eligibility.refresh(session, self.getLastRedemption(), released)
 
-    async def setPenaltyStatusClaimed(self, xrpId):
+    async def refreshClaimQuotes(self) -> None:
+        async with self.asyncSessionMaker() as session:
+            await self.quoteCatalogue.load(session)
+
+    def claimWindow(self, rewardType):
+        # Flag column and the condition for the cooldown to have elapsed
+        flagColumn, clock = REWARD_TYPES[rewardType]
+        return flagColumn, cooldownElapsed(flagColumn, clock)
+
+    def flagParams(self, xrpId, rewardType) -> dict:
+        # Bound values of the statements marking a claim. The bonus keeps a
+        # rolling window from the claim time and is stamped by the DB, the
+        # other rewards are pinned to the last 19:00 ET redemption
+        params = {"b_xrpId": xrpId}
+        if rewardType != "bonus":
+            params["b_flagValue"] = self.getLastRedemption()
+        return params
+
+    def claimedAt(self, params):
+        # Flag date written by a statement run with params, NOW() for the
+        # bonus, which recordClaim resolves against the DB clock
+        return params.get("b_flagValue", func.now())
+
+    @metrics.timed("db_reserve_claim")
+    async def reserveClaim(self, xrpId, rewardType) -> bool:
+        params = self.flagParams(xrpId, rewardType)
+
+        # Win the slot only while the cooldown has elapsed, a concurrent claim
+        # for the same xrpId matches no row and loses
         async with self.asyncSessionMaker() as session:
             async with session.begin():
-                try:
-                    await session.execute(
-                        update(RewardsTable)
-                        .where(RewardsTable.xrpId == xrpId)
-                        .values(dailyTraitFlagDate=self.getLastRedemption())
-                    )
-                    if self.verbose:
-                        loggingInstance.info(
-                            f"setPenaltyStatusClaimed({xrpId}): Success"
-                        )
-                except Exception as e:
-                    if self.verbose:
-                        loggingInstance.error(f"setPenaltyStatusClaimed({xrpId}): {e}")
-                    await session.rollback()
+                result = await session.execute(RESERVE_CLAIM[rewardType], params)
+                reserved = result.rowcount == 1
 
-    async def get_amm_status(self, xrpId, min_amount):
-        funcResult = {
-            "result": "",
-            "timeRemaining": {
-                "hour": 0,
-                "minute": 0,
-                "second": 0,
-            },
-        }
+        if reserved:
+            self.recordClaim(xrpId, rewardType, self.claimedAt(params))
 
-        async with self.asyncSessionMaker() as session:
-            query = select(
-                RewardsTable.ammFlagDate,
-                func.utc_timestamp(),
-                RewardsTable.penaltyTraits3DRewards,
-            ).filter(RewardsTable.xrpId == xrpId)
-            queryResult = await session.execute(query)
-            queryResult = queryResult.first()
+        if self.verbose:
+            loggingInstance.info(f"reserveClaim({xrpId}, {rewardType}): {reserved}")
+        return reserved
 
-            funcResult = self.check_cooldown(queryResult, funcResult)
+    @metrics.timed("db_reserve_claims")
+    async def reserveClaims(self, xrpIds, rewardType) -> list[str]:
+        # Batch form of reserveClaim, returns the xrpIds that were reserved.
+        # The rows are locked while picked so a slash command claim for one
+        # of them either lands first and drops out, or waits and loses
+        params = self.flagParams(None, rewardType)
+        del params["b_xrpId"]
 
-            if queryResult:
-                x, y, nftAmount = queryResult
-                if nftAmount < min_amount:
-                    funcResult["result"] = "minNFTCount"
+        async with self.asyncSessionMaker() as session:
+            async with session.begin():
+                result = await session.execute(
+                    LOCK_CLAIMABLE[rewardType], {"b_xrpIds": list(xrpIds)}
+                )
+                reserved = list(result.scalars().all())
 
-            loggingInstance.info(f"get_amm_status({xrpId}): {nftAmount}")
+                if reserved:
+                    await session.execute(
+                        RESERVE_CLAIMS[rewardType],
+                        {**params, "b_xrpIds": reserved},
+                    )
 
-            return funcResult
+        for xrpId in reserved:
+            self.recordClaim(xrpId, rewardType, self.claimedAt(params))
 
-    async def update_amm_claimed(self, xrpId):
+        loggingInstance.info(
+            f"reserveClaims({len(xrpIds)}, {rewardType}): {len(reserved)} reserved"
+        )
+        return reserved
+
+    async def streamClaimable(
+        self,
+        rewardType,
+        afterXrpId=None,
+        batchSize=500,
+        minNftCount=None,
+        withNFT=False,
+    ):
+        # Yields batches of (xrpId, amount, lastClaim) for every holder whose
+        # reward can be paid now, in xrpId order so a run can resume after the
+        # last xrpId it finished. Each batch is its own short query keyed on
+        # that xrpId, no cursor stays open while the caller works on a batch
+        flagColumn, elapsed = self.claimWindow(rewardType)
+        amountColumn = BULK_REWARD_AMOUNTS[rewardType]
+
+        query = select(RewardsTable.xrpId, amountColumn, flagColumn).where(
+            elapsed, amountColumn > 0
+        )
+        if minNftCount is not None:
+            query = query.where(RewardsTable.penaltyTraits3DRewards >= minNftCount)
+        if withNFT:
+            # At least one NFT with an image to pick, as getClaimContext needs
+            query = query.where(
+                exists().where(
+                    NFTTraitList.xrpId == RewardsTable.xrpId,
+                    NFTTraitList.nftlink != "",
+                )
+            )
+        if rewardType == "biweekly":
+            query = query.where(
+                (RewardsTable.reputationFlag.is_(None))
+                | (RewardsTable.reputationFlag == 0)
+            )
+        query = query.order_by(RewardsTable.xrpId).limit(batchSize)
+
+        while True:
+            page = query
+            if afterXrpId is not None:
+                page = page.where(RewardsTable.xrpId > afterXrpId)
+
+            async with self.asyncSessionMaker() as session:
+                result = await session.execute(page)
+                batch = [tuple(row) for row in result.all()]
+
+            if not batch:
+                return
+            yield batch
+            if len(batch) < batchSize:
+                return
+            afterXrpId = batch[-1][0]
+
+    @metrics.timed("db_release_claim")
+    async def releaseClaim(self, xrpId, rewardType, lastClaim) -> None:
+        # Compensate a reservation whose payment failed by restoring the old flag
         async with self.asyncSessionMaker() as session:
             async with session.begin():
                 try:
                     await session.execute(
-                        update(RewardsTable)
-                        .where(RewardsTable.xrpId == xrpId)
-                        .values(ammFlagDate=self.getLastRedemption())
+                        RESTORE_FLAG[rewardType],
+                        {"b_xrpId": xrpId, "b_flagValue": lastClaim},
                     )
+                    self.recordClaim(xrpId, rewardType, lastClaim)
+                    if self.releaseFeed is not None:
+                        self.releaseFeed.publish(xrpId)
                     if self.verbose:
-                        loggingInstance.info(f"update_amm_claimed({xrpId}): Success")
+                        loggingInstance.info(
+                            f"releaseClaim({xrpId}, {rewardType}): Success"
+                        )
                 except Exception as e:
-                    if self.verbose:
-                        loggingInstance.error(f"update_amm_claimed({xrpId}): {e}")
+                    loggingInstance.error(f"releaseClaim({xrpId}, {rewardType}): {e}")
                     await session.rollback()
 
     def getLastRedemption(self):
-        est = tz("US/Eastern")
-        current_time = datetime.now(timezone.utc)
-        current_est = current_time.astimezone(est)
-        lastEst = datetime(
-            current_est.year,
-            current_est.month,
-            current_est.day,
-            19,
-            0,
-            0,
-            tzinfo=est,
-        )
-        if current_est < lastEst:
-            lastEst += timedelta(days=-1)
-
-        return lastEst.astimezone(timezone.utc)
-
-
-def update_nftLink(nftLink, nftGroupName=None):
-    if not nftLink:
-        placeholder_image = default_images.get(nftGroupName)
-        if placeholder_image is None:
-            raise ValueError("No NFT link image available.")
-        return placeholder_image
-    if not isinstance(nftLink, str):
-        return nftLink
-    if "ipfs.bithomp.com" in nftLink:
-        return nftLink
-    if (
-        ".ipfs.w3s.link" in nftLink
-        or nftLink.startswith("https://ipfs")
-        or "ipfs://" in nftLink
-    ):
-        return nftLink.replace(".ipfs.w3s.link", "").replace(
-            "https://", "https://ipfs.bithomp.com/image/"
-        )
-    return nftLink
+        # Last 19:00 ET redemption, by the DB clock once it has been read
+        return self.cooldowns.lastRedemption().replace(tzinfo=timezone.utc)
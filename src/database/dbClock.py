@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+from time import monotonic
+
+from sqlalchemy import DateTime
+from sqlalchemy.future import select
+from sqlalchemy.sql import func
+
+
+class DBClock:
+    # Tells the DB's NOW() and UTC_TIMESTAMP() from one reading and the
+    # monotonic clock, so cooldowns can be checked without asking the DB
+    def __init__(self, maxAge: float = 300.0) -> None:
+        self.maxAge = maxAge
+
+        self.localTime: datetime | None = None
+        self.utcTime: datetime | None = None
+        self.readAt: float | None = None
+
+    def isSynced(self) -> bool:
+        return self.readAt is not None and monotonic() - self.readAt < self.maxAge
+
+    def now(self, clock: str = "utc") -> datetime:
+        # "now" for the DB local time, "utc" for UTC, as in REWARD_TYPES
+        elapsed = timedelta(seconds=monotonic() - self.readAt)
+        return (self.localTime if clock == "now" else self.utcTime) + elapsed
+
+    def localOffset(self) -> timedelta:
+        # DB local time minus UTC, to the minute as the two come from one read
+        if self.readAt is None:
+            return timedelta(0)
+        minutes = round((self.localTime - self.utcTime).total_seconds() / 60)
+        return timedelta(minutes=minutes)
+
+    async def sync(self, session) -> None:
+        result = await session.execute(
+            select(func.now(), func.utc_timestamp(type_=DateTime))
+        )
+        self.record(*result.first())
+
+    def record(self, localTime: datetime, utcTime: datetime) -> None:
+        # Also fed by queries that read NOW() alongside their own columns
+        self.localTime, self.utcTime = localTime, utcTime
+        self.readAt = monotonic()
+
+    async def ensureSynced(self, session) -> None:
+        if not self.isSynced():
+            await self.sync(session)
@@ -0,0 +1,93 @@
+from asyncio import gather
+from time import perf_counter
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from utils.logging import loggingInstance
+from utils.metrics import metrics
+
+
+class MonitoredQueuePool(AsyncAdaptedQueuePool):
+    # AsyncAdaptedQueuePool that records how long checkouts wait for a free
+    # connection once the pool and its overflow are all checked out
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.waiters = 0
+        self.waits = 0
+        self.waitTime = 0.0
+        self.maxWait = 0.0
+
+    def _do_get(self):
+        exhausted = (
+            self.checkedin() == 0
+            and self._max_overflow > -1
+            and self.overflow() >= self._max_overflow
+        )
+        if not exhausted:
+            return super()._do_get()
+
+        self.waiters += 1
+        start = perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            elapsed = perf_counter() - start
+            self.waiters -= 1
+            self.waits += 1
+            self.waitTime += elapsed
+            self.maxWait = max(self.maxWait, elapsed)
+            metrics.observe("xrain_db_pool_wait_seconds", elapsed)
+
+    def recreate(self):
+        # Carries the counters over when SQLAlchemy swaps the pool out
+        pool = super().recreate()
+        pool.waits, pool.waitTime = self.waits, self.waitTime
+        pool.maxWait = self.maxWait
+        return pool
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size(),
+            "checkedOut": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "waiters": self.waiters,
+            "waits": self.waits,
+            "waitTime": round(self.waitTime, 3),
+            "maxWait": round(self.maxWait, 3),
+        }
+
+
+async def ping(engine: AsyncEngine) -> bool:
+    # One checkout and SELECT 1. A connection that fails is invalidated so the
+    # pool opens a fresh one instead of handing the broken one to a claim
+    async with engine.connect() as connection:
+        try:
+            await connection.execute(text("SELECT 1"))
+            return True
+        except Exception as e:
+            loggingInstance.warning(f"DB keepalive: {e}")
+            await connection.invalidate()
+            return False
+
+
+async def warmConnections(engine: AsyncEngine, connections: int) -> int:
+    # Opens the connections side by side, so they are all held at once and
+    # the pool keeps every one of them when they are returned
+    results = await gather(
+        *(ping(engine) for _ in range(connections)), return_exceptions=True
+    )
+    return sum(result is True for result in results)
+
+
+async def validateIdle(engine: AsyncEngine) -> int:
+    # Validates every idle connection in the background, in place of a
+    # pre-ping on each checkout. Connections past pool_recycle are reopened
+    # here rather than on the next claim
+    pool = engine.sync_engine.pool
+    idle = pool.checkedin() if isinstance(pool, MonitoredQueuePool) else 1
+    if idle == 0:
+        return 0
+    return await warmConnections(engine, idle)
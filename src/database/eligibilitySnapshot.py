@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+from time import monotonic
+
+from sqlalchemy import or_
+from sqlalchemy.future import select
+
+from database.claimContext import ClaimContext, REWARD_TYPES
+from database.dbClock import DBClock
+from database.models.rewardstable import RewardsTable
+from utils.logging import loggingInstance
+
+
+# One flag date per reward type, in REWARD_TYPES order, then the columns the
+# claim rules look at
+SNAPSHOT_COLUMNS = (
+    *(flagColumn for flagColumn, x in REWARD_TYPES.values()),
+    RewardsTable.penaltyTraits3DRewards,
+    RewardsTable.penaltyReputationRewards,
+    RewardsTable.reputationFlag,
+)
+
+FLAG_INDEX = {rewardType: index for index, rewardType in enumerate(REWARD_TYPES)}
+
+
+class EligibilitySnapshot:
+    # Every holder's flag dates and eligibility columns keyed by xrpId, so a
+    # claim that is going to be rejected can be answered from memory
+    def __init__(self, clock: DBClock, rebuildInterval: float = 900.0) -> None:
+        self.rows: dict[str, list] = {}
+
+        # Shared with XparrotDB, tells the DB time the cooldowns are judged at
+        self.clock = clock
+
+        # RewardsTable has no updated-at column, so deltas only see new flag
+        # dates. Everything else, such as new holders, changed NFT counts and
+        # flags, is picked up by a full rebuild this often
+        self.rebuildInterval = rebuildInterval
+        self.loadedAt: float | None = None
+
+        # DB local time of the last read, deltas look for claims after it
+        self.readUntil: datetime | None = None
+
+    def isLoaded(self) -> bool:
+        return self.loadedAt is not None
+
+    def context(self, xrpId: str, rewardType: str) -> ClaimContext | None:
+        # None when the snapshot cannot answer, the caller then reads the DB
+        if not self.isLoaded():
+            return None
+
+        row = self.rows.get(xrpId)
+        if row is None:
+            return None
+
+        nftCount, reputationAmount, reputationFlag = row[len(FLAG_INDEX) :]
+        return ClaimContext(
+            xrpId=xrpId,
+            rewardType=rewardType,
+            lastClaim=row[FLAG_INDEX[rewardType]],
+            dbTime=self.clock.now(REWARD_TYPES[rewardType][1]),
+            nftCount=nftCount,
+            traitsAmount=nftCount,
+            reputationAmount=reputationAmount,
+            reputationFlag=reputationFlag,
+        )
+
+    def recordClaim(self, xrpId: str, rewardType: str, lastClaim) -> None:
+        # Write-through from the claim writes of this process
+        row = self.rows.get(xrpId)
+        if row is not None:
+            row[FLAG_INDEX[rewardType]] = lastClaim
+
+    async def load(self, session) -> None:
+        await self.clock.sync(session)
+        readUntil = self.clock.now("now")
+
+        rows = {}
+        result = await session.stream(
+            select(RewardsTable.xrpId, *SNAPSHOT_COLUMNS).execution_options(
+                yield_per=5000
+            )
+        )
+        async for row in result:
+            rows[row[0]] = list(row[1:])
+
+        self.rows = rows
+        self.readUntil = readUntil
+        self.loadedAt = monotonic()
+        loggingInstance.info(f"Eligibility snapshot loaded, {len(rows)} holders")
+
+    async def refresh(
+        self, session, lastRedemption: datetime, released: list[str] | None = ()
+    ) -> None:
+        # released are holders whose claims were released since the last
+        # refresh, None when they are not known and only a rebuild is safe
+        if (
+            released is None
+            or not self.isLoaded()
+            or monotonic() - self.loadedAt > self.rebuildInterval
+        ):
+            await self.load(session)
+            return
+
+        await self.clock.sync(session)
+        readUntil = self.clock.now("now")
+
+        # Claims made elsewhere since the last read. The bonus flag holds the
+        # claim time, the other flags the redemption they were claimed for
+        bonusSince = self.readUntil - timedelta(minutes=1)
+        conditions = [REWARD_TYPES["bonus"][0] >= bonusSince]
+        conditions += [
+            flagColumn >= lastRedemption
+            for rewardType, (flagColumn, x) in REWARD_TYPES.items()
+            if rewardType != "bonus"
+        ]
+        if released:
+            conditions.append(RewardsTable.xrpId.in_(released))
+
+        result = await session.execute(
+            select(RewardsTable.xrpId, *SNAPSHOT_COLUMNS).where(or_(*conditions))
+        )
+        changed = 0
+        for row in result:
+            self.rows[row[0]] = list(row[1:])
+            changed += 1
+
+        self.readUntil = readUntil
+        loggingInstance.debug(f"Eligibility snapshot refreshed, {changed} rows")
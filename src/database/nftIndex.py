@@ -0,0 +1,92 @@
+from sqlalchemy import bindparam
+from sqlalchemy.future import select
+from random import choice
+from time import monotonic
+
+from database.models.nftTraitList import NFTTraitList
+from database.nftLinks import normaliseNFT, withPlaceholder
+from utils.logging import loggingInstance
+
+
+NFT_COLUMNS = (
+    NFTTraitList.tokenId,
+    NFTTraitList.taxonId,
+    NFTTraitList.nftlink,
+    NFTTraitList.nftGroupName,
+    NFTTraitList.totalXRAIN,
+)
+
+# Built once, a holder refresh only binds the xrpId
+HOLDER_NFTS = select(*NFT_COLUMNS).filter(
+    NFTTraitList.xrpId == bindparam("b_xrpId"), NFTTraitList.nftlink != ""
+)
+
+
+class NFTIndex:
+    def __init__(self, ttl: float = 300.0, maxHolders: int = 50000) -> None:
+        self.ttl = ttl
+        self.maxHolders = maxHolders
+
+        # xrpId -> (expiry, NFT rows laid out as NFT_COLUMNS). Links are
+        # stored in their final gateway form, normalised once per load
+        self.holders: dict[str, tuple[float, tuple]] = {}
+
+        # Links the LinkValidator found dead, picks go around them
+        self.deadLinks: set[str] = set()
+
+    async def pick(self, session, xrpId: str) -> tuple | None:
+        entry = self.holders.get(xrpId)
+        if entry is None or entry[0] <= monotonic():
+            nfts = await self.refreshHolder(session, xrpId)
+        else:
+            nfts = entry[1]
+
+        if not nfts:
+            return None
+
+        # Uniform pick over the holder's NFTs without any ORDER BY on the DB
+        if self.deadLinks:
+            live = [nft for nft in nfts if nft[2] not in self.deadLinks]
+            return choice(live) if live else withPlaceholder(choice(nfts))
+        return choice(nfts)
+
+    async def refreshHolder(self, session, xrpId: str) -> tuple:
+        result = await session.execute(HOLDER_NFTS, {"b_xrpId": xrpId})
+        nfts = tuple(tuple(row) for row in result.all())
+
+        return self._store(xrpId, nfts)
+
+    async def load(self, session) -> None:
+        # Bulk load every holder at startup, one pass over the table
+        query = select(NFTTraitList.xrpId, *NFT_COLUMNS).filter(
+            NFTTraitList.nftlink != ""
+        )
+        result = await session.execute(query)
+
+        holders: dict[str, list] = {}
+        for xrpId, *nft in result.all():
+            holders.setdefault(xrpId, []).append(tuple(nft))
+
+        self.holders.clear()
+        for xrpId, nfts in holders.items():
+            self._store(xrpId, tuple(nfts))
+
+        loggingInstance.info(f"NFT index loaded {len(self.holders)} holders")
+
+    def invalidate(self, xrpId: str) -> None:
+        self.holders.pop(xrpId, None)
+
+    def _store(self, xrpId: str, nfts: tuple) -> tuple:
+        # Holders are dropped in insertion order once the index is full
+        if xrpId not in self.holders and len(self.holders) >= self.maxHolders:
+            self.holders.pop(next(iter(self.holders)))
+
+        nfts = tuple(filter(None, map(normaliseNFT, nfts)))
+        self.holders[xrpId] = (monotonic() + self.ttl, nfts)
+        return nfts
+
+    def links(self):
+        # Every link currently indexed, for the LinkValidator
+        for expiry, nfts in list(self.holders.values()):
+            for nft in nfts:
+                yield nft[2]
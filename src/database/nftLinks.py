@@ -0,0 +1,144 @@
+from asyncio import gather, Semaphore
+from time import monotonic
+
+from aiohttp import ClientSession, ClientTimeout, ClientError
+from asyncio.exceptions import TimeoutError
+
+from utils.logging import loggingInstance
+
+
+IPFS_GATEWAY = "https://ipfs.bithomp.com/image/"
+
+# Responses that mean the image is gone rather than the gateway being slow
+DEAD_STATUSES = (400, 404, 410, 422)
+
+default_images = {
+    "3D XChameleons": "https://drive.google.com/drive-viewer/AKGpihY9B0Ok1Q5d1q7ymGOY0l9Ctjk8URE0peEQEWYEP9HlL3qOt7aMuezmZOX6Xtc_MKbkHWrPSuyk8bdku4ezTxoJv-1VZo0q1PY=w1111-h917-rw-v1",
+    "3D Bad XParrots": "https://drive.google.com/drive-viewer/AKGpihbmFwk13czo8620g1bd7BnxjwaWhL_3c_YL9mEknxsMGq7lKs-RQKJGHwcjMMlsL9GKzz1zYpNPXZF0cSW57x1PSXbwvzmUAko=w1111-h917-rw-v1",
+    "3D Good XParrots": "https://drive.google.com/drive-viewer/AKGpihbmFwk13czo8620g1bd7BnxjwaWhL_3c_YL9mEknxsMGq7lKs-RQKJGHwcjMMlsL9GKzz1zYpNPXZF0cSW57x1PSXbwvzmUAko=w1111-h917-rw-v1",
+    "3D XParrots": "https://drive.google.com/drive-viewer/AKGpihbmFwk13czo8620g1bd7BnxjwaWhL_3c_YL9mEknxsMGq7lKs-RQKJGHwcjMMlsL9GKzz1zYpNPXZF0cSW57x1PSXbwvzmUAko=w1111-h917-rw-v1",
+    "OG Genesis Keys": "https://drive.google.com/drive-viewer/AKGpihZ8KgzCsAJ6sATShe3xwMXuWV90NqdFpQ5GeixB4vwg26u13G4Z5nNSO-alJJu4VPsp6leeOUGnwLD_YgYbqImNTrSpiNIMVSM=w1111-h917-rw-v1",
+    "XRPL Moonbirds": "https://drive.google.com/drive-viewer/AKGpihYQS43mnX_m3_Z_JcedI_Pd0OoRJWTr6yp-JS3Qz-ubs9ltZTcjfjDwMcfLOSTTzr9f3oMlF6T1U5ZMtXYQOOVMqBUtPETa-wA=w1111-h917",
+    "XRPLMoonbirds": "https://drive.google.com/drive-viewer/AKGpihYQS43mnX_m3_Z_JcedI_Pd0OoRJWTr6yp-JS3Qz-ubs9ltZTcjfjDwMcfLOSTTzr9f3oMlF6T1U5ZMtXYQOOVMqBUtPETa-wA=w1111-h917",
+    "XChameleons": "https://drive.google.com/drive-viewer/AKGpihZNZl7cb0eP-a3jEDT19ycxxztsJBcXyd-5AsZUyKoKhsM5x9l961FuzghfzfthggvnmHF47Jytg_UsJ3TLO77klPn3ns_sIXE=w1111-h917",
+    "Collab XParrots": "https://drive.google.com/drive-viewer/AKGpihZMuhRvrfffWz8hg2QbwDtOtMswvY4d38V8e_PybgHwXHok5MiGlpVYOraFXv_8rn8bUkj21kLplcBbmucFrOkhcvXgaFwu4GQ=w1111-h917",
+    "XParrots": "https://drive.google.com/drive-viewer/AKGpihZMuhRvrfffWz8hg2QbwDtOtMswvY4d38V8e_PybgHwXHok5MiGlpVYOraFXv_8rn8bUkj21kLplcBbmucFrOkhcvXgaFwu4GQ=w1111-h917",
+}
+
+
+def update_nftLink(nftLink, nftGroupName=None):
+    if not nftLink:
+        placeholder_image = default_images.get(nftGroupName)
+        if placeholder_image is None:
+            raise ValueError("No NFT link image available.")
+        return placeholder_image
+    if not isinstance(nftLink, str):
+        return nftLink
+    if "ipfs.bithomp.com" in nftLink:
+        return nftLink
+    if nftLink.startswith("ipfs://"):
+        # Stored in gateway form, Discord and the LinkValidator need http(s)
+        return nftLink.replace("ipfs://", IPFS_GATEWAY, 1)
+    if ".ipfs.w3s.link" in nftLink or nftLink.startswith("https://ipfs"):
+        return nftLink.replace(".ipfs.w3s.link", "").replace("https://", IPFS_GATEWAY)
+    return nftLink
+
+
+def normaliseNFT(nft: tuple) -> tuple | None:
+    # NFT row laid out as NFT_COLUMNS with its link in final gateway form,
+    # None when there is no image to show for it
+    tokenId, taxonId, nftLink, nftGroupName, xrainValue = nft
+    try:
+        nftLink = update_nftLink(nftLink, nftGroupName)
+    except ValueError:
+        return None
+    return tokenId, taxonId, nftLink, nftGroupName, xrainValue
+
+
+def withPlaceholder(nft: tuple) -> tuple:
+    # Swaps a dead link for the group's placeholder image. The link is None
+    # when the group has none, the NFT is still shown, only without an image
+    tokenId, taxonId, nftLink, nftGroupName, xrainValue = nft
+    nftLink = default_images.get(nftGroupName)
+    return tokenId, taxonId, nftLink, nftGroupName, xrainValue
+
+
+class LinkValidator:
+    # Checks the NFT index's image links in the background and records the
+    # ones the gateway reports as gone, so picks can skip them. Timeouts and
+    # server errors are left for the next pass rather than marked dead
+    def __init__(
+        self,
+        deadLinks: set,
+        recheckInterval: float = 86400.0,
+        batchSize: int = 500,
+        concurrency: int = 10,
+        timeout: float = 10.0,
+    ) -> None:
+        self.deadLinks = deadLinks
+        self.recheckInterval = recheckInterval
+        self.batchSize = batchSize
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+        # link -> monotonic time of its last conclusive check
+        self.checkedAt: dict[str, float] = {}
+        self.httpSession: ClientSession | None = None
+
+    async def validate(self, links) -> int:
+        # Checks up to batchSize links not checked within recheckInterval,
+        # returns how many are dead after the pass
+        now = monotonic()
+        due = []
+        for link in links:
+            checkedAt = self.checkedAt.get(link)
+            if checkedAt is None or now - checkedAt > self.recheckInterval:
+                due.append(link)
+                if len(due) >= self.batchSize:
+                    break
+
+        semaphore = Semaphore(self.concurrency)
+
+        async def check(link):
+            async with semaphore:
+                alive = await self.isAlive(link)
+            if alive is None:
+                return
+            self.checkedAt[link] = monotonic()
+            if alive:
+                self.deadLinks.discard(link)
+            elif link not in self.deadLinks:
+                self.deadLinks.add(link)
+                loggingInstance.warning(f"Dead NFT image link: {link}")
+
+        await gather(*(check(link) for link in due))
+        return len(self.deadLinks)
+
+    async def isAlive(self, link: str) -> bool | None:
+        # None when the check was inconclusive
+        session = self._getHttpSession()
+        try:
+            async with session.head(link, allow_redirects=True) as response:
+                if response.status == 405:
+                    async with session.get(
+                        link, headers={"Range": "bytes=0-0"}
+                    ) as response:
+                        return self._alive(response.status)
+                return self._alive(response.status)
+        except (ClientError, TimeoutError):
+            return None
+
+    async def close(self) -> None:
+        if self.httpSession is not None:
+            await self.httpSession.close()
+
+    def _alive(self, status: int) -> bool | None:
+        if status in DEAD_STATUSES:
+            return False
+        return True if status < 400 else None
+
+    def _getHttpSession(self) -> ClientSession:
+        # Created lazily since aiohttp sessions must be bound to the running loop
+        if self.httpSession is None or self.httpSession.closed:
+            self.httpSession = ClientSession(timeout=ClientTimeout(total=self.timeout))
+        return self.httpSession
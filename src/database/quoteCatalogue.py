@@ -0,0 +1,39 @@
+from sqlalchemy.future import select
+from random import choice
+from time import monotonic
+
+from database.models.claimQuotes import ClaimQuotes
+from utils.logging import loggingInstance
+
+
+class ClaimQuoteCatalogue:
+    def __init__(self) -> None:
+        # taxonId -> tuple of (nftGroupName, description)
+        self.quotes: dict[int, tuple] = {}
+        self.loadedAt: float | None = None
+
+    async def load(self, session) -> None:
+        query = select(
+            ClaimQuotes.taxonId, ClaimQuotes.nftGroupName, ClaimQuotes.description
+        )
+        result = await session.execute(query)
+
+        quotes: dict[int, list] = {}
+        for taxonId, nftGroupName, description in result.all():
+            quotes.setdefault(taxonId, []).append((nftGroupName, description))
+
+        # Swap the whole catalogue at once so readers never see a partial load
+        self.quotes = {taxonId: tuple(rows) for taxonId, rows in quotes.items()}
+        self.loadedAt = monotonic()
+
+        quoteCount = sum(len(rows) for rows in self.quotes.values())
+        loggingInstance.info(f"Claim quotes loaded: {quoteCount} quotes")
+
+    def pick(self, taxonId) -> dict | None:
+        # Retain taxonId if it has quotes, else fall back to taxon 0
+        quotes = self.quotes.get(taxonId) or self.quotes.get(0)
+        if not quotes:
+            return None
+
+        nftGroupName, description = choice(quotes)
+        return {"nftGroupName": nftGroupName, "description": description}
@@ -0,0 +1,94 @@
+from sqlalchemy import bindparam, inspect, update, DateTime
+from sqlalchemy.future import select
+from sqlalchemy.sql import func
+
+from database.claimContext import REWARD_TYPES
+from database.models.rewardstable import RewardsTable
+
+
+# The hot queries, built once at import with bound parameters in place of the
+# per-call values. Executing the same construct lets SQLAlchemy skip building
+# it and hit its compiled cache on the cache key alone.
+#
+# aiomysql only speaks the text protocol, so the compiled SQL still goes to
+# MySQL as a query string. There are no server-side prepared statements to
+# opt into with this driver.
+#
+# Bound parameters are prefixed with b_, SQLAlchemy reserves the bare column
+# names for the SET clause of an UPDATE and refuses to compile them in WHERE.
+
+# Every mapped column of a RewardsTable row, read as plain columns so no ORM
+# instance or identity map entry is built for a row that goes into a dict
+ROW_KEYS = tuple(attribute.key for attribute in inspect(RewardsTable).column_attrs)
+ROW_COLUMNS = tuple(getattr(RewardsTable, key) for key in ROW_KEYS)
+
+REWARDS_ROW = select(
+    *ROW_COLUMNS, func.now(), func.utc_timestamp(type_=DateTime)
+).where(RewardsTable.xrpId == bindparam("b_xrpId"))
+
+# The sessions running these hold no RewardsTable instances, so the UPDATEs
+# skip the session sync, which on MySQL would SELECT the matched rows first
+NO_SYNC = {"synchronize_session": False}
+
+
+def dbTime(clock: str):
+    return func.now() if clock == "now" else func.utc_timestamp(type_=DateTime)
+
+
+def cooldownElapsed(flagColumn, clock: str):
+    return (flagColumn.is_(None)) | (flagColumn <= func.subdate(dbTime(clock), 1))
+
+
+def flagValue(rewardType: str):
+    # The bonus is stamped with the DB time, the other rewards with the
+    # redemption passed in as b_flagValue
+    flagColumn, clock = REWARD_TYPES[rewardType]
+    return dbTime(clock) if rewardType == "bonus" else bindparam("b_flagValue")
+
+
+# rewardType -> statement, one per flag column. CLAIM_FLAG marks a claim,
+# RESTORE_FLAG puts back the flag date a failed payout had replaced
+CLAIM_FLAG = {
+    rewardType: update(RewardsTable)
+    .where(RewardsTable.xrpId == bindparam("b_xrpId"))
+    .values({flagColumn: flagValue(rewardType)})
+    .execution_options(**NO_SYNC)
+    for rewardType, (flagColumn, clock) in REWARD_TYPES.items()
+}
+
+RESTORE_FLAG = {
+    rewardType: update(RewardsTable)
+    .where(RewardsTable.xrpId == bindparam("b_xrpId"))
+    .values({flagColumn: bindparam("b_flagValue")})
+    .execution_options(**NO_SYNC)
+    for rewardType, (flagColumn, clock) in REWARD_TYPES.items()
+}
+
+RESERVE_CLAIM = {
+    rewardType: update(RewardsTable)
+    .where(
+        RewardsTable.xrpId == bindparam("b_xrpId"),
+        cooldownElapsed(flagColumn, clock),
+    )
+    .values({flagColumn: flagValue(rewardType)})
+    .execution_options(**NO_SYNC)
+    for rewardType, (flagColumn, clock) in REWARD_TYPES.items()
+}
+
+LOCK_CLAIMABLE = {
+    rewardType: select(RewardsTable.xrpId)
+    .where(
+        RewardsTable.xrpId.in_(bindparam("b_xrpIds", expanding=True)),
+        cooldownElapsed(flagColumn, clock),
+    )
+    .with_for_update()
+    for rewardType, (flagColumn, clock) in REWARD_TYPES.items()
+}
+
+RESERVE_CLAIMS = {
+    rewardType: update(RewardsTable)
+    .where(RewardsTable.xrpId.in_(bindparam("b_xrpIds", expanding=True)))
+    .values({flagColumn: flagValue(rewardType)})
+    .execution_options(**NO_SYNC)
+    for rewardType, (flagColumn, clock) in REWARD_TYPES.items()
+}
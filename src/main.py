@@ -1,23 +1,47 @@
 from database.db import XparrotDB
 from utils.xrplCommands import XRPClient
+from utils.paymentEngine import paymentRejected
 from utils.config import botConfig, xrplConfig, dbConfig, coinsConfig
 from utils.logging import loggingInstance
+from utils.cooldownStore import CooldownStore, createCooldownBackend
+from utils.payoutOutbox import PayoutOutbox, SettlementWorkers
+from utils.claimScheduler import SchedulerBusy, createClaimScheduler
+from utils.coordinator import (
+    CoordinatorCooldownBackend,
+    InFlightClaims,
+    createCoordinatorClient,
+    shardInfo,
+)
+from utils.metrics import metrics, setResult
 
 from interactions import (
     Intents,
     Client,
     listen,
     InteractionContext,
+    Permissions,
+    Task,
+    IntervalTrigger,
 )  # General discord Interactions import
 from interactions import slash_command, slash_str_option  # Slash command imports
 from interactions import Embed, Button, ButtonStyle
 
 # Other imports
 from datetime import datetime
+from functools import wraps
 from random import randint
 
+# Set when this process is one shard of a shardLauncher deployment, the
+# launcher's coordinator then holds the state shared across processes
+shard = shardInfo()
+coordinatorClient = createCoordinatorClient()
+
 intents = Intents.DEFAULT | Intents.MESSAGE_CONTENT
-client = Client(intents=intents, token=botConfig["token"])
+client = Client(
+    intents=intents,
+    token=botConfig["token"],
+    **({"shard_id": shard[0], "total_shards": shard[1]} if shard else {}),
+)
 
 # Initialize DB connection
 dbInstance = XparrotDB(
@@ -26,36 +50,87 @@ dbInstance = XparrotDB(
     username=dbConfig["db_username"],
     password=dbConfig["db_password"],
     verbose=dbConfig.getboolean("verbose"),
+    coordinator=coordinatorClient,
 )
 
-xrplInstance = XRPClient(xrplConfig)
+xrplInstance = XRPClient(xrplConfig, coordinator=coordinatorClient)
 
 botVerbosity = botConfig.getboolean("verbose")
 
 MIN_NFT_TO_CLAIM = coinsConfig.getint("min_nft_count")
 
-cooldowns = {}
+COMMAND_COOLDOWN = botConfig.getfloat("command_cooldown")
 
+cooldownStore = CooldownStore(
+    duration=COMMAND_COOLDOWN,
+    backend=(
+        CoordinatorCooldownBackend(coordinatorClient)
+        if coordinatorClient
+        else createCooldownBackend(botConfig)
+    ),
+)
 
-async def is_on_cooldown(ctx: InteractionContext) -> bool:
-    user_id = ctx.author_id
-    command_name = ctx._command_name
-    if command_name not in cooldowns:
-        cooldowns[command_name] = {}
+# Claims being processed, so one holder is only worked on by one shard at a time
+inFlightClaims = InFlightClaims(
+    coordinatorClient, ttl=botConfig.getfloat("claim_lease_ttl", fallback=120.0)
+)
 
-    """Check if the user is on cooldown for a specific command."""
-    print(f"Checking {user_id} for cooldown")
-    now = datetime.now()
-    if user_id in cooldowns[command_name]:
-        last_used = cooldowns[command_name][user_id]
-        if (now - last_used).total_seconds() < botConfig.getfloat("command_cooldown"):
-            await ctx.send(
-                f"You are on cooldown for this command. Please wait {botConfig.getfloat("command_cooldown")}s before using it again.",
-                ephemeral=True,
+claimScheduler = createClaimScheduler(botConfig)
+
+
+async def respond(ctx: InteractionContext, *args, **kwargs):
+    # Every reply goes through here so Discord latency shows up as its own stage
+    with metrics.span("discord_send"):
+        return await ctx.send(*args, **kwargs)
+
+
+def scheduled(handler):
+    # Admits a claim command through the scheduler, telling the user their
+    # queue position when it has to wait and turning it away when shed
+    @wraps(handler)
+    async def wrapper(ctx: InteractionContext):
+        # Checked before the defer, a deferred reply can no longer be made
+        # ephemeral and a user on cooldown never takes a place in the queue
+        if await is_on_cooldown(ctx):
+            return
+
+        await ctx.defer()  # Defer the response to wait for the function to run.
+
+        async def onQueued(position):
+            await respond(
+                ctx,
+                f"Lots of claims are coming in, you are **#{position}** in the queue. Your claim will continue shortly.",
             )
-            return True
 
-    cooldowns[command_name][user_id] = datetime.now()
+        try:
+            async with claimScheduler.admit(onQueued):
+                return await handler(ctx)
+        except SchedulerBusy as e:
+            setResult("Busy")
+            loggingInstance.warning(f"Claim by {ctx.author_id} shed: {e}")
+            embed = Embed(
+                title="XRAIN Claim",
+                description="The claim service is very busy right now, please try again in a few minutes.",
+                timestamp=datetime.now(),
+            )
+            embed.set_footer(text="XRPLRainforest Bonus")
+            await respond(ctx, embed=embed)
+
+    return wrapper
+
+
+async def is_on_cooldown(ctx: InteractionContext) -> bool:
+    """Check if the user is on cooldown for a specific command."""
+    remaining = await cooldownStore.hit(ctx._command_name, ctx.author_id)
+    if remaining:
+        setResult("Cooldown")
+        await respond(
+            ctx,
+            f"You are on cooldown for this command. Please wait {COMMAND_COOLDOWN}s before using it again.",
+            ephemeral=True,
+        )
+        return True
+
     return False
 
 
@@ -79,8 +154,41 @@ def precision(value, precision=6):
     return round(float(value), precision)
 
 
-async def sendCoin(value, address, memos, ctx):
-    status = True
+def payoutErrorEmbed(error):
+    if "tecPATH_DRY" in str(error):
+        embed = Embed(
+            title="XRAIN Claim",
+            description=f"Please setup XRAIN trustline to claim rewards by clicking this [link](https://xrpl.services/?issuer=rh3tLHbXwZsp7eciw2Qp8g7bN9RnyGa2pF&currency=585241494E000000000000000000000000000000&limit=21000000)",
+            timestamp=datetime.now(),
+        )
+    elif "Connection timeout" in str(error):
+        embed = Embed(
+            title="XRAIN Claim",
+            description=f"Error connecting to the XRPL Server, your payout may still arrive. Please open a support ticket if it has not arrived within a few minutes.",
+            timestamp=datetime.now(),
+        )
+    else:
+        embed = Embed(
+            title="XRAIN Claim",
+            description=f"{error if error is not None else 'Unknown'} error occurred",
+            timestamp=datetime.now(),
+        )
+    return embed
+
+
+async def respondQueued(ctx, amount):
+    # An outbox payout is only submitted by the settlement workers, the holder
+    # is told here once onPayoutSettled has the final result
+    embed = Embed(
+        title="XRAIN Claim",
+        description=f"Your **__{amount}__** XRAIN payout is being processed. You will be notified here once it is confirmed on the XRPL.",
+        timestamp=datetime.now(),
+    )
+    embed.set_footer(text="XRPLRainforest Bonus")
+    await respond(ctx, embed=embed)
+
+
+async def sendCoin(value, address, memos, ctx) -> dict:
     sendSuccess = await xrplInstance.sendCoin(
         address=address,
         value=precision(value),
@@ -89,34 +197,144 @@ async def sendCoin(value, address, memos, ctx):
     )
 
     if not sendSuccess["result"]:
-        status = False
-        if "tecPATH_DRY" in str(sendSuccess["error"]):
-            embed = Embed(
-                title="XRAIN Claim",
-                description=f"Please setup XRAIN trustline to claim rewards by clicking this [link](https://xrpl.services/?issuer=rh3tLHbXwZsp7eciw2Qp8g7bN9RnyGa2pF&currency=585241494E000000000000000000000000000000&limit=21000000)",
-                timestamp=datetime.now(),
-            )
-        elif "Connection timeout" in str(sendSuccess["error"]):
-            embed = Embed(
-                title="XRAIN Claim",
-                description=f"Error connecting to the XRPL Server, please try again",
-                timestamp=datetime.now(),
+        setResult(sendSuccess["error"])
+        await respond(ctx, embed=payoutErrorEmbed(sendSuccess["error"]))
+
+    return sendSuccess
+
+
+async def onPayoutSettled(payout, result):
+    # Called by the settlement workers once an outbox payout is final
+    if not result["result"]:
+        lastClaim = payout["lastClaim"]
+        await dbInstance.releaseClaim(
+            payout["xrpId"],
+            payout["rewardType"],
+            datetime.fromisoformat(lastClaim) if lastClaim else None,
+        )
+
+    if payout["channelId"] is None:
+        return
+
+    if result["result"]:
+        embed = Embed(
+            title="XRAIN Claim",
+            description=f"Your **__{payout['amount']}__** XRAIN payout has been confirmed on the XRPL.",
+            timestamp=datetime.now(),
+        )
+    else:
+        embed = payoutErrorEmbed(result["error"])
+    embed.set_footer(text="XRPLRainforest Bonus")
+
+    try:
+        channel = await client.fetch_channel(int(payout["channelId"]))
+        await channel.send(f"<@{payout['userId']}>", embed=embed)
+    except Exception as e:
+        loggingInstance.error(f"onPayoutSettled({payout['payoutId']}): {e}")
+
+
+PAYOUT_MODE = xrplConfig.get("payout_mode", fallback="direct")
+
+# Returned by sendClaim when the payout went to the outbox and is not paid yet
+PAYOUT_QUEUED = "Queued"
+
+payoutOutbox = None
+settlementWorkers = None
+if PAYOUT_MODE == "outbox":
+    payoutOutbox = PayoutOutbox(
+        xrplConfig.get("outbox_path", fallback="payouts.sqlite3")
+    )
+    settlementWorkers = SettlementWorkers(
+        payoutOutbox,
+        xrplInstance,
+        workers=xrplConfig.getint("settlement_workers", fallback=4),
+        onSettled=onPayoutSettled,
+    )
+
+
+async def payClaim(ctx, xrpId, rewardType, value, memos, lastClaim):
+    try:
+        return await sendClaim(ctx, xrpId, rewardType, value, memos, lastClaim)
+    finally:
+        await inFlightClaims.release(f"{rewardType}:{xrpId}")
+
+
+async def sendClaim(ctx, xrpId, rewardType, value, memos, lastClaim):
+    # Pays a reserved claim, either inline or through the durable outbox where
+    # the settlement workers submit, confirm and report back in the channel
+    if payoutOutbox is None:
+        async with claimScheduler.limit("xrpl"):
+            sendSuccess = await sendCoin(
+                value=value, address=xrpId, memos=memos, ctx=ctx
             )
+        if sendSuccess["result"]:
+            return True
+
+        if paymentRejected(sendSuccess["error"]):
+            async with claimScheduler.limit("db"):
+                await dbInstance.releaseClaim(xrpId, rewardType, lastClaim)
         else:
-            embed = Embed(
-                title="XRAIN Claim",
-                description=f"{sendSuccess['error'] if sendSuccess['error'] is not None else 'Unknown'} error occurred",
-                timestamp=datetime.now(),
+            # The payment may still apply, so the slot stays reserved rather
+            # than letting the holder claim and be paid twice
+            loggingInstance.error(
+                f"Claim {rewardType}:{xrpId} left reserved, payment outcome "
+                f"unknown ({sendSuccess['error']}), reconcile before releasing"
             )
-        await ctx.send(embed=embed)
+        return False
+
+    await payoutOutbox.enqueue(
+        {
+            "payoutKey": f"{rewardType}:{xrpId}:{lastClaim}",
+            "xrpId": xrpId,
+            "rewardType": rewardType,
+            "amount": precision(value),
+            "coinHex": coinsConfig["XRAIN"],
+            "memos": memos,
+            "lastClaim": lastClaim.isoformat() if lastClaim else None,
+            "channelId": str(ctx.channel_id),
+            "userId": str(ctx.author_id),
+        }
+    )
+    settlementWorkers.notify()
+    setResult(PAYOUT_QUEUED)
+    return PAYOUT_QUEUED
 
-    return status
+
+async def reserveClaim(xrpId, rewardType, ctx):
+    # Claims the reward period before paying, a concurrent claim for the same
+    # xrpId that already won the slot makes this one back off. payClaim
+    # releases the in-flight lease once the payment is done
+    claimKey = f"{rewardType}:{xrpId}"
+    if await inFlightClaims.acquire(claimKey):
+        try:
+            async with claimScheduler.limit("db"):
+                reserved = await dbInstance.reserveClaim(xrpId, rewardType)
+        except Exception:
+            await inFlightClaims.release(claimKey)
+            raise
+        if reserved:
+            return True
+        await inFlightClaims.release(claimKey)
+
+    setResult("AlreadyReserved")
+
+    embed = Embed(
+        title="XRAIN Claim",
+        description="Your rewards for this period have already been claimed or are being processed.",
+        timestamp=datetime.now(),
+    )
+    embed.set_footer(text="XRPLRainforest Bonus")
+    await respond(ctx, embed=embed)
+
+    return False
 
 
 async def checkStatus(result, ctx, rewardName):
     if result["result"] == "Claimable":
         return True
 
+    setResult(result["result"])
+
     if result["result"] == "NotReady":
         remainingHour = result["timeRemaining"]["hour"]
         remainingMinute = result["timeRemaining"]["minute"]
@@ -151,7 +369,7 @@ async def checkStatus(result, ctx, rewardName):
         embed = prepare_message(
             f"Your XRP ID does not hold enough OG NFTs. You must hold a min of {MIN_NFT_TO_CLAIM} OG NFT to the bonus tokens."
         )
-        await ctx.send(embed=embed)
+        await respond(ctx, embed=embed)
         return
 
     else:
@@ -162,7 +380,7 @@ async def checkStatus(result, ctx, rewardName):
         )
 
     embed.set_footer(text="XRPLRainforest Bonus")
-    await ctx.send(embed=embed)
+    await respond(ctx, embed=embed)
 
     return False
 
@@ -179,10 +397,120 @@ def random_color():
 @listen()
 async def on_ready():
     # Some function to do when the bot is ready
-    await xrplInstance.registerSeed(xrplConfig["seed"])
+    await xrplInstance.registerSeeds(xrplInstance.getSeeds())
+    await xrplInstance.start()
+    await dbInstance.warmPool()
+    dbKeepalive.start()
+    # Every shard enqueues payouts, only the first one settles them
+    if settlementWorkers is not None and (shard is None or shard[0] == 0):
+        settlementWorkers.start()
+    if dbConfig.getboolean("nft_index_preload", fallback=False):
+        await dbInstance.loadNFTIndex()
+    if dbConfig.getboolean("nft_link_validation", fallback=False):
+        validateNFTLinks.start()
+    await dbInstance.refreshClaimQuotes()
+    refreshClaimQuotes.start()
+    if dbConfig.getboolean("eligibility_snapshot", fallback=False):
+        await dbInstance.loadEligibility()
+        refreshEligibility.start()
+
+    # One metrics port per shard, counted up from metrics_port
+    metricsPort = botConfig.getint("metrics_port", fallback=0)
+    if metricsPort:
+        metricsPort += shard[0] if shard else 0
+        await metrics.serve(
+            botConfig.get("metrics_host", fallback="127.0.0.1"), metricsPort
+        )
     loggingInstance.info(f"Discord Bot Ready!")
 
 
+@Task.create(
+    IntervalTrigger(seconds=dbConfig.getint("quote_refresh_interval", fallback=3600))
+)
+async def refreshClaimQuotes():
+    try:
+        await dbInstance.refreshClaimQuotes()
+    except Exception as e:
+        loggingInstance.error(f"refreshClaimQuotes: {e}")
+
+
+@Task.create(
+    IntervalTrigger(seconds=dbConfig.getint("nft_link_check_interval", fallback=600))
+)
+async def validateNFTLinks():
+    try:
+        await dbInstance.validateLinks()
+    except Exception as e:
+        loggingInstance.error(f"validateNFTLinks: {e}")
+
+
+@Task.create(
+    IntervalTrigger(seconds=dbConfig.getint("pool_keepalive_interval", fallback=60))
+)
+async def dbKeepalive():
+    try:
+        await dbInstance.keepalive()
+    except Exception as e:
+        loggingInstance.error(f"dbKeepalive: {e}")
+
+
+@Task.create(
+    IntervalTrigger(seconds=dbConfig.getint("eligibility_delta_interval", fallback=60))
+)
+async def refreshEligibility():
+    try:
+        await dbInstance.refreshEligibility()
+    except Exception as e:
+        loggingInstance.error(f"refreshEligibility: {e}")
+
+
+@slash_command(
+    name="reload-quotes",
+    description="Reload the claim quotes from the database",
+    default_member_permissions=Permissions.ADMINISTRATOR,
+)
+async def reloadQuotes(ctx: InteractionContext):
+    await ctx.defer(ephemeral=True)
+
+    loggingInstance.info(f"/reload-quotes requested by {ctx.author.display_name}")
+
+    try:
+        await dbInstance.refreshClaimQuotes()
+    except Exception as e:
+        await respond(ctx, f"{e} error occurred", ephemeral=True)
+        return
+
+    await respond(ctx, "Claim quotes reloaded", ephemeral=True)
+
+
+@slash_command(
+    name="bot-metrics",
+    description="Show per-stage latency and claim results",
+    default_member_permissions=Permissions.ADMINISTRATOR,
+)
+async def botMetrics(ctx: InteractionContext):
+    summary = metrics.summary() or "No metrics recorded yet"
+    schedulerStats = ", ".join(
+        f"{key}={value}" for key, value in claimScheduler.stats().items()
+    )
+    cacheStats = ", ".join(
+        f"{key}={value}" for key, value in dbInstance.cacheStats().items()
+    )
+    poolStats = ", ".join(
+        f"{key}={value}" for key, value in dbInstance.poolStats().items()
+    )
+    summary = (
+        f"scheduler: {schedulerStats}\ncache: {cacheStats}\n"
+        f"db pool: {poolStats}\n{summary}"
+    )
+
+    # Keep within Discord's message limit, the full set is on the metrics endpoint
+    if len(summary) > 1900:
+        summary = summary[:1900] + "\n..."
+
+    await respond(ctx, f"```\n{summary}\n```", ephemeral=True)
+
+
 # Dailies Command:
 # Parameters:
 #       XRP ID: [Required] XRP Address where the users hold their NFTs and the receipient of the reward
@@ -197,12 +525,9 @@ async def on_ready():
         )
     ],
 )
+@metrics.command("bonus-xrain")
+@scheduled
 async def bonusXrain(ctx: InteractionContext):
-    await ctx.defer()  # Defer the response to wait for the function to run.
-
-    if await is_on_cooldown(ctx):
-        return
-
     (
         loggingInstance.info(f"Bonus Claim requested by {ctx.author.display_name}")
         if botVerbosity
@@ -211,22 +536,40 @@ async def bonusXrain(ctx: InteractionContext):
 
     xrpId = ctx.args[0]
 
-    result = await dbInstance.getBonusStatus(xrpId)
+    async with claimScheduler.limit("db"):
+        claimContext = await dbInstance.getClaimContext(
+            xrpId, "bonus", minNftCount=MIN_NFT_TO_CLAIM
+        )
 
-    claimable = await checkStatus(result, ctx, rewardName="Bonus XRAIN")
+    claimable = await checkStatus(claimContext.status, ctx, rewardName="Bonus XRAIN")
 
     if not claimable:
         return
 
-    claimInfo = await dbInstance.getBonusAmount(xrpId)
-    if claimInfo["result"] == "Success":
-        claimImage = claimInfo["nftLink"]
-        tokenId = claimInfo["tokenId"]
+    if claimContext.nft:
+        claimImage = claimContext.nft["nftLink"]
+        tokenId = claimContext.nft["tokenId"]
 
-        claimAmount = xrplInstance.getAccountBalance(xrpId, coinsConfig["XRAIN"])
+        async with claimScheduler.limit("balance"):
+            claimAmount = await xrplInstance.getAccountBalance(
+                xrpId, coinsConfig["XRAIN"], xrplConfig.get("coin_issuer")
+            )
         minXrainCount = coinsConfig.getfloat("min_xrain_count")
 
-        if claimAmount and claimAmount < minXrainCount:
+        # False when the lookup failed or there is no XRAIN trustline, either
+        # way there is no amount to pay so nothing is reserved
+        if claimAmount is False:
+            embed = Embed(
+                title="XRAIN Claim",
+                description="Your $XRAIN balance could not be read. Please make sure your XRAIN trustline is set and try again in a few minutes.",
+                timestamp=datetime.now(),
+            )
+            embed.set_footer(text="XRPLRainforest Bonus")
+            setResult("BalanceUnavailable")
+            await respond(ctx, embed=embed)
+            return
+
+        if claimAmount < minXrainCount:
             embed = prepare_message(
                 message=f"Your XRP ID does not hold enough $XRAIN. You must hold a min of {minXrainCount} $XRAIN and {MIN_NFT_TO_CLAIM} OG NFT to claim daily XRAIN reward.",
                 title="Daily Claim",
@@ -236,22 +579,30 @@ async def bonusXrain(ctx: InteractionContext):
                 label="Buy More",
                 url=coinsConfig.get("xrain_buy_link"),
             )
-            await ctx.send(embed=embed, components=button)
+            setResult("minXRAINCount")
+            await respond(ctx, embed=embed, components=button)
             return
 
         claimAmount *= coinsConfig.getfloat("daily_multiplier")
 
-        sendSuccess = await sendCoin(
-            value=claimAmount,
-            address=xrpId,
-            memos="XRPLRainforest Bonus Rewards",
-            ctx=ctx,
+        if not await reserveClaim(xrpId, "bonus", ctx):
+            return
+
+        paid = await payClaim(
+            ctx,
+            xrpId,
+            "bonus",
+            claimAmount,
+            "XRPLRainforest Bonus Rewards",
+            claimContext.lastClaim,
         )
 
-        if not sendSuccess:
+        if not paid:
             return
 
-        await dbInstance.bonusSet(xrpId)
+        if paid == PAYOUT_QUEUED:
+            await respondQueued(ctx, precision(claimAmount))
+            return
 
         authorName = escapeMarkdown(ctx.author.display_name)
 
@@ -265,19 +616,23 @@ async def bonusXrain(ctx: InteractionContext):
             description=f"[View NFT Details](https://xrp.cafe/nft/{tokenId})"
         )
 
-        imageEmbed.set_image(url=claimImage)
+        # None when every link of the NFT is dead and there is no placeholder
+        if claimImage:
+            imageEmbed.set_image(url=claimImage)
 
-        await ctx.send(embeds=[claimEmbed, imageEmbed])
+        setResult("Success")
+        await respond(ctx, embeds=[claimEmbed, imageEmbed])
     else:
         embed = Embed(
             title="XRAIN Claim",
-            description=f"{claimInfo['result']} error occurred",
+            description=f"XrpIdNotFound error occurred",
             timestamp=datetime.now(),
         )
 
         embed.set_footer(text="XRPLRainforest Bonus")
 
-        await ctx.send(embed=embed)
+        setResult("XrpIdNotFound")
+        await respond(ctx, embed=embed)
 
 
 @slash_command(
@@ -291,6 +646,8 @@ async def bonusXrain(ctx: InteractionContext):
         )
     ],
 )
+@metrics.command("daily-xrain-traits")
+@scheduled
 async def biweeklyXrainTraits(ctx: InteractionContext):
 
     (
@@ -301,43 +658,52 @@ async def biweeklyXrainTraits(ctx: InteractionContext):
         else None
     )
 
-    await ctx.defer()  # Defer the response to wait for the function to run.
+    xrpId = ctx.args[0]
 
-    if await is_on_cooldown(ctx):
-        return
+    async with claimScheduler.limit("db"):
+        claimContext = await dbInstance.getClaimContext(xrpId, "traits", withQuote=True)
 
-    xrpId = ctx.args[0]
+    claimable = await checkStatus(claimContext.status, ctx, rewardName="Traits XRAIN")
 
-    try:
-        result = await dbInstance.getPenaltyStatus(xrpId)
-        randomNFT = await dbInstance.getRandomNFT(xrpId)
-        if randomNFT == "NoNFTFound":
-            raise Exception("NoNFTFound")
-    except Exception as e:
-        await ctx.send(f"{e} error occurred")
+    if not claimable:
         return
 
-    claimable = await checkStatus(result, ctx, rewardName="Traits XRAIN")
+    # The NFT and quote are shown with the claim, so check them before paying
+    if claimContext.nft is None:
+        setResult("NoNFTFound")
+        await respond(ctx, "NoNFTFound error occurred")
+        return
 
-    if not claimable:
+    if claimContext.quote is None:
+        setResult("ClaimQuoteError")
+        await respond(ctx, "ClaimQuoteError error occurred")
         return
 
-    amount = max(precision(result["amount"] / 30), 0.01)
+    randomNFT = claimContext.nft
+    claimMessage = claimContext.quote
+
+    amount = max(precision(claimContext.traitsAmount / 30), 0.01)
 
-    sendSuccess = await sendCoin(
-        address=xrpId,
-        value=amount,
-        memos="XRPLRainforest Bonus Biweekly Trait Rewards",
-        ctx=ctx,
+    if not await reserveClaim(xrpId, "traits", ctx):
+        return
+
+    paid = await payClaim(
+        ctx,
+        xrpId,
+        "traits",
+        amount,
+        "XRPLRainforest Bonus Biweekly Trait Rewards",
+        claimContext.lastClaim,
     )
 
-    if not sendSuccess:
+    if not paid:
         return
 
-    await dbInstance.setPenaltyStatusClaimed(xrpId)
+    if paid == PAYOUT_QUEUED:
+        await respondQueued(ctx, amount)
+        return
 
     nftLink = randomNFT["nftLink"]
-    claimMessage = await dbInstance.getClaimQuote(randomNFT["taxonId"])
 
     authorName = escapeMarkdown(ctx.author.display_name)
 
@@ -356,10 +722,11 @@ async def biweeklyXrainTraits(ctx: InteractionContext):
         description=f"[View NFT Details](https://xrp.cafe/nft/{randomNFT['tokenId']})"
     )
 
-    if nftLink != "NoNFTFound":
+    if nftLink and nftLink != "NoNFTFound":
         imageEmbed.add_image(nftLink)
 
-    await ctx.send(embeds=[embedClaim, imageEmbed, embedText])
+    setResult("Success")
+    await respond(ctx, embeds=[embedClaim, imageEmbed, embedText])
 
 
 @slash_command(
@@ -373,13 +740,9 @@ async def biweeklyXrainTraits(ctx: InteractionContext):
         )
     ],
 )
+@metrics.command("xrain-amm-claim")
+@scheduled
 async def xrain_amm_claim(ctx: InteractionContext):
-
-    if await is_on_cooldown(ctx=ctx):
-        return
-
-    await ctx.defer()  # Defer the response to wait for the function to run.
-
     (
         loggingInstance.info(
             f"/xrain_amm_claim requested by {ctx.author.display_name}: {ctx.author_id}"
@@ -390,9 +753,10 @@ async def xrain_amm_claim(ctx: InteractionContext):
 
     xrpId = ctx.args[0]
 
-    coinBalance = await xrplInstance.getAccountBalance(
-        xrpId, coinsConfig.get("XRAIN_LP")
-    )
+    async with claimScheduler.limit("balance"):
+        coinBalance = await xrplInstance.getAccountBalance(
+            xrpId, coinsConfig.get("XRAIN_LP"), xrplConfig.get("lp_issuer")
+        )
 
     if not coinBalance or coinBalance < coinsConfig.getfloat("min_lp_count"):
         buy_link = (
@@ -407,14 +771,19 @@ async def xrain_amm_claim(ctx: InteractionContext):
             label="Add Liquidity",
             url=buy_link,
         )
-        await ctx.send(embed=embed, components=button)
+        setResult("minLPCount")
+        await respond(ctx, embed=embed, components=button)
         return
 
-    result = await dbInstance.get_amm_status(
-        xrpId, min_amount=coinsConfig.getint("min_nft_count")
-    )
+    async with claimScheduler.limit("db"):
+        claimContext = await dbInstance.getClaimContext(
+            xrpId,
+            "amm",
+            minNftCount=coinsConfig.getint("min_nft_count"),
+            withQuote=True,
+        )
 
-    claimable = await checkStatus(result, ctx, rewardName="XRAIN AMM")
+    claimable = await checkStatus(claimContext.status, ctx, rewardName="XRAIN AMM")
 
     if not claimable:
         return
@@ -422,21 +791,29 @@ async def xrain_amm_claim(ctx: InteractionContext):
     claimAmount = precision(
         float(coinBalance * coinsConfig.getfloat("xrain_multiplier"))
     )
-    sendSuccess = await sendCoin(
-        address=xrpId,
-        value=claimAmount,
-        memos="XRPLRainforest Bonus AMM Rewards",
-        ctx=ctx,
+
+    if not await reserveClaim(xrpId, "amm", ctx):
+        return
+
+    paid = await payClaim(
+        ctx,
+        xrpId,
+        "amm",
+        claimAmount,
+        "XRPLRainforest Bonus AMM Rewards",
+        claimContext.lastClaim,
     )
 
-    if not sendSuccess:
+    if not paid:
+        return
+
+    if paid == PAYOUT_QUEUED:
+        await respondQueued(ctx, claimAmount)
         return
 
     embeds = []
     color = random_color()
 
-    await dbInstance.update_amm_claimed(xrpId)
-
     authorName = escapeMarkdown(ctx.author.display_name)
 
     claimEmbed = prepare_message(
@@ -446,20 +823,14 @@ async def xrain_amm_claim(ctx: InteractionContext):
     )
     embeds.append(claimEmbed)
 
-    nftInfo = await dbInstance.getRandomNFT(xrpId)
-    if "nftLink" in nftInfo:
+    if claimContext.nft and claimContext.nft["nftLink"]:
         imageEmbed = Embed(color=color)
-        imageEmbed.add_image(nftInfo["nftLink"])
+        imageEmbed.add_image(claimContext.nft["nftLink"])
         embeds.append(imageEmbed)
 
-    if "taxonId" in nftInfo:
-        try:
-            message = await dbInstance.getClaimQuote(nftInfo["taxonId"])
-        except Exception as e:
-            await ctx.send(f"{e} error occurred")
-            return
+    if claimContext.quote:
         messageEmbed = Embed(
-            description=f"**{message['description']}**",
+            description=f"**{claimContext.quote['description']}**",
             timestamp=datetime.now(),
             color=color,
         )
@@ -468,7 +839,8 @@ async def xrain_amm_claim(ctx: InteractionContext):
     embeds[-1].timestamp = datetime.now()
     embeds[-1].set_footer("XRPL Rainforest AMM Claim")
 
-    await ctx.send(embeds=embeds)
+    setResult("Success")
+    await respond(ctx, embeds=embeds)
 
 
 if __name__ == "__main__":
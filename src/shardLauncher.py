@@ -0,0 +1,107 @@
+"""
+Sharded launch of the bot over several worker processes.
+
+Starts one main.py process per gateway shard and serves the state they share,
+command cooldowns, in-flight claims and hot wallet sequences, from a
+coordinator on a unix socket in this process. Workers that exit are restarted
+until the launcher is stopped.
+
+    python shardLauncher.py --shards 4
+"""
+
+from argparse import ArgumentParser
+from asyncio import (
+    Event,
+    create_subprocess_exec,
+    gather,
+    get_running_loop,
+    run,
+    sleep,
+)
+from asyncio.exceptions import CancelledError
+from os import cpu_count, environ, path
+from signal import SIGINT, SIGTERM
+import sys
+
+from utils.config import botConfig
+from utils.coordinator import (
+    COORDINATOR_ENV,
+    SHARD_ID_ENV,
+    TOTAL_SHARDS_ENV,
+    Coordinator,
+)
+from utils.logging import loggingInstance
+
+
+MAIN_SCRIPT = path.join(path.dirname(path.abspath(__file__)), "main.py")
+
+
+async def superviseShard(shardId, args, stopping):
+    # Runs one shard, restarting it with a growing delay while it keeps failing
+    environment = {
+        **environ,
+        COORDINATOR_ENV: args.socket,
+        SHARD_ID_ENV: str(shardId),
+        TOTAL_SHARDS_ENV: str(args.shards),
+    }
+    delay = args.restart_delay
+    while not stopping.is_set():
+        process = await create_subprocess_exec(
+            sys.executable, MAIN_SCRIPT, env=environment
+        )
+        loggingInstance.info(f"Shard {shardId} started as pid {process.pid}")
+
+        try:
+            returnCode = await process.wait()
+        except CancelledError:
+            process.terminate()
+            await process.wait()
+            raise
+
+        if stopping.is_set():
+            return
+        loggingInstance.error(
+            f"Shard {shardId} exited with {returnCode}, restarting in {delay}s"
+        )
+        await sleep(delay)
+        delay = min(delay * 2, args.max_restart_delay)
+
+
+async def launch(args):
+    coordinator = Coordinator(
+        args.socket, botConfig.getint("cooldown_max_entries", fallback=100000)
+    )
+    await coordinator.start()
+
+    stopping = Event()
+    shards = [
+        get_running_loop().create_task(superviseShard(shardId, args, stopping))
+        for shardId in range(args.shards)
+    ]
+
+    def stop():
+        stopping.set()
+        for shard in shards:
+            shard.cancel()
+
+    for signal in (SIGINT, SIGTERM):
+        get_running_loop().add_signal_handler(signal, stop)
+
+    await gather(*shards, return_exceptions=True)
+    await coordinator.close()
+    loggingInstance.info("All shards stopped")
+
+
+def parseArgs():
+    parser = ArgumentParser(description="Run the bot as several sharded processes")
+    parser.add_argument("--shards", type=int, default=cpu_count() or 1)
+    parser.add_argument("--socket", default="xrain-coordinator.sock")
+    parser.add_argument("--restart-delay", type=float, default=1.0)
+    parser.add_argument("--max-restart-delay", type=float, default=60.0)
+    args = parser.parse_args()
+    args.socket = path.abspath(args.socket)
+    return args
+
+
+if __name__ == "__main__":
+    run(launch(parseArgs()))
@@ -0,0 +1,128 @@
+from asyncio import Future, Semaphore, get_running_loop, wait_for
+from asyncio.exceptions import TimeoutError
+from collections import deque
+from contextlib import asynccontextmanager
+
+from utils.metrics import metrics
+
+
+# Downstreams a claim talks to, each with its own concurrency limit
+DOWNSTREAMS = ("db", "xrpl", "balance")
+
+
+class SchedulerBusy(Exception):
+    pass
+
+
+class ClaimScheduler:
+    def __init__(
+        self,
+        maxActive: int = 50,
+        maxQueued: int = 500,
+        queueTimeout: float = 60.0,
+        limits: dict[str, int] | None = None,
+    ) -> None:
+        self.maxActive = maxActive
+        self.maxQueued = maxQueued
+        self.queueTimeout = queueTimeout
+
+        self.active = 0
+        # FIFO of claims waiting for an active slot, a slot is handed over
+        # directly to the head so late arrivals cannot jump the queue
+        self.waiters: deque[Future] = deque()
+
+        self.limits = {
+            name: Semaphore(size) for name, size in (limits or {}).items() if size > 0
+        }
+
+    @asynccontextmanager
+    async def admit(self, onQueued=None):
+        # onQueued is awaited with the 1-based queue position when the claim
+        # has to wait. Raises SchedulerBusy when the claim is shed instead
+        await self._acquire(onQueued)
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def limit(self, downstream: str):
+        semaphore = self.limits.get(downstream)
+        if semaphore is None:
+            yield
+            return
+
+        with metrics.span("scheduler_wait", downstream=downstream):
+            await semaphore.acquire()
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "queued": len(self.waiters),
+            **{
+                f"{name}Available": semaphore._value
+                for name, semaphore in self.limits.items()
+            },
+        }
+
+    async def _acquire(self, onQueued) -> None:
+        if self.active < self.maxActive and not self.waiters:
+            self.active += 1
+            return
+
+        if len(self.waiters) >= self.maxQueued:
+            metrics.increment("xrain_claims_shed_total", reason="queueFull")
+            raise SchedulerBusy("queueFull")
+
+        waiter = get_running_loop().create_future()
+        self.waiters.append(waiter)
+        metrics.increment("xrain_claims_queued_total")
+
+        try:
+            if onQueued is not None:
+                await onQueued(len(self.waiters))
+            with metrics.span("scheduler_queue"):
+                await wait_for(waiter, timeout=self.queueTimeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the wait gave up
+                self._release()
+            else:
+                waiter.cancel()
+                self._discard(waiter)
+
+            if isinstance(e, TimeoutError):
+                metrics.increment("xrain_claims_shed_total", reason="queueTimeout")
+                raise SchedulerBusy("queueTimeout") from None
+            raise
+
+    def _release(self) -> None:
+        # Hand the slot to the next live waiter, otherwise free it
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _discard(self, waiter: Future) -> None:
+        try:
+            self.waiters.remove(waiter)
+        except ValueError:
+            pass
+
+
+def createClaimScheduler(config) -> ClaimScheduler:
+    return ClaimScheduler(
+        maxActive=config.getint("claim_max_active", fallback=50),
+        maxQueued=config.getint("claim_max_queued", fallback=500),
+        queueTimeout=config.getfloat("claim_queue_timeout", fallback=60.0),
+        limits={
+            name: config.getint(f"{name}_concurrency", fallback=0)
+            for name in DOWNSTREAMS
+        },
+    )
@@ -3,18 +3,85 @@ Make sure to have a "config.ini" file that has the following template:
 [BOT]
 token = kansbdqwohzxmnmqweabksdb
 verbose = True
+command_cooldown = 5
+cooldown_backend = memory
+cooldown_path = cooldowns.sqlite3
+cooldown_max_entries = 100000
+metrics_host = 127.0.0.1
+metrics_port = 9108
+claim_max_active = 50
+claim_max_queued = 500
+claim_queue_timeout = 60
+db_concurrency = 10
+xrpl_concurrency = 20
+balance_concurrency = 10
+claim_lease_ttl = 120
 
 [XRPL]
 testnet_link = wss://s.altnet.rippletest.net:51233/
 mainnet_link = wss://s1.ripple.com/
+mainnet_links = wss://s1.ripple.com/, wss://s2.ripple.com/, wss://xrplcluster.com/
+testnet_links =
 test_mode = False
 verbose = True
+pool_size = 2
+pool_health_interval = 30
+hedge_delay = 0.5
+max_in_flight = 20
+seeds =
+bulk_seeds =
+coin_issuer =
+lp_issuer =
+wallet_strategy = least_in_flight
+wallet_min_balance = 1000
+wallet_min_xrp = 20
+wallet_refresh_interval = 60
+local_autofill = True
+autofill_ledger_offset = 20
+autofill_fee_cushion = 1.2
+autofill_max_fee = 1000
+balance_source = xrpscan
+balance_timeout = 5
+balance_api = https://api.xrpscan.com/api/v1
+balance_cache_ttl = 60
+balance_cache_size = 10000
+payout_mode = direct
+outbox_path = payouts.sqlite3
+settlement_workers = 4
 
 [DB]
 db_server = 192.168.254.100
 db_name = databaseName
 db_username = root
 db_password = password
+nft_index_ttl = 300
+nft_index_size = 50000
+nft_index_preload = False
+nft_link_validation = False
+nft_link_check_interval = 600
+nft_link_recheck = 86400
+nft_link_batch = 500
+quote_refresh_interval = 3600
+eligibility_snapshot = False
+eligibility_delta_interval = 60
+eligibility_rebuild_interval = 900
+row_cache_ttl = 60
+row_cache_size = 10000
+db_clock_max_age = 300
+pool_size = 10
+pool_max_overflow = 10
+pool_timeout = 30
+pool_recycle = 600
+pool_pre_ping = False
+pool_warm_connections = 10
+pool_keepalive_interval = 60
+
+[LOGGING]
+level = DEBUG
+queued = True
+file = xrpl-claims.log
+max_bytes = 10485760
+backup_count = 5
 """
 
 from configparser import ConfigParser
@@ -26,3 +93,10 @@ coinsConfig = baseConfig["COINS"]
 botConfig = baseConfig["BOT"]
 xrplConfig = baseConfig["XRPL"]
 dbConfig = baseConfig["DATABASE"]
+
+# Optional section, every key falls back to its default when it is missing
+loggingConfig = (
+    baseConfig["LOGGING"]
+    if baseConfig.has_section("LOGGING")
+    else baseConfig[baseConfig.default_section]
+)
@@ -0,0 +1,128 @@
+from abc import ABC, abstractmethod
+from asyncio import to_thread, Lock
+from heapq import heappush, heappop
+from time import monotonic
+import sqlite3
+
+
+# Cooldowns are kept against the monotonic clock, which on Linux is system wide,
+# so processes on the same host can share expiries through a common backend
+
+
+class CooldownBackend(ABC):
+    # Returns 0 when the key was free and is now held for `duration` seconds,
+    # else the seconds remaining on the existing cooldown
+    @abstractmethod
+    async def acquire(self, key: str, duration: float) -> float: ...
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryCooldownBackend(CooldownBackend):
+    def __init__(self, maxEntries: int = 100000) -> None:
+        self.maxEntries = maxEntries
+
+        # key -> expiry, with a heap of (expiry, key) to find what expires next
+        self.expiries: dict[str, float] = {}
+        self.heap: list[tuple[float, str]] = []
+
+    async def acquire(self, key: str, duration: float) -> float:
+        now = monotonic()
+        self._purge(now)
+
+        expiry = self.expiries.get(key)
+        if expiry is not None and expiry > now:
+            return expiry - now
+
+        # Still full once expired keys are gone, drop whatever expires soonest
+        while len(self.expiries) >= self.maxEntries and self.heap:
+            oldExpiry, oldKey = heappop(self.heap)
+            if self.expiries.get(oldKey) == oldExpiry:
+                del self.expiries[oldKey]
+
+        expiry = now + duration
+        self.expiries[key] = expiry
+        heappush(self.heap, (expiry, key))
+        return 0
+
+    def _purge(self, now: float) -> None:
+        while self.heap and self.heap[0][0] <= now:
+            expiry, key = heappop(self.heap)
+            # Skip heap entries left behind by a key that was set again
+            if self.expiries.get(key) == expiry:
+                del self.expiries[key]
+
+    def __len__(self) -> int:
+        return len(self.expiries)
+
+
+class SQLiteCooldownBackend(CooldownBackend):
+    def __init__(self, path: str = "cooldowns.sqlite3", purgeEvery: int = 1000):
+        self.path = path
+        self.purgeEvery = purgeEvery
+        self.calls = 0
+
+        self.lock = Lock()
+        self.connection = sqlite3.connect(
+            path, timeout=5.0, isolation_level=None, check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS cooldowns (key TEXT PRIMARY KEY, expiry REAL)"
+        )
+
+    async def acquire(self, key: str, duration: float) -> float:
+        async with self.lock:
+            return await to_thread(self._acquire, key, duration)
+
+    def _acquire(self, key: str, duration: float) -> float:
+        now = monotonic()
+
+        # Only takes the key when it is new or expired, atomic across processes
+        cursor = self.connection.execute(
+            "INSERT INTO cooldowns (key, expiry) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET expiry = excluded.expiry "
+            "WHERE cooldowns.expiry <= ?",
+            (key, now + duration, now),
+        )
+
+        self.calls += 1
+        if self.calls % self.purgeEvery == 0:
+            self.connection.execute("DELETE FROM cooldowns WHERE expiry <= ?", (now,))
+
+        if cursor.rowcount:
+            return 0
+
+        row = self.connection.execute(
+            "SELECT expiry FROM cooldowns WHERE key = ?", (key,)
+        ).fetchone()
+        return max(row[0] - now, 0) if row else 0
+
+    async def close(self) -> None:
+        self.connection.close()
+
+
+class CooldownStore:
+    def __init__(self, duration: float, backend: CooldownBackend | None = None):
+        self.duration = duration
+        self.backend = backend or MemoryCooldownBackend()
+
+    async def hit(self, commandName: str, userId) -> float:
+        return await self.backend.acquire(f"{commandName}:{userId}", self.duration)
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+
+def createCooldownBackend(config) -> CooldownBackend:
+    backend = config.get("cooldown_backend", fallback="memory")
+    if backend == "sqlite":
+        return SQLiteCooldownBackend(
+            config.get("cooldown_path", fallback="cooldowns.sqlite3")
+        )
+    if backend == "memory":
+        return MemoryCooldownBackend(
+            config.getint("cooldown_max_entries", fallback=100000)
+        )
+    raise ValueError(f"Unknown cooldown backend: {backend}")
@@ -0,0 +1,375 @@
+from asyncio import (
+    Future,
+    Lock,
+    create_task,
+    get_running_loop,
+    open_unix_connection,
+    start_unix_server,
+    StreamReader,
+    StreamWriter,
+)
+from asyncio.exceptions import CancelledError
+from collections import deque
+from heapq import heapify, heappush, heappop
+from itertools import count
+from os import environ, path, unlink
+from time import monotonic
+import json
+
+from utils.cooldownStore import CooldownBackend, MemoryCooldownBackend
+from utils.logging import loggingInstance
+from utils.paymentEngine import SequenceAllocator
+
+
+# Set by shardLauncher for every worker process it starts
+COORDINATOR_ENV = "XRAIN_COORDINATOR"
+SHARD_ID_ENV = "XRAIN_SHARD_ID"
+TOTAL_SHARDS_ENV = "XRAIN_TOTAL_SHARDS"
+
+
+class Coordinator:
+    # State shared by the worker processes of a sharded deployment, served
+    # over a unix socket as one JSON object per line. Runs in the launcher,
+    # so it outlives any single worker
+    def __init__(
+        self, socketPath: str, maxCooldowns: int = 100000, maxReleases: int = 10000
+    ) -> None:
+        self.socketPath = socketPath
+        self.server = None
+
+        self.cooldowns = MemoryCooldownBackend(maxCooldowns)
+
+        # key -> (owner, expiry) of the claims being processed right now
+        self.leases: dict[str, tuple[str, float]] = {}
+
+        # address -> [next sequence or None, heap of freed sequences]
+        self.sequences: dict[str, list] = {}
+
+        # Addresses whose stream must be checked against the ledger before
+        # handing out another sequence
+        self.staleSequences: set[str] = set()
+
+        # (id, xrpId) of the latest released claims, read by every worker's
+        # eligibility snapshot
+        self.releases: deque[tuple[int, str]] = deque(maxlen=maxReleases)
+        self.releaseIds = count(1)
+
+    async def start(self) -> None:
+        if path.exists(self.socketPath):
+            unlink(self.socketPath)
+        self.server = await start_unix_server(self._serve, path=self.socketPath)
+        loggingInstance.info(f"Coordinator listening on {self.socketPath}")
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        if path.exists(self.socketPath):
+            unlink(self.socketPath)
+
+    async def handle(self, op: str, args: dict):
+        if op == "cooldown":
+            return await self.cooldowns.acquire(args["key"], args["duration"])
+        if op == "lease":
+            return self.lease(args["key"], args["owner"], args["ttl"])
+        if op == "unlease":
+            if self.leases.get(args["key"], (None,))[0] == args["owner"]:
+                del self.leases[args["key"]]
+            return True
+        if op == "seqNext":
+            return self.nextSequence(args["address"])
+        if op == "seqSync":
+            return self.syncSequence(args["address"], args["sequence"], args["force"])
+        if op == "seqRelease":
+            state = self.sequences.get(args["address"])
+            if state and state[0] is not None and args["sequence"] < state[0]:
+                heappush(state[1], args["sequence"])
+            return True
+        if op == "seqInvalidate":
+            self.staleSequences.add(args["address"])
+            return True
+        if op == "release":
+            self.releases.append((next(self.releaseIds), args["xrpId"]))
+            return True
+        if op == "releases":
+            return self.releasedSince(args["since"])
+        if op == "stats":
+            return self.stats()
+        raise ValueError(f"Unknown coordinator op: {op}")
+
+    def lease(self, key: str, owner: str, ttl: float) -> bool:
+        now = monotonic()
+        current = self.leases.get(key)
+        if current is not None and current[1] > now:
+            return False
+
+        if len(self.leases) > 10000:
+            self.leases = {
+                leaseKey: lease
+                for leaseKey, lease in self.leases.items()
+                if lease[1] > now
+            }
+        self.leases[key] = (owner, now + ttl)
+        return True
+
+    def nextSequence(self, address: str) -> int | None:
+        # None until a worker has read the account's sequence from the ledger
+        state = self.sequences.setdefault(address, [None, []])
+        if state[0] is None or address in self.staleSequences:
+            return None
+        if state[1]:
+            return heappop(state[1])
+
+        sequence = state[0]
+        state[0] += 1
+        return sequence
+
+    def syncSequence(self, address: str, sequence: int, force: bool) -> int | None:
+        # Only the first worker to read the ledger sets the stream, unless it
+        # is a resync after the ledger disagreed with it
+        state = self.sequences.setdefault(address, [None, []])
+        if address in self.staleSequences:
+            self.staleSequences.discard(address)
+            force = True
+
+        if state[0] is None:
+            state[0] = sequence
+        elif force:
+            # The stream only moves forward, the other workers may have
+            # payments in flight above the ledger's next sequence. A ledger
+            # behind the stream has a gap, its sequence is handed out first
+            if sequence >= state[0]:
+                state[0] = sequence
+            elif sequence not in state[1]:
+                state[1].append(sequence)
+            state[1] = [freed for freed in state[1] if freed >= sequence]
+            heapify(state[1])
+        return self.nextSequence(address)
+
+    def releasedSince(self, since: int | None) -> tuple[int, list[str] | None]:
+        # (last id, xrpIds released after since). The xrpIds are None when
+        # the log no longer reaches back to since, the caller has to reload
+        lastId = self.releases[-1][0] if self.releases else 0
+        if since is None:
+            return lastId, []
+        if self.releases and self.releases[0][0] > since + 1:
+            return lastId, None
+        return lastId, [
+            xrpId for releaseId, xrpId in self.releases if releaseId > since
+        ]
+
+    def stats(self) -> dict:
+        now = monotonic()
+        return {
+            "cooldowns": len(self.cooldowns),
+            "leases": sum(lease[1] > now for lease in self.leases.values()),
+            "sequences": {
+                address: state[0] for address, state in self.sequences.items()
+            },
+        }
+
+    async def _serve(self, reader: StreamReader, writer: StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                request = json.loads(line)
+                try:
+                    response = {
+                        "id": request["id"],
+                        "result": await self.handle(request["op"], request["args"]),
+                    }
+                except Exception as e:
+                    response = {"id": request["id"], "error": str(e)}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, CancelledError):
+            pass
+        finally:
+            writer.close()
+
+
+class CoordinatorClient:
+    # One connection per worker process, requests are matched to their
+    # responses by id so any number of coroutines can share it
+    def __init__(self, socketPath: str) -> None:
+        self.socketPath = socketPath
+        self.writer: StreamWriter | None = None
+        self.readerTask = None
+
+        self.lock = Lock()
+        self.ids = count()
+        self.pending: dict[int, Future] = {}
+
+    async def request(self, op: str, **args):
+        await self._connect()
+        requestId = next(self.ids)
+        future = get_running_loop().create_future()
+        self.pending[requestId] = future
+
+        try:
+            self.writer.write(
+                json.dumps({"id": requestId, "op": op, "args": args}).encode() + b"\n"
+            )
+            await self.writer.drain()
+            return await future
+        finally:
+            self.pending.pop(requestId, None)
+
+    def notify(self, op: str, **args) -> None:
+        # For callers that cannot wait, such as SequenceAllocator.release
+        create_task(self._notify(op, args))
+
+    async def close(self) -> None:
+        if self.readerTask is not None:
+            self.readerTask.cancel()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    async def _notify(self, op: str, args: dict) -> None:
+        try:
+            await self.request(op, **args)
+        except Exception as e:
+            loggingInstance.error(f"Coordinator {op}: {e}")
+
+    async def _connect(self) -> None:
+        async with self.lock:
+            if self.writer is not None and not self.writer.is_closing():
+                return
+            reader, self.writer = await open_unix_connection(self.socketPath)
+            self.readerTask = create_task(self._read(reader, self.writer))
+
+    async def _read(self, reader: StreamReader, writer: StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                response = json.loads(line)
+                future = self.pending.get(response["id"])
+                if future is None or future.done():
+                    continue
+                if "error" in response:
+                    future.set_exception(RuntimeError(response["error"]))
+                else:
+                    future.set_result(response["result"])
+        except CancelledError:
+            return
+        finally:
+            # Whatever was still waiting fails, the next request reconnects
+            writer.close()
+            if self.writer is writer:
+                self.writer = None
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Coordinator disconnected"))
+
+
+class CoordinatorCooldownBackend(CooldownBackend):
+    def __init__(self, client: CoordinatorClient) -> None:
+        self.client = client
+
+    async def acquire(self, key: str, duration: float) -> float:
+        return await self.client.request("cooldown", key=key, duration=duration)
+
+
+class ReleaseFeed:
+    # Claims released by any worker process. A release restores an older flag
+    # date, which the eligibility snapshot's delta query cannot see, so the
+    # snapshot reads these holders again on its next refresh
+    def __init__(self, client: CoordinatorClient) -> None:
+        self.client = client
+        self.lastId: int | None = None
+
+    def publish(self, xrpId: str) -> None:
+        self.client.notify("release", xrpId=xrpId)
+
+    async def released(self) -> list[str] | None:
+        # Released since the last call, None when some may have been missed
+        self.lastId, xrpIds = await self.client.request("releases", since=self.lastId)
+        return xrpIds
+
+
+class SharedSequenceAllocator(SequenceAllocator):
+    # Hands out one sequence stream per hot wallet across every worker
+    # process, the ledger is only read when the coordinator has no stream
+    def __init__(self, address, connectionPool, client: CoordinatorClient) -> None:
+        super().__init__(address, connectionPool)
+        self.client = client
+
+    async def next(self) -> int:
+        async with self.lock:
+            sequence = await self.client.request("seqNext", address=self.address)
+            if sequence is None:
+                sequence = await self._sync(force=False)
+            self.nextSequence = sequence + 1
+            return sequence
+
+    def release(self, sequence: int) -> None:
+        self.client.notify("seqRelease", address=self.address, sequence=sequence)
+
+    async def resync(self) -> None:
+        async with self.lock:
+            # The sequence the sync hands out goes back to be used first
+            sequence = await self._sync(force=True)
+            await self.client.request(
+                "seqRelease", address=self.address, sequence=sequence
+            )
+
+    def invalidate(self) -> None:
+        self.nextSequence = None
+        self.client.notify("seqInvalidate", address=self.address)
+
+    async def _sync(self, force: bool) -> int:
+        await self._fetch()
+        return await self.client.request(
+            "seqSync", address=self.address, sequence=self.nextSequence, force=force
+        )
+
+
+class InFlightClaims:
+    # Claims being processed right now, keyed by reward type and xrpId, so a
+    # second claim for the same holder on another shard backs off before it
+    # reaches the DB. Leases expire after ttl in case a worker dies mid claim
+    def __init__(self, client: CoordinatorClient | None = None, ttl: float = 120.0):
+        self.client = client
+        self.ttl = ttl
+        self.owner = environ.get(SHARD_ID_ENV, "0")
+
+        self.leases: dict[str, float] = {}
+
+    async def acquire(self, key: str) -> bool:
+        if self.client is not None:
+            return await self.client.request(
+                "lease", key=key, owner=self.owner, ttl=self.ttl
+            )
+
+        now = monotonic()
+        expiry = self.leases.get(key)
+        if expiry is not None and expiry > now:
+            return False
+
+        if len(self.leases) > 10000:
+            self.leases = {
+                leaseKey: expiry
+                for leaseKey, expiry in self.leases.items()
+                if expiry > now
+            }
+        self.leases[key] = now + self.ttl
+        return True
+
+    async def release(self, key: str) -> None:
+        if self.client is not None:
+            await self.client.request("unlease", key=key, owner=self.owner)
+        else:
+            self.leases.pop(key, None)
+
+
+def createCoordinatorClient() -> CoordinatorClient | None:
+    # Only set in workers started by shardLauncher
+    socketPath = environ.get(COORDINATOR_ENV)
+    return CoordinatorClient(socketPath) if socketPath else None
+
+
+def shardInfo() -> tuple[int, int] | None:
+    # (shard id, total shards) of a worker started by shardLauncher
+    if SHARD_ID_ENV not in environ:
+        return None
+    return int(environ[SHARD_ID_ENV]), int(environ[TOTAL_SHARDS_ENV])
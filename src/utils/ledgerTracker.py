@@ -0,0 +1,121 @@
+from xrpl.asyncio.clients import AsyncWebsocketClient
+from xrpl.models.requests import StreamParameter, Subscribe
+from asyncio import create_task, sleep, Task
+from asyncio.exceptions import CancelledError
+from math import ceil
+from time import monotonic
+
+from utils.logging import loggingInstance
+from utils.xrplPool import XRPLConnectionPool
+
+
+class LedgerTracker:
+    # Follows the ledger and server streams of the best endpoint so payments
+    # can be filled in-process instead of asking the node before every submit
+    def __init__(
+        self,
+        connectionPool: XRPLConnectionPool,
+        ledgerOffset: int = 20,
+        feeCushion: float = 1.2,
+        maxFee: int = 1000,
+        maxAge: float = 15.0,
+        reconnectDelay: float = 5.0,
+    ) -> None:
+        self.connectionPool = connectionPool
+
+        # Same bound autofill uses: payments expire this many ledgers past the
+        # last validated ledger, not the open one, so a little under offset
+        # ledgers remain to get in once the open ledger has moved on
+        self.ledgerOffset = ledgerOffset
+        self.feeCushion = feeCushion
+        # Above this many drops the fee is left to autofill
+        self.maxFee = maxFee
+        # Without a message for this long the stream is assumed to be dead
+        self.maxAge = maxAge
+        self.reconnectDelay = reconnectDelay
+
+        # Last validated ledger, as reported by the ledger stream
+        self.ledgerIndex: int | None = None
+        self.baseFee: int | None = None
+        self.loadFactor = 256
+        self.loadBase = 256
+        self.updatedAt = 0.0
+
+        self.streamTask: Task | None = None
+
+    async def start(self) -> None:
+        if self.streamTask is None or self.streamTask.done():
+            self.streamTask = create_task(self._run())
+
+    async def close(self) -> None:
+        if self.streamTask is not None:
+            self.streamTask.cancel()
+            self.streamTask = None
+
+    def isFresh(self) -> bool:
+        return (
+            self.ledgerIndex is not None
+            and self.baseFee is not None
+            and monotonic() - self.updatedAt < self.maxAge
+        )
+
+    def fee(self) -> int | None:
+        # Open ledger cost in drops, the base fee scaled by the server load
+        if self.baseFee is None:
+            return None
+        drops = ceil(self.baseFee * self.loadFactor / self.loadBase * self.feeCushion)
+        return drops if drops <= self.maxFee else None
+
+    def autofillFields(self) -> dict | None:
+        # Fee and LastLedgerSequence for a payment, None when they have to be
+        # fetched from the node instead. Like xrpl-py's autofill, the bound is
+        # the latest validated ledger_index plus ledgerOffset
+        fee = self.fee()
+        if not self.isFresh() or fee is None:
+            return None
+
+        return {
+            "fee": str(fee),
+            "last_ledger_sequence": self.ledgerIndex + self.ledgerOffset,
+        }
+
+    def update(self, message: dict) -> None:
+        # Handles the subscribe response and both stream message types
+        if "ledger_index" in message:
+            self.ledgerIndex = int(message["ledger_index"])
+        if "fee_base" in message:
+            self.baseFee = int(message["fee_base"])
+        elif "base_fee" in message:
+            self.baseFee = int(message["base_fee"])
+        if "load_factor" in message:
+            self.loadFactor = int(message["load_factor"])
+        if "load_base" in message:
+            self.loadBase = int(message["load_base"])
+        self.updatedAt = monotonic()
+
+    async def _run(self) -> None:
+        while True:
+            url = self.connectionPool.ranked()[0].url
+            try:
+                async with AsyncWebsocketClient(url) as client:
+                    response = await client.request(
+                        Subscribe(
+                            streams=[StreamParameter.LEDGER, StreamParameter.SERVER]
+                        )
+                    )
+                    if not response.is_successful():
+                        raise ConnectionError(f"Subscribe failed: {response.result}")
+
+                    self.update(response.result)
+                    loggingInstance.debug(f"Following the ledger stream of {url}")
+
+                    async for message in client:
+                        self.update(message)
+            except CancelledError:
+                return
+            except Exception as e:
+                loggingInstance.warning(f"Ledger stream from {url} dropped: {e}")
+
+            # Payments go back to autofill until the stream is back
+            self.updatedAt = 0.0
+            await sleep(self.reconnectDelay)
@@ -1,11 +1,40 @@
 import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from queue import SimpleQueue
+import atexit
+
+from utils.config import loggingConfig
+
+
+class LazyMessage:
+    # Defers building an expensive log payload until a handler formats it,
+    # e.g. loggingInstance.debug("Payment: %s", LazyMessage(payment.to_dict))
+    def __init__(self, function, *args, **kwargs) -> None:
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self) -> str:
+        return str(self.function(*self.args, **self.kwargs))
+
+
+class DeferredQueueHandler(QueueHandler):
+    # The stock QueueHandler formats on the caller's thread, leave the record
+    # untouched so the listener thread does the formatting as well as the I/O
+    def prepare(self, record):
+        return record
+
 
 # Create a logger
 loggingInstance = logging.getLogger(__name__)
-loggingInstance.setLevel(logging.DEBUG)  # Set the desired logging level
+loggingInstance.setLevel(loggingConfig.get("level", fallback="DEBUG"))
 
-# Create a file handler
-file_handler = logging.FileHandler("xrpl-claims.log")
+# Create a size-rotated file handler
+file_handler = RotatingFileHandler(
+    loggingConfig.get("file", fallback="xrpl-claims.log"),
+    maxBytes=loggingConfig.getint("max_bytes", fallback=10 * 1024 * 1024),
+    backupCount=loggingConfig.getint("backup_count", fallback=5),
+)
 file_handler.setLevel(logging.DEBUG)  # Set the desired logging level for the file
 
 # Create a console handler
@@ -19,6 +48,17 @@ formatter = logging.Formatter(
 file_handler.setFormatter(formatter)
 console_handler.setFormatter(formatter)
 
-# Add the handlers to the logger
-loggingInstance.addHandler(file_handler)
-loggingInstance.addHandler(console_handler)
+if loggingConfig.getboolean("queued", fallback=True):
+    # The event loop only enqueues records, a background thread writes them
+    logQueue = SimpleQueue()
+    loggingInstance.addHandler(DeferredQueueHandler(logQueue))
+
+    logListener = QueueListener(
+        logQueue, file_handler, console_handler, respect_handler_level=True
+    )
+    logListener.start()
+    atexit.register(logListener.stop)
+else:
+    # Add the handlers to the logger
+    loggingInstance.addHandler(file_handler)
+    loggingInstance.addHandler(console_handler)
@@ -0,0 +1,215 @@
+from asyncio import start_server, StreamReader, StreamWriter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+import re
+
+from utils.logging import loggingInstance
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Result code of the command being handled in the current task
+commandResult: ContextVar[str] = ContextVar("commandResult", default="Unknown")
+
+# XRPL engine results, tecPATH_DRY, tefPAST_SEQ, telINSUF_FEE_P and so on
+RESULT_CODE = re.compile(r"\b(te[cflmrs][A-Z_]+)\b")
+
+
+class Histogram:
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+    def quantile(self, q: float) -> float:
+        # Upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        # (name, sorted label items) -> Histogram / float
+        self.histograms: dict[tuple, Histogram] = {}
+        self.counters: dict[tuple, float] = {}
+
+        self.server = None
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(value)
+
+    def increment(self, name: str, amount: float = 1, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    @contextmanager
+    def span(self, stage: str, **labels):
+        # Times one stage of a claim, failures are counted separately
+        start = perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            elapsed = perf_counter() - start
+            self.observe("xrain_stage_latency_seconds", elapsed, stage=stage, **labels)
+            self.increment("xrain_stage_total", stage=stage, status=status, **labels)
+
+    def timed(self, stage: str):
+        # Decorator form of span for coroutine functions
+        def decorator(function):
+            @wraps(function)
+            async def wrapper(*args, **kwargs):
+                with self.span(stage):
+                    return await function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def command(self, commandName: str):
+        # Wraps a slash command callback, timing it end to end and counting
+        # the result code it reported through setResult
+        def decorator(function):
+            @wraps(function)
+            async def wrapper(*args, **kwargs):
+                commandResult.set("Unknown")
+                try:
+                    with self.span("command", command=commandName):
+                        return await function(*args, **kwargs)
+                except Exception as e:
+                    setResult(e)
+                    raise
+                finally:
+                    self.increment(
+                        "xrain_command_results_total",
+                        command=commandName,
+                        result=commandResult.get(),
+                    )
+
+            return wrapper
+
+        return decorator
+
+    def render(self) -> str:
+        lines = []
+        typed = set()
+        for (name, labels), value in sorted(self.counters.items()):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{formatLabels(labels)} {value}")
+
+        for (name, labels), histogram in sorted(
+            self.histograms.items(), key=lambda item: item[0]
+        ):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                bucketLabels = formatLabels(labels + (("le", str(bound)),))
+                lines.append(f"{name}_bucket{bucketLabels} {cumulative}")
+            infLabels = labels + (("le", "+Inf"),)
+            lines.append(f"{name}_bucket{formatLabels(infLabels)} {histogram.count}")
+            lines.append(f"{name}_sum{formatLabels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{formatLabels(labels)} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        # Compact per-stage view for the admin slash command
+        lines = []
+        for (name, labels), histogram in sorted(
+            self.histograms.items(), key=lambda item: item[0]
+        ):
+            label = ",".join(f"{key}={value}" for key, value in labels)
+            mean = histogram.sum / histogram.count if histogram.count else 0
+            lines.append(
+                f"{label}: n={histogram.count} avg={mean:.3f}s "
+                f"p50<={histogram.quantile(0.5)}s p99<={histogram.quantile(0.99)}s"
+            )
+
+        for (name, labels), count in sorted(self.counters.items()):
+            if name == "xrain_command_results_total":
+                label = ",".join(f"{key}={value}" for key, value in labels)
+                lines.append(f"{label}: {int(count)}")
+
+        return "\n".join(lines)
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 9108):
+        if self.server is not None:
+            return self.server
+
+        async def handle(reader: StreamReader, writer: StreamWriter):
+            try:
+                # Only the request line matters, any path returns the metrics
+                await reader.readline()
+                body = self.render().encode("utf-8")
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\n"
+                    b"Content-Type: text/plain; version=0.0.4\r\n"
+                    + f"Content-Length: {len(body)}\r\n".encode("utf-8")
+                    + b"Connection: close\r\n\r\n"
+                    + body
+                )
+                await writer.drain()
+            finally:
+                writer.close()
+
+        self.server = await start_server(handle, host, port)
+        loggingInstance.info(f"Metrics endpoint listening on {host}:{port}")
+        return self.server
+
+
+def formatLabels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def setResult(result) -> None:
+    commandResult.set(resultCode(result))
+
+
+def resultCode(result) -> str:
+    # Reduces an error or status into a short label such as tecPATH_DRY
+    text = str(result)
+    match = RESULT_CODE.search(text)
+    if match:
+        return match.group(1)
+    if "Connection timeout" in text:
+        return "ConnectionTimeout"
+    return text if len(text) <= 32 else "Other"
+
+
+metrics = MetricsRegistry()
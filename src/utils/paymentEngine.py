@@ -0,0 +1,296 @@
+from xrpl.asyncio.account import get_next_valid_seq_number
+from xrpl.asyncio.clients import XRPLRequestFailureException
+from xrpl.asyncio.ledger import get_latest_validated_ledger_sequence
+from xrpl.asyncio.transaction import autofill, sign, submit
+from xrpl.models.requests import Tx
+from xrpl.models.transactions import Transaction
+from xrpl.wallet import Wallet
+from asyncio import Lock, Semaphore, sleep
+from asyncio.exceptions import TimeoutError
+from heapq import heappush, heappop
+
+from utils.logging import loggingInstance
+from utils.ledgerTracker import LedgerTracker
+from utils.metrics import metrics
+from utils.xrplPool import EndpointBusy, XRPLConnectionPool
+
+
+# Engine results that mean the transaction was accepted and may still validate
+IN_FLIGHT_RESULTS = ("tesSUCCESS", "terQUEUED", "terPRE_SEQ", "tefALREADY")
+
+# Node side errors that are worth retrying with the same signed blob
+RETRYABLE_ERRORS = ("noCurrent", "overloaded", "tooBusy", "telCAN_NOT_QUEUE")
+
+RETRIES_EXHAUSTED = "Failed after all retry attempts"
+
+# Errors of a payment that did not pay and never will: never built, rejected
+# before it reached the ledger, failed on it, or expired on every attempt
+REJECTED_ERRORS = (
+    "tem",
+    "tef",
+    "tel",
+    "tec",
+    RETRIES_EXHAUSTED,
+    "TrustlineNotSetOnSender",
+    "NoHotWalletAvailable",
+)
+
+
+def paymentRejected(error) -> bool:
+    # False when the payment may still apply, such as after a connection timeout
+    return str(error).startswith(REJECTED_ERRORS)
+
+
+class SequenceAllocator:
+    def __init__(self, address: str, connectionPool: XRPLConnectionPool) -> None:
+        self.address = address
+        self.connectionPool = connectionPool
+
+        self.lock = Lock()
+        self.nextSequence: int | None = None
+
+        # Sequences handed out but never consumed on ledger, reused first to close gaps
+        self.freed: list[int] = []
+
+    async def next(self) -> int:
+        async with self.lock:
+            if self.nextSequence is None:
+                await self._fetch()
+
+            if self.freed:
+                return heappop(self.freed)
+
+            sequence = self.nextSequence
+            self.nextSequence += 1
+            return sequence
+
+    def release(self, sequence: int) -> None:
+        # The transaction never reached the ledger, so its sequence is still open
+        if self.nextSequence is not None and sequence < self.nextSequence:
+            heappush(self.freed, sequence)
+
+    async def resync(self) -> None:
+        async with self.lock:
+            await self._fetch()
+
+    def invalidate(self) -> None:
+        # Force a fetch from the ledger on the next allocation
+        self.nextSequence = None
+        self.freed = []
+
+    async def _fetch(self) -> None:
+        sequence = await self.connectionPool.run(
+            lambda client: get_next_valid_seq_number(self.address, client), hedge=True
+        )
+        loggingInstance.debug(f"Sequence for {self.address} synced at {sequence}")
+
+        self.nextSequence = sequence
+        self.freed = [freed for freed in self.freed if freed >= sequence]
+
+
+class PaymentEngine:
+    def __init__(
+        self,
+        wallet: Wallet,
+        connectionPool: XRPLConnectionPool,
+        maxInFlight: int = 20,
+        retries: int = 3,
+        retryDelay: float = 1.0,
+        pollInterval: float = 1.0,
+        ledgerTracker: LedgerTracker | None = None,
+        sequenceAllocator: SequenceAllocator | None = None,
+    ) -> None:
+        self.wallet = wallet
+        self.connectionPool = connectionPool
+        self.ledgerTracker = ledgerTracker
+        self.sequenceAllocator = sequenceAllocator or SequenceAllocator(
+            wallet.classic_address, connectionPool
+        )
+
+        self.inFlight = Semaphore(maxInFlight)
+        self.retries = retries
+        self.retryDelay = retryDelay
+        self.pollInterval = pollInterval
+
+    async def sendPayment(self, transaction: Transaction, onSigned=None) -> dict:
+        funcResult = {"result": False, "error": None, "hash": None}
+
+        async with self.inFlight:
+            for attempt in range(self.retries):
+                signedTx = await self.signPayment(transaction)
+
+                # Lets callers persist the signed blob before it is submitted
+                if onSigned is not None:
+                    await onSigned(signedTx)
+
+                funcResult = await self.settleSigned(signedTx)
+                if not funcResult.pop("retry"):
+                    return funcResult
+
+                if funcResult["error"] in RETRYABLE_ERRORS:
+                    await sleep(self.retryDelay)
+
+            funcResult["error"] = RETRIES_EXHAUSTED
+            return funcResult
+
+    async def signPayment(self, transaction: Transaction) -> Transaction:
+        sequence = await self.sequenceAllocator.next()
+        try:
+            signedTx = await self._prepare(transaction, sequence)
+        except Exception:
+            self.sequenceAllocator.release(sequence)
+            raise
+
+        loggingInstance.debug(f"Payment #{sequence} signed as {signedTx.get_hash()}")
+        return signedTx
+
+    async def settleSigned(self, signedTx: Transaction) -> dict:
+        # "retry" is only set when the signed payment can no longer apply, so
+        # the caller may sign the same payment again without paying twice
+        sequence = signedTx.sequence
+        funcResult = {
+            "result": False,
+            "error": None,
+            "hash": signedTx.get_hash(),
+            "retry": False,
+        }
+
+        engineResult = await self._submit(signedTx)
+        if engineResult is None:
+            # The node never answered, the sequence state is unknown
+            self.sequenceAllocator.invalidate()
+            funcResult["error"] = f"Connection timeout after {self.retries} retries"
+            return funcResult
+
+        if engineResult == "tefPAST_SEQ":
+            # Either this exact payment already applied, possibly in a ledger
+            # not validated yet, or someone else used the sequence. Only the
+            # latter may be signed again, which is known once the payment is
+            # still missing after its LastLedgerSequence
+            loggingInstance.warning(f"Sequence {sequence} already used, waiting...")
+            finalResult = await self._waitForValidation(signedTx)
+        elif engineResult in IN_FLIGHT_RESULTS or engineResult.startswith(
+            ("tec", "ter")
+        ):
+            # ter results may still be applied by the node in a later ledger
+            finalResult = await self._waitForValidation(signedTx)
+        else:
+            # Rejected before it reached the ledger, or refused by a node that
+            # never took the blob. Either way the sequence stays free
+            self.sequenceAllocator.release(sequence)
+            funcResult["error"] = engineResult
+            funcResult["retry"] = engineResult in RETRYABLE_ERRORS
+            return funcResult
+
+        if finalResult is None:
+            # Expired without validating, usually a gap left by a rejected
+            # lower sequence. Resync so the next attempt lands on a live one
+            loggingInstance.warning(
+                f"Payment #{sequence} expired before validation, resyncing..."
+            )
+            await self.sequenceAllocator.resync()
+            funcResult["retry"] = True
+            return funcResult
+
+        if finalResult == "tesSUCCESS":
+            funcResult["result"] = True
+        else:
+            funcResult["error"] = finalResult
+        return funcResult
+
+    @metrics.timed("xrpl_autofill")
+    async def _prepare(self, transaction: Transaction, sequence: int) -> Transaction:
+        transactionJson = transaction.to_dict()
+        transactionJson["sequence"] = sequence
+
+        # Fee and ledger bound from the subscribed stream, no round trip at all
+        localFields = self.ledgerTracker and self.ledgerTracker.autofillFields()
+        if localFields:
+            transactionJson.update(localFields)
+            metrics.increment("xrain_autofill_total", source="local")
+            return sign(type(transaction).from_dict(transactionJson), self.wallet)
+
+        transaction = type(transaction).from_dict(transactionJson)
+        metrics.increment("xrain_autofill_total", source="node")
+
+        # Sequence is already set, so autofill only resolves the fee and ledger bound
+        autofilledTx = await self.connectionPool.run(
+            lambda client: autofill(transaction=transaction, client=client), hedge=True
+        )
+        return sign(autofilledTx, self.wallet)
+
+    @metrics.timed("xrpl_submit")
+    async def _submit(self, signedTx: Transaction) -> str | None:
+        # Resubmitting the same signed blob is idempotent, so connection errors
+        # are retried, on another endpoint first, without signing a second
+        # payment. None when it is unknown whether a node took the blob
+        connectionError = False
+        for attempt in range(self.retries):
+            try:
+                response = await self.connectionPool.run(
+                    lambda client: submit(signedTx, client)
+                )
+            except (TimeoutError, ConnectionError, OSError) as e:
+                loggingInstance.warning(
+                    f"Connection error on submit attempt {attempt + 1}: {e}. Retrying..."
+                )
+                connectionError = True
+                await sleep(self.retryDelay)
+                continue
+
+            if not response.is_successful():
+                error = str(response.result.get("error"))
+                if error in RETRYABLE_ERRORS and attempt < self.retries - 1:
+                    await sleep(self.retryDelay)
+                    continue
+                # A refusal now says nothing of an attempt that timed out, the
+                # node may have taken that one
+                return None if connectionError else error
+
+            return response.result["engine_result"]
+
+        return None
+
+    async def _lookup(self, txHash: str, client=None) -> str | None:
+        # Final result of a validated transaction, None while it is not validated
+        if client is None:
+            response = await self.connectionPool.request(
+                Tx(transaction=txHash), hedge=True
+            )
+        else:
+            response = await client.request(Tx(transaction=txHash))
+        if response.is_successful() and response.result.get("validated"):
+            return response.result["meta"]["TransactionResult"]
+        return None
+
+    async def _poll(self, signedTx: Transaction, client) -> tuple[int, str | None]:
+        # Both reads go to the same node so its view of the ledger is consistent
+        latestLedger = await get_latest_validated_ledger_sequence(client)
+        return latestLedger, await self._lookup(signedTx.get_hash(), client)
+
+    @metrics.timed("xrpl_validation")
+    async def _waitForValidation(self, signedTx: Transaction) -> str | None:
+        txHash = signedTx.get_hash()
+        while True:
+            await sleep(self.pollInterval)
+            try:
+                # Read the ledger first so a validation in between is never missed
+                latestLedger, finalResult = await self.connectionPool.run(
+                    lambda client: self._poll(signedTx, client), hedge=True
+                )
+                if finalResult is not None:
+                    return finalResult
+            except (
+                TimeoutError,
+                ConnectionError,
+                OSError,
+                EndpointBusy,
+                XRPLRequestFailureException,
+            ) as e:
+                # A busy or unreachable node, keep polling the same hash. The
+                # payment must not be signed again while it may still apply
+                loggingInstance.warning(f"Error polling {txHash}: {e}")
+                continue
+
+            if latestLedger > signedTx.last_ledger_sequence:
+                return None
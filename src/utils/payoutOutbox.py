@@ -0,0 +1,300 @@
+from asyncio import Event, Lock, create_task, to_thread, wait_for, Task
+from asyncio.exceptions import TimeoutError, CancelledError
+from time import time
+import sqlite3
+
+from xrpl.core.binarycodec import encode
+from xrpl.models.transactions import Transaction
+
+from utils.logging import loggingInstance
+
+
+PAYOUT_COLUMNS = (
+    "payoutId",
+    "payoutKey",
+    "xrpId",
+    "rewardType",
+    "amount",
+    "coinHex",
+    "memos",
+    "lastClaim",
+    "channelId",
+    "userId",
+    "state",
+    "txHash",
+    "txBlob",
+    "error",
+    "attempts",
+)
+
+
+class PayoutOutbox:
+    # Durable journal of payouts, a payout moves pending -> signed -> settled
+    # or failed. The signed blob is stored before submission so a restart
+    # resubmits the exact same transaction instead of paying twice
+    def __init__(self, path: str = "payouts.sqlite3") -> None:
+        self.path = path
+        self.lock = Lock()
+
+        self.connection = sqlite3.connect(
+            path, timeout=5.0, isolation_level=None, check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS payouts (
+                payoutId INTEGER PRIMARY KEY AUTOINCREMENT,
+                payoutKey TEXT NOT NULL UNIQUE,
+                xrpId TEXT NOT NULL,
+                rewardType TEXT NOT NULL,
+                amount REAL NOT NULL,
+                coinHex TEXT NOT NULL,
+                memos TEXT,
+                lastClaim TEXT,
+                channelId TEXT,
+                userId TEXT,
+                state TEXT NOT NULL DEFAULT 'pending',
+                txHash TEXT,
+                txBlob TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                createdAt REAL NOT NULL,
+                updatedAt REAL NOT NULL
+            )
+            """
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS payoutsState ON payouts (state, payoutId)"
+        )
+
+    async def enqueue(self, payout: dict) -> int:
+        return await self._run(self._enqueue, payout)
+
+    async def nextBatch(self, limit: int) -> list[dict]:
+        return await self._run(self._nextBatch, limit)
+
+    async def contains(self, payoutKey: str) -> bool:
+        return await self._run(self._contains, payoutKey)
+
+    async def counts(self) -> dict[str, int]:
+        return await self._run(self._counts)
+
+    async def markSigned(self, payoutId: int, signedTx: Transaction) -> None:
+        await self._run(
+            self._update,
+            payoutId,
+            state="signed",
+            txHash=signedTx.get_hash(),
+            txBlob=encode(signedTx.to_xrpl()),
+        )
+
+    async def markPending(self, payoutId: int) -> None:
+        await self._run(self._update, payoutId, state="pending", txBlob=None)
+
+    async def markSettled(self, payoutId: int, txHash: str) -> None:
+        await self._run(self._update, payoutId, state="settled", txHash=txHash)
+
+    async def markFailed(self, payoutId: int, error) -> None:
+        await self._run(self._update, payoutId, state="failed", error=str(error))
+
+    async def markAttempt(self, payoutId: int, error) -> int:
+        return await self._run(self._markAttempt, payoutId, str(error))
+
+    async def close(self) -> None:
+        self.connection.close()
+
+    async def _run(self, function, *args, **kwargs):
+        async with self.lock:
+            return await to_thread(function, *args, **kwargs)
+
+    def _enqueue(self, payout: dict) -> int:
+        now = time()
+        # A failed payout with the same key is revived, anything else is kept
+        # as is so enqueueing twice never creates a second payment
+        self.connection.execute(
+            "INSERT INTO payouts (payoutKey, xrpId, rewardType, amount, coinHex, "
+            "memos, lastClaim, channelId, userId, createdAt, updatedAt) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (payoutKey) DO UPDATE SET state = 'pending', "
+            "amount = excluded.amount, txHash = NULL, txBlob = NULL, error = NULL, "
+            "attempts = 0, updatedAt = excluded.updatedAt "
+            "WHERE payouts.state = 'failed'",
+            (
+                payout["payoutKey"],
+                payout["xrpId"],
+                payout["rewardType"],
+                payout["amount"],
+                payout["coinHex"],
+                payout.get("memos"),
+                payout.get("lastClaim"),
+                payout.get("channelId"),
+                payout.get("userId"),
+                now,
+                now,
+            ),
+        )
+        row = self.connection.execute(
+            "SELECT payoutId FROM payouts WHERE payoutKey = ?", (payout["payoutKey"],)
+        ).fetchone()
+        return row[0]
+
+    def _nextBatch(self, limit: int) -> list[dict]:
+        rows = self.connection.execute(
+            f"SELECT {', '.join(PAYOUT_COLUMNS)} FROM payouts "
+            "WHERE state IN ('pending', 'signed') ORDER BY payoutId LIMIT ?",
+            (limit,),
+        ).fetchall()
+        return [dict(zip(PAYOUT_COLUMNS, row)) for row in rows]
+
+    def _contains(self, payoutKey: str) -> bool:
+        row = self.connection.execute(
+            "SELECT 1 FROM payouts WHERE payoutKey = ?", (payoutKey,)
+        ).fetchone()
+        return row is not None
+
+    def _counts(self) -> dict[str, int]:
+        rows = self.connection.execute(
+            "SELECT state, COUNT(*) FROM payouts GROUP BY state"
+        ).fetchall()
+        return dict(rows)
+
+    def _update(self, payoutId: int, **values) -> None:
+        assignments = ", ".join(f"{column} = ?" for column in values)
+        self.connection.execute(
+            f"UPDATE payouts SET {assignments}, updatedAt = ? WHERE payoutId = ?",
+            (*values.values(), time(), payoutId),
+        )
+
+    def _markAttempt(self, payoutId: int, error: str) -> int:
+        self.connection.execute(
+            "UPDATE payouts SET attempts = attempts + 1, error = ?, updatedAt = ? "
+            "WHERE payoutId = ?",
+            (error, time(), payoutId),
+        )
+        row = self.connection.execute(
+            "SELECT attempts FROM payouts WHERE payoutId = ?", (payoutId,)
+        ).fetchone()
+        return row[0]
+
+
+class SettlementWorkers:
+    def __init__(
+        self,
+        outbox: PayoutOutbox,
+        xrplClient,
+        workers: int = 4,
+        maxAttempts: int = 5,
+        idleInterval: float = 1.0,
+        onSettled=None,
+    ) -> None:
+        self.outbox = outbox
+        self.xrplClient = xrplClient
+        self.workers = workers
+        self.maxAttempts = maxAttempts
+        self.idleInterval = idleInterval
+
+        # Awaited with (payout, result) once a payout settles or fails for good
+        self.onSettled = onSettled
+
+        self.active: set[int] = set()
+        self.claimLock = Lock()
+        self.wakeup = Event()
+        self.tasks: list[Task] = []
+
+    def start(self) -> None:
+        # Anything pending or signed from before a restart is picked up first
+        if not self.tasks:
+            self.tasks = [create_task(self._run()) for _ in range(self.workers)]
+
+    def notify(self) -> None:
+        self.wakeup.set()
+
+    async def close(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                payout = await self._claim()
+                if payout is None:
+                    self.wakeup.clear()
+                    try:
+                        await wait_for(self.wakeup.wait(), timeout=self.idleInterval)
+                    except TimeoutError:
+                        pass
+                    continue
+
+                try:
+                    await self.settle(payout)
+                finally:
+                    self.active.discard(payout["payoutId"])
+            except CancelledError:
+                return
+            except Exception as e:
+                loggingInstance.exception(f"Error in settlement worker: {e}")
+
+    async def _claim(self) -> dict | None:
+        async with self.claimLock:
+            batch = await self.outbox.nextBatch(len(self.active) + self.workers)
+            for payout in batch:
+                if payout["payoutId"] not in self.active:
+                    self.active.add(payout["payoutId"])
+                    return payout
+        return None
+
+    async def settle(self, payout: dict) -> None:
+        payoutId = payout["payoutId"]
+        engine = self.xrplClient.paymentEngine
+        signed = payout["state"] == "signed"
+
+        async def onSigned(signedTx):
+            nonlocal signed
+            await self.outbox.markSigned(payoutId, signedTx)
+            signed = True
+
+        try:
+            if signed:
+                # Resume with the stored blob, resubmitting it is idempotent
+                result = await engine.settleSigned(
+                    Transaction.from_blob(payout["txBlob"])
+                )
+                if result.pop("retry"):
+                    await self.outbox.markPending(payoutId)
+                    return
+            else:
+                payment = self.xrplClient.buildPayment(
+                    payout["xrpId"],
+                    payout["amount"],
+                    payout["coinHex"],
+                    payout["memos"],
+                )
+                if payment is None:
+                    result = {"result": False, "error": "TrustlineNotSetOnSender"}
+                else:
+                    result = await engine.sendPayment(payment, onSigned=onSigned)
+        except (TimeoutError, ConnectionError, OSError) as e:
+            attempts = await self.outbox.markAttempt(payoutId, e)
+            loggingInstance.warning(f"Payout #{payoutId} attempt {attempts}: {e}")
+            # A signed payout may still apply, so it is never given up on
+            if signed or attempts < self.maxAttempts:
+                return
+            result = {"result": False, "error": f"Gave up after {attempts} attempts"}
+
+        self.xrplClient.invalidateBalance(payout["xrpId"], payout["coinHex"])
+
+        if signed and str(result["error"]).startswith("Connection timeout"):
+            # The outcome is unknown, keep the signed blob and resume it later
+            await self.outbox.markAttempt(payoutId, result["error"])
+            return
+
+        if result["result"]:
+            await self.outbox.markSettled(payoutId, result["hash"])
+            loggingInstance.info(f"Payout #{payoutId} settled: {result['hash']}")
+        else:
+            await self.outbox.markFailed(payoutId, result["error"])
+            loggingInstance.error(f"Payout #{payoutId} failed: {result['error']}")
+
+        if self.onSettled is not None:
+            await self.onSettled(payout, result)
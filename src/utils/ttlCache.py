@@ -0,0 +1,57 @@
+from collections import OrderedDict
+from time import monotonic
+
+
+class TTLCache:
+    def __init__(self, ttl: float = 60.0, maxSize: int = 10000) -> None:
+        self.ttl = ttl
+        self.maxSize = maxSize
+
+        # key -> (expiry, value), ordered from least to most recently used
+        self.entries: OrderedDict = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        expiry, value = entry
+        if expiry <= monotonic():
+            del self.entries[key]
+            self.misses += 1
+            return default
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key, default=None):
+        # Like get, without touching the recency order or the hit counters
+        entry = self.entries.get(key)
+        if entry is None or entry[0] <= monotonic():
+            return default
+        return entry[1]
+
+    def set(self, key, value) -> None:
+        self.entries[key] = (monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, key) -> None:
+        self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def __contains__(self, key) -> bool:
+        entry = self.entries.get(key)
+        return entry is not None and entry[0] > monotonic()
+
+    def __len__(self) -> int:
+        return len(self.entries)
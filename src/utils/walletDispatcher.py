@@ -0,0 +1,229 @@
+from xrpl.asyncio.account import get_balance
+from xrpl.models.requests import AccountLines
+from xrpl.models.transactions import Transaction
+from xrpl.utils import drops_to_xrp
+from asyncio import create_task, sleep, Task
+from asyncio.exceptions import CancelledError
+from hashlib import sha256
+
+from utils.logging import loggingInstance
+from utils.paymentEngine import PaymentEngine
+from utils.xrplPool import XRPLConnectionPool
+
+
+class NoWalletAvailable(Exception):
+    pass
+
+
+class HotWallet:
+    def __init__(self, engine: PaymentEngine) -> None:
+        self.engine = engine
+        self.address = engine.wallet.classic_address
+
+        self.inFlight = 0
+
+        # Last known balances, debited as payments go out and refreshed from
+        # the ledger periodically. None until the first refresh
+        self.xrpBalance: float | None = None
+        self.balances: dict[str, float] = {}
+
+    def balance(self, currency: str) -> float | None:
+        if currency == "XRP":
+            return self.xrpBalance
+        return self.balances.get(currency)
+
+    def debit(self, currency: str, value: float) -> None:
+        if currency == "XRP":
+            if self.xrpBalance is not None:
+                self.xrpBalance -= value
+        elif currency in self.balances:
+            self.balances[currency] -= value
+
+    def stats(self) -> dict:
+        return {
+            "address": self.address,
+            "inFlight": self.inFlight,
+            "sequence": self.engine.sequenceAllocator.nextSequence,
+            "xrpBalance": self.xrpBalance,
+            **self.balances,
+        }
+
+
+class WalletDispatcher:
+    # Spreads payments over several hot wallets, each with its own sequence
+    # stream and payment engine. Exposes the same calls as PaymentEngine
+    def __init__(
+        self,
+        engines: list[PaymentEngine],
+        connectionPool: XRPLConnectionPool,
+        strategy: str = "least_in_flight",
+        minBalance: float = 0.0,
+        minXrp: float = 20.0,
+        refreshInterval: float = 60.0,
+    ) -> None:
+        if strategy not in ("least_in_flight", "hash"):
+            raise ValueError(f"Unknown wallet strategy: {strategy}")
+
+        self.wallets = [HotWallet(engine) for engine in engines]
+        self.byAddress = {wallet.address: wallet for wallet in self.wallets}
+        self.connectionPool = connectionPool
+        self.strategy = strategy
+
+        # A wallet leaves the rotation for a currency once a payment would take
+        # it below minBalance, and for everything once its XRP is below minXrp
+        self.minBalance = minBalance
+        self.minXrp = minXrp
+
+        self.refreshInterval = refreshInterval
+        self.refreshTask: Task | None = None
+        self.nextOffset = 0
+
+    async def start(self) -> None:
+        await self.refreshBalances()
+        if self.refreshTask is None or self.refreshTask.done():
+            self.refreshTask = create_task(self._refreshLoop())
+
+    async def close(self) -> None:
+        if self.refreshTask is not None:
+            self.refreshTask.cancel()
+            self.refreshTask = None
+
+    async def sendPayment(self, transaction: Transaction, onSigned=None) -> dict:
+        currency, value = self._amount(transaction)
+        try:
+            wallet = self.pick(transaction.destination, currency, value)
+        except NoWalletAvailable as e:
+            loggingInstance.error(f"No hot wallet can pay {value} {currency}: {e}")
+            return {"result": False, "error": "NoHotWalletAvailable", "hash": None}
+
+        # Debit up front so concurrent picks see what is already committed
+        wallet.debit(currency, value)
+        wallet.inFlight += 1
+        try:
+            result = await wallet.engine.sendPayment(
+                self._assign(transaction, wallet), onSigned=onSigned
+            )
+        except BaseException:
+            wallet.debit(currency, -value)
+            raise
+        finally:
+            wallet.inFlight -= 1
+
+        if not result["result"]:
+            wallet.debit(currency, -value)
+        return result
+
+    async def signPayment(self, transaction: Transaction) -> Transaction:
+        currency, value = self._amount(transaction)
+        wallet = self.pick(transaction.destination, currency, value)
+        return await wallet.engine.signPayment(self._assign(transaction, wallet))
+
+    async def settleSigned(self, signedTx: Transaction) -> dict:
+        # A signed payment can only ever settle on the wallet that signed it
+        wallet = self.byAddress.get(signedTx.account)
+        if wallet is None:
+            return {
+                "result": False,
+                "error": "UnknownHotWallet",
+                "hash": signedTx.get_hash(),
+                "retry": False,
+            }
+
+        wallet.inFlight += 1
+        try:
+            return await wallet.engine.settleSigned(signedTx)
+        finally:
+            wallet.inFlight -= 1
+
+    def pick(self, destination: str, currency: str, value: float) -> HotWallet:
+        candidates = [
+            wallet for wallet in self.wallets if self._canPay(wallet, currency, value)
+        ]
+        if not candidates:
+            raise NoWalletAvailable(f"{len(self.wallets)} wallets below the minimum")
+
+        if self.strategy == "hash":
+            # Rendezvous hashing, a destination keeps its wallet unless that
+            # wallet leaves the rotation
+            return max(
+                candidates,
+                key=lambda wallet: sha256(
+                    f"{destination}:{wallet.address}".encode()
+                ).digest(),
+            )
+
+        # Rotate the starting point so idle wallets share ties
+        self.nextOffset = (self.nextOffset + 1) % len(candidates)
+        candidates = candidates[self.nextOffset :] + candidates[: self.nextOffset]
+        return min(candidates, key=lambda wallet: wallet.inFlight)
+
+    async def refreshBalances(self) -> None:
+        for wallet in self.wallets:
+            try:
+                drops = await self.connectionPool.run(
+                    lambda client: get_balance(wallet.address, client), hedge=True
+                )
+                wallet.xrpBalance = float(drops_to_xrp(str(drops)))
+                wallet.balances = await self._trustlineBalances(wallet.address)
+            except Exception as e:
+                loggingInstance.warning(f"Balance refresh for {wallet.address}: {e}")
+                continue
+
+            if wallet.xrpBalance < self.minXrp:
+                loggingInstance.warning(
+                    f"Hot wallet {wallet.address} is out of rotation, {wallet.xrpBalance} XRP left"
+                )
+
+    def stats(self) -> list[dict]:
+        return [wallet.stats() for wallet in self.wallets]
+
+    def _canPay(self, wallet: HotWallet, currency: str, value: float) -> bool:
+        if wallet.xrpBalance is not None and wallet.xrpBalance < self.minXrp:
+            return False
+        balance = wallet.balance(currency)
+        # Unknown until the first refresh, let it through rather than stall
+        return balance is None or balance - value >= self.minBalance
+
+    def _assign(self, transaction: Transaction, wallet: HotWallet) -> Transaction:
+        transactionJson = transaction.to_dict()
+        transactionJson["account"] = wallet.address
+        return type(transaction).from_dict(transactionJson)
+
+    def _amount(self, transaction: Transaction) -> tuple[str, float]:
+        amount = transaction.amount
+        if isinstance(amount, str):
+            return "XRP", float(drops_to_xrp(amount))
+        # buildPayment passes issued currency amounts as plain dicts
+        if isinstance(amount, dict):
+            return amount["currency"], float(amount["value"])
+        return amount.currency, float(amount.value)
+
+    async def _trustlineBalances(self, address: str) -> dict[str, float]:
+        balances = {}
+        marker = None
+        while True:
+            response = await self.connectionPool.request(
+                AccountLines(
+                    account=address, ledger_index="validated", limit=400, marker=marker
+                ),
+                hedge=True,
+            )
+            if not response.is_successful():
+                raise ConnectionError(str(response.result))
+
+            for line in response.result["lines"]:
+                balances[line["currency"]] = float(line["balance"])
+
+            marker = response.result.get("marker")
+            if marker is None:
+                return balances
+
+    async def _refreshLoop(self) -> None:
+        while True:
+            try:
+                await sleep(self.refreshInterval)
+                await self.refreshBalances()
+            except CancelledError:
+                return
+            except Exception as e:
+                loggingInstance.exception(f"Error refreshing hot wallet balances: {e}")
@@ -1,22 +1,62 @@
-from xrpl.asyncio.clients import AsyncWebsocketClient
 from xrpl.wallet import Wallet
 from xrpl.asyncio.account import get_balance
-from xrpl.asyncio.transaction import submit_and_wait, autofill
 from xrpl.models.transactions import Payment, Memo
 from xrpl.utils import xrp_to_drops
 from xrpl.models.requests.account_lines import AccountLines
-from asyncio import sleep
-from asyncio.exceptions import TimeoutError, CancelledError
+from asyncio.exceptions import TimeoutError
 from configparser import ConfigParser
 
-from requests import Session
-from utils.logging import loggingInstance
+from aiohttp import ClientSession, ClientTimeout, TCPConnector, ClientError
+from utils.logging import loggingInstance, LazyMessage
+from utils.metrics import metrics
+from utils.xrplPool import XRPLConnectionPool
+from utils.ledgerTracker import LedgerTracker
+from utils.paymentEngine import PaymentEngine, SequenceAllocator
+from utils.coordinator import CoordinatorClient, SharedSequenceAllocator
+from utils.walletDispatcher import WalletDispatcher
+from utils.ttlCache import TTLCache
+
+XRPSCAN_API = "https://api.xrpscan.com/api/v1"
+
+MISSING = object()
 
 
 class XRPClient:
-    def __init__(self, config: ConfigParser | None) -> None:
+    def __init__(
+        self,
+        config: ConfigParser | None,
+        coordinator: CoordinatorClient | None = None,
+    ) -> None:
         # Parse the configuration
         self.config = config
+
+        # Shares the hot wallet sequences with the other shard processes
+        self.coordinator = coordinator
+
+        # Long-lived websocket connections shared by every XRPL request
+        self.connectionPool = XRPLConnectionPool(
+            urls=self.getLinks("mainnet"),
+            size=self.config.getint("pool_size", fallback=2),
+            healthCheckInterval=self.config.getfloat(
+                "pool_health_interval", fallback=30.0
+            ),
+            hedgeDelay=self.config.getfloat("hedge_delay", fallback=0.5),
+        )
+
+        # Tracks ledger index and fee from the stream to fill payments locally
+        self.ledgerTracker = None
+        if self.config.getboolean("local_autofill", fallback=True):
+            self.ledgerTracker = LedgerTracker(
+                self.connectionPool,
+                ledgerOffset=self.config.getint("autofill_ledger_offset", fallback=20),
+                feeCushion=self.config.getfloat("autofill_fee_cushion", fallback=1.2),
+                maxFee=self.config.getint("autofill_max_fee", fallback=1000),
+            )
+
+        # Set by registerSeeds
+        self.wallet = None
+        self.paymentEngine = None
+
         # Set an initial test mode based on the configuration
         self.setTestMode(self.config.getboolean("test_mode"))
 
@@ -24,6 +64,15 @@ class XRPClient:
         self.lastCoinChecked = ""
         self.lastCoinIssuer = ""
 
+        # Balance lookups go through xrpscan or straight to the ledger
+        self.balanceSource = self.config.get("balance_source", fallback="xrpscan")
+        self.balanceApi = self.config.get("balance_api", fallback=XRPSCAN_API)
+        self.httpSession: ClientSession | None = None
+        self.balanceCache = TTLCache(
+            ttl=self.config.getfloat("balance_cache_ttl", fallback=60.0),
+            maxSize=self.config.getint("balance_cache_size", fallback=10000),
+        )
+
         # Verbosity for debugging purposes
         self.verbose = self.config.getboolean("verbose")
 
@@ -33,124 +82,41 @@ class XRPClient:
         # Prepare the result format
         funcResult = {"result": False, "error": None}
 
-        # if memos are given, properly format it.
-        if memos:
-            memoData = memos.encode("utf-8").hex()
-
         loggingInstance.debug("Preparing payment package...")
         try:
-            if coinHex.upper() == "XRP":
-                # Use xrp_to_drops if the currency is XRP
-                amount_drops = xrp_to_drops(float(value))
-                payment = Payment(
-                    account=self.wallet.classic_address,
-                    destination=address,
-                    amount=amount_drops,
-                    memos=[Memo(memo_data=memoData)] if memos else None,
-                )
-            else:
+            payment = self.buildPayment(address, value, coinHex, memos)
 
-                loggingInstance.debug("Checking for trustline...")
-                # Get the coin issuer from the trustline that is set on the sender's account
-                coinIssuer = self.config.get("coin_issuer")
-
-                # If the issuer is not available on the sender, return
-                if coinIssuer is None:
-                    funcResult["error"] = "TrustlineNotSetOnSender"
-                    funcResult["result"] = False
-                    return funcResult
-
-                loggingInstance.debug("Trustline found!...")
-
-                # Prepare the payment transaction format along with the given fields
-                payment = Payment(
-                    account=self.wallet.classic_address,
-                    destination=address,
-                    amount={
-                        "currency": coinHex,
-                        "value": str(value),  # Ensure amount is a string
-                        "issuer": coinIssuer,
-                    },
-                    memos=[Memo(memo_data=memoData)] if memos else None,
-                )
+            # If the issuer is not available on the sender, return
+            if payment is None:
+                funcResult["error"] = "TrustlineNotSetOnSender"
+                funcResult["result"] = False
+                return funcResult
 
-            # Retry logic should there be a network problem
-            retries = 3
-            for attempt in range(retries):
-                loggingInstance.debug(
-                    f"Attempt #{attempt+1} in sending {value} {coinHex} to {address}"
-                )
-                try:
-                    async with AsyncWebsocketClient(self.xrpLink) as client:
-                        loggingInstance.debug(
-                            f"Submitting payment transaction: {payment.to_dict()}"
-                        )
-
-                        autofilledTx = await autofill(
-                            transaction=payment, client=client
-                        )
-
-                        loggingInstance.debug(
-                            f"Autofilled transaction: {autofilledTx.to_dict()}"
-                        )
-
-                        # Ensure no unsupported fields are present
-                        if "full" in autofilledTx.to_dict().keys():
-                            loggingInstance.error(
-                                "Found unsupported field 'full' in autofilled transaction"
-                            )
-                            autofilledTx.to_dict().pop("full")
-
-                        # Autofill, submit, and wait for the transaction to be validated
-                        result = await submit_and_wait(
-                            transaction=autofilledTx,
-                            client=client,
-                            wallet=self.wallet,
-                            autofill=False,
-                        )
-
-                        loggingInstance.debug(f"Transaction result: {result.result}")
-
-                    if result.is_successful():
-                        loggingInstance.info("Transaction successful")
-                        funcResult["result"] = True
-                        return funcResult
-                    else:
-                        raise Exception(result.result)
-                except (TimeoutError, CancelledError, ConnectionError, OSError) as e:
-                    loggingInstance.warning(
-                        f"Connection error on attempt {attempt + 1}: {e}. Retrying..."
-                    )
-                    if attempt < retries - 1:
-                        await sleep(5)  # Wait before retrying
-                    else:
-                        loggingInstance.error(
-                            f"Failed to send transaction after {retries} attempts"
-                        )
-                        funcResult["result"] = False
-                        funcResult["error"] = (
-                            f"Connection timeout after {retries} retries"
-                        )
-                        return funcResult
-                except Exception as e:
-                    loggingInstance.error(f"Exception in transaction submission: {e}")
-
-                    if "noCurrent" in str(e) or "overloaded" in str(e):
-                        loggingInstance.warning(
-                            f"Attempt {attempt + 1} failed: {e}. Retrying..."
-                        )
-                        if attempt < retries - 1:
-                            await sleep(5)  # Wait before retrying
-                        else:
-                            funcResult["result"] = False
-                            funcResult["error"] = str(e)
-                            return funcResult
-                    else:
-                        raise e
-
-            # If we've exhausted all retries without success
-            funcResult["result"] = False
-            funcResult["error"] = "Failed after all retry attempts"
+            loggingInstance.debug(
+                "Submitting payment transaction: %s", LazyMessage(payment.to_dict)
+            )
+
+            # Sequence allocation, signing, submission, validation and retries
+            # are handled by the engine. It is never called twice for one
+            # payment, a second call would sign a second payment
+            try:
+                result = await self.paymentEngine.sendPayment(payment)
+            except (TimeoutError, ConnectionError, OSError) as e:
+                # The payment may have been submitted before the error
+                loggingInstance.error(f"Connection error sending to {address}: {e}")
+                funcResult["error"] = f"Connection timeout while sending: {e}"
+                return funcResult
+            finally:
+                # The destination balance is stale whatever the outcome
+                self.invalidateBalance(address, coinHex)
+
+            loggingInstance.debug(f"Transaction result: {result}")
+
+            if result["result"]:
+                loggingInstance.info("Transaction successful")
+                funcResult["result"] = True
+            else:
+                funcResult["error"] = result["error"]
             return funcResult
 
         except Exception as e:
@@ -161,35 +127,213 @@ class XRPClient:
             funcResult["error"] = e
             return funcResult
 
+    def buildPayment(
+        self, address: str, value: float, coinHex: str = "XRP", memos: str | None = None
+    ) -> Payment | None:
+        # if memos are given, properly format it.
+        if memos:
+            memoData = memos.encode("utf-8").hex()
+
+        if coinHex.upper() == "XRP":
+            # Use xrp_to_drops if the currency is XRP
+            amount_drops = xrp_to_drops(float(value))
+            return Payment(
+                account=self.wallet.classic_address,
+                destination=address,
+                amount=amount_drops,
+                memos=[Memo(memo_data=memoData)] if memos else None,
+            )
+
+        loggingInstance.debug("Checking for trustline...")
+        # Get the coin issuer from the trustline that is set on the sender's account
+        coinIssuer = self.config.get("coin_issuer")
+
+        if coinIssuer is None:
+            return None
+
+        loggingInstance.debug("Trustline found!...")
+
+        # Prepare the payment transaction format along with the given fields
+        return Payment(
+            account=self.wallet.classic_address,
+            destination=address,
+            amount={
+                "currency": coinHex,
+                "value": str(value),  # Ensure amount is a string
+                "issuer": coinIssuer,
+            },
+            memos=[Memo(memo_data=memoData)] if memos else None,
+        )
+
     async def checkBalance(self):
-        async with AsyncWebsocketClient(self.xrpLink) as client:
-            return await get_balance(self.wallet.address, client)
+        return await self.connectionPool.run(
+            lambda client: get_balance(self.wallet.address, client), hedge=True
+        )
+
+    async def request(self, request, hedge=False):
+        # Shared entry point for ledger queries over the pooled connections,
+        # only read-only requests should be hedged
+        return await self.connectionPool.request(request, hedge=hedge)
+
+    async def start(self) -> None:
+        await self.connectionPool.start()
+        if self.ledgerTracker is not None:
+            await self.ledgerTracker.start()
+        if self.paymentEngine is not None:
+            await self.paymentEngine.start()
+
+    async def close(self) -> None:
+        if self.paymentEngine is not None:
+            await self.paymentEngine.close()
+        if self.ledgerTracker is not None:
+            await self.ledgerTracker.close()
+        await self.connectionPool.close()
+        if self.httpSession is not None:
+            await self.httpSession.close()
 
     def setTestMode(self, mode=True) -> None:
-        if mode:
-            self.xrpLink = self.config["testnet_link"]
-        else:
-            self.xrpLink = self.config["mainnet_link"]
+        links = self.getLinks("testnet" if mode else "mainnet")
+        self.xrpLink = links[0]
+        self.connectionPool.setUrls(links)
+
+    def getLinks(self, network: str) -> list[str]:
+        # A comma separated <network>_links list, falling back to <network>_link
+        links = self.config.get(f"{network}_links", fallback="")
+        links = [link.strip() for link in links.split(",") if link.strip()]
+        return links or [self.config[f"{network}_link"]]
 
     async def registerSeed(self, seed) -> dict:
+        return await self.registerSeeds([seed])
+
+    async def registerSeeds(self, seeds: list[str]) -> dict:
+        # Every seed is a hot wallet with its own sequence stream, payments are
+        # spread over them by the dispatcher
         try:
-            loggingInstance.debug("Registering Wallet...")
-            self.wallet = Wallet.from_seed(seed)
+            loggingInstance.debug(f"Registering {len(seeds)} Wallet(s)...")
+            wallets = [Wallet.from_seed(seed) for seed in seeds]
+            self.wallet = wallets[0]
+            self.paymentEngine = WalletDispatcher(
+                engines=[
+                    PaymentEngine(
+                        wallet=wallet,
+                        connectionPool=self.connectionPool,
+                        maxInFlight=self.config.getint("max_in_flight", fallback=20),
+                        ledgerTracker=self.ledgerTracker,
+                        sequenceAllocator=self.sequenceAllocator(wallet),
+                    )
+                    for wallet in wallets
+                ],
+                connectionPool=self.connectionPool,
+                strategy=self.config.get("wallet_strategy", fallback="least_in_flight"),
+                minBalance=self.config.getfloat("wallet_min_balance", fallback=0.0),
+                minXrp=self.config.getfloat("wallet_min_xrp", fallback=20.0),
+                refreshInterval=self.config.getfloat(
+                    "wallet_refresh_interval", fallback=60.0
+                ),
+            )
             loggingInstance.info("Wallet registered successfully")
             return {"result": True, "error": "success"}
         except Exception as e:
             loggingInstance.exception("Error in wallet registration")
             return {"result": False, "error": e}
 
+    def sequenceAllocator(self, wallet: Wallet) -> SequenceAllocator | None:
+        # None lets the engine keep its own in-process sequence stream
+        if self.coordinator is None:
+            return None
+        return SharedSequenceAllocator(
+            wallet.classic_address, self.connectionPool, self.coordinator
+        )
+
+    def getSeeds(self) -> list[str]:
+        # A comma separated seeds list, falling back to the single seed
+        seeds = self.config.get("seeds", fallback="")
+        seeds = [seed.strip() for seed in seeds.split(",") if seed.strip()]
+        return seeds or [self.config["seed"]]
+
     def getTestMode(self) -> bool:
-        return self.xrpLink == self.config["testnet_link"]
+        return self.xrpLink in self.getLinks("testnet")
 
-    async def getAccountBalance(self, xrpId, token):
-        session = Session()
-        request = session.get(f"https://api.xrpscan.com/api/v1/account/{xrpId}/assets")
-        if request.ok:
-            for asset in request.json():
-                if asset["currency"] == token:
-                    return float(asset["value"])
+    async def getAccountBalance(self, xrpId, token, issuer):
+        # Rejected users and repeat claims are answered from the cache
+        balance = self.balanceCache.get((xrpId, token), MISSING)
+        if balance is not MISSING:
+            return balance
+
+        # Anyone can issue a token under the same currency code, only the
+        # configured issuer's is counted
+        if not issuer:
+            loggingInstance.warning(f"getAccountBalance({token}): no issuer configured")
+            return False
+
+        if self.balanceSource == "ledger":
+            balance = await self.getTrustlineBalance(xrpId, token, issuer)
+        else:
+            balance = await self.getXrpscanBalance(xrpId, token, issuer)
+
+        # False is also a failed lookup, only balances that were read are kept
+        if balance is not False:
+            self.balanceCache.set((xrpId, token), balance)
+        return balance
+
+    def invalidateBalance(self, xrpId, token) -> None:
+        self.balanceCache.invalidate((xrpId, token))
+
+    @metrics.timed("balance_xrpscan")
+    async def getXrpscanBalance(self, xrpId, token, issuer):
+        try:
+            session = self._getHttpSession()
+            url = f"{self.balanceApi}/account/{xrpId}/assets"
+            async with session.get(url) as request:
+                if request.ok:
+                    for asset in await request.json():
+                        if (
+                            asset["currency"] == token
+                            and asset.get("counterparty") == issuer
+                        ):
+                            return float(asset["value"])
+        except (ClientError, TimeoutError, ValueError) as e:
+            # ValueError when the API answers with something other than JSON
+            loggingInstance.warning(f"getXrpscanBalance({xrpId}, {token}): {e}")
 
         return False
+
+    @metrics.timed("balance_ledger")
+    async def getTrustlineBalance(self, xrpId, token, issuer):
+        # Walk the holder's trustlines straight from the ledger, no third party API
+        marker = None
+        while True:
+            response = await self.request(
+                AccountLines(
+                    account=xrpId, ledger_index="validated", limit=400, marker=marker
+                ),
+                hedge=True,
+            )
+            if not response.is_successful():
+                loggingInstance.warning(
+                    f"getTrustlineBalance({xrpId}, {token}): {response.result}"
+                )
+                return False
+
+            for line in response.result["lines"]:
+                # account is the other side of the trustline, the issuer
+                if line["currency"] == token and line["account"] == issuer:
+                    return float(line["balance"])
+
+            marker = response.result.get("marker")
+            if marker is None:
+                return False
+
+    def _getHttpSession(self) -> ClientSession:
+        # Created lazily since aiohttp sessions must be bound to the running loop
+        if self.httpSession is None or self.httpSession.closed:
+            self.httpSession = ClientSession(
+                connector=TCPConnector(
+                    limit=self.config.getint("balance_pool_size", fallback=20),
+                    keepalive_timeout=60,
+                ),
+                timeout=ClientTimeout(
+                    total=self.config.getfloat("balance_timeout", fallback=5.0)
+                ),
+            )
+        return self.httpSession
@@ -0,0 +1,295 @@
+from xrpl.asyncio.clients import AsyncWebsocketClient
+from xrpl.models.requests import Ping
+from xrpl.models.response import Response
+from asyncio import FIRST_COMPLETED, Lock, create_task, sleep, wait, wait_for, Task
+from asyncio.exceptions import TimeoutError, CancelledError
+from time import monotonic
+
+from utils.logging import loggingInstance
+from utils.metrics import metrics
+
+
+# Node side errors that say the node, not the request, is the problem
+BUSY_ERRORS = ("noCurrent", "noNetwork", "overloaded", "tooBusy", "slowDown")
+
+CONNECTION_ERRORS = (TimeoutError, ConnectionError, OSError)
+
+
+class EndpointBusy(Exception):
+    def __init__(self, url: str, response: Response | None = None) -> None:
+        super().__init__(f"{url} is busy")
+        self.response = response
+
+
+class XRPLEndpoint:
+    def __init__(
+        self,
+        url: str,
+        size: int = 2,
+        smoothing: float = 0.2,
+        errorPenalty: float = 1.0,
+        maxFailures: int = 3,
+    ) -> None:
+        self.url = url
+        self.size = max(1, size)
+        self.smoothing = smoothing
+        self.errorPenalty = errorPenalty
+        self.maxFailures = maxFailures
+
+        # Each slot holds one long-lived websocket client, opened lazily
+        self.clients: list[AsyncWebsocketClient | None] = [None] * self.size
+        self.locks = [Lock() for _ in range(self.size)]
+        self.nextSlot = 0
+
+        # Moving averages of response time in seconds and of the error rate
+        self.latency: float | None = None
+        self.errorRate = 0.0
+
+        # Consecutive failures, past maxFailures the endpoint is benched
+        self.failures = 0
+        self.downUntil = 0.0
+
+    @property
+    def score(self) -> float:
+        # Lower is better, an unmeasured endpoint gets a fair chance first
+        latency = self.latency if self.latency is not None else 0.0
+        return latency + self.errorRate * self.errorPenalty
+
+    def isDown(self) -> bool:
+        return monotonic() < self.downUntil
+
+    def recordSuccess(self, latency: float) -> None:
+        self.recordLatency(latency)
+        self.errorRate *= 1 - self.smoothing
+        self.failures = 0
+        self.downUntil = 0.0
+
+    def recordLatency(self, latency: float) -> None:
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self.smoothing * (latency - self.latency)
+
+    def recordError(self) -> None:
+        self.errorRate += self.smoothing * (1 - self.errorRate)
+        self.failures += 1
+        if self.failures >= self.maxFailures:
+            # Back off longer the longer it keeps failing, the health check
+            # brings it back as soon as a ping succeeds
+            backoff = min(60.0, 5.0 * 2 ** (self.failures - self.maxFailures))
+            self.downUntil = monotonic() + backoff
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "latency": self.latency,
+            "errorRate": self.errorRate,
+            "down": self.isDown(),
+        }
+
+
+class XRPLConnectionPool:
+    def __init__(
+        self,
+        urls: list[str],
+        size: int = 2,
+        healthCheckInterval: float = 30.0,
+        connectTimeout: float = 10.0,
+        hedgeDelay: float = 0.5,
+    ) -> None:
+        self.size = max(1, size)
+        self.healthCheckInterval = healthCheckInterval
+        self.connectTimeout = connectTimeout
+
+        # Hedged reads go to a second endpoint once the first is this slow
+        self.hedgeDelay = hedgeDelay
+
+        self.endpoints: list[XRPLEndpoint] = []
+        # Endpoints dropped by setUrls, closed on the next health check
+        self.retired: list[XRPLEndpoint] = []
+        self.setUrls(urls)
+
+        self.healthTask: Task | None = None
+
+    async def start(self) -> None:
+        # Open every slot up front so the first claims do not pay the handshake
+        for endpoint in self.endpoints:
+            for slot in range(endpoint.size):
+                try:
+                    await self._ensureOpen(endpoint, slot)
+                except CONNECTION_ERRORS as e:
+                    endpoint.recordError()
+                    loggingInstance.warning(
+                        f"XRPL connection #{slot} to {endpoint.url} failed to open: {e}"
+                    )
+
+        if self.healthTask is None or self.healthTask.done():
+            self.healthTask = create_task(self._healthLoop())
+
+    async def close(self) -> None:
+        if self.healthTask is not None:
+            self.healthTask.cancel()
+            self.healthTask = None
+
+        for endpoint in self.endpoints + self.retired:
+            await self._closeEndpoint(endpoint)
+        self.retired = []
+
+    def setUrls(self, urls: list[str]) -> None:
+        # Switching networks invalidates every open connection, the old
+        # endpoints stop taking requests now and are closed in the background
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            raise ValueError("At least one XRPL endpoint is required")
+
+        kept = {endpoint.url: endpoint for endpoint in self.endpoints}
+        self.retired += [e for e in self.endpoints if e.url not in urls]
+        self.endpoints = [kept.get(url) or XRPLEndpoint(url, self.size) for url in urls]
+
+    def ranked(self) -> list[XRPLEndpoint]:
+        # Healthy endpoints by score, benched ones are only a last resort
+        return sorted(self.endpoints, key=lambda e: (e.isDown(), e.score))
+
+    async def request(self, request, hedge: bool = False):
+        return await self.run(lambda client: client.request(request), hedge=hedge)
+
+    async def run(self, operation, hedge: bool = False):
+        # Awaits operation(client) on the best endpoint, failing over to the
+        # next one on connection errors or a busy node. Only hedge operations
+        # that are safe to run twice, such as reads
+        endpoints = self.ranked()
+        lastError: Exception | None = None
+
+        for index, endpoint in enumerate(endpoints):
+            if index:
+                metrics.increment("xrain_xrpl_failover_total", url=endpoint.url)
+            backup = endpoints[index + 1] if index + 1 < len(endpoints) else None
+            try:
+                if hedge and backup is not None:
+                    return await self._hedged(operation, endpoint, backup)
+                return await self._attempt(operation, endpoint)
+            except (EndpointBusy, *CONNECTION_ERRORS) as e:
+                lastError = e
+
+        # Every endpoint is busy, hand back the node's own answer or error
+        if isinstance(lastError, EndpointBusy):
+            if lastError.response is not None:
+                return lastError.response
+            raise lastError.__cause__
+        raise lastError
+
+    def stats(self) -> list[dict]:
+        return [endpoint.stats() for endpoint in self.ranked()]
+
+    async def _attempt(self, operation, endpoint: XRPLEndpoint):
+        slot = endpoint.nextSlot
+        endpoint.nextSlot = (endpoint.nextSlot + 1) % endpoint.size
+
+        start = monotonic()
+        try:
+            client = await self._ensureOpen(endpoint, slot)
+            result = await operation(client)
+        except CancelledError:
+            # Lost a hedge race, the wait so far still says something
+            endpoint.recordLatency(monotonic() - start)
+            raise
+        except CONNECTION_ERRORS:
+            endpoint.recordError()
+            await self._closeSlot(endpoint, slot)
+            raise
+        except Exception as e:
+            if any(error in str(e) for error in BUSY_ERRORS):
+                endpoint.recordError()
+                raise EndpointBusy(endpoint.url) from e
+            raise
+
+        if isinstance(result, Response) and not result.is_successful():
+            if result.result.get("error") in BUSY_ERRORS:
+                endpoint.recordError()
+                raise EndpointBusy(endpoint.url, result)
+
+        endpoint.recordSuccess(monotonic() - start)
+        return result
+
+    async def _hedged(self, operation, primary: XRPLEndpoint, backup: XRPLEndpoint):
+        first = create_task(self._attempt(operation, primary))
+        done, x = await wait({first}, timeout=self.hedgeDelay)
+        if done:
+            return first.result()
+
+        metrics.increment("xrain_xrpl_hedged_total")
+        pending = {first, create_task(self._attempt(operation, backup))}
+        try:
+            while pending:
+                done, pending = await wait(pending, return_when=FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _ensureOpen(self, endpoint: XRPLEndpoint, slot: int):
+        client = endpoint.clients[slot]
+        if client is not None and client.is_open():
+            return client
+
+        async with endpoint.locks[slot]:
+            client = endpoint.clients[slot]
+            if client is not None and client.is_open():
+                return client
+
+            loggingInstance.debug(f"Opening XRPL connection #{slot} to {endpoint.url}")
+            client = AsyncWebsocketClient(endpoint.url)
+            await wait_for(client.open(), timeout=self.connectTimeout)
+            endpoint.clients[slot] = client
+            return client
+
+    async def _closeSlot(self, endpoint: XRPLEndpoint, slot: int) -> None:
+        async with endpoint.locks[slot]:
+            client = endpoint.clients[slot]
+            endpoint.clients[slot] = None
+
+        if client is not None and client.is_open():
+            try:
+                await client.close()
+            except Exception as e:
+                loggingInstance.warning(
+                    f"Error closing XRPL connection #{slot} to {endpoint.url}: {e}"
+                )
+
+    async def _closeEndpoint(self, endpoint: XRPLEndpoint) -> None:
+        for slot in range(endpoint.size):
+            await self._closeSlot(endpoint, slot)
+
+    async def _healthLoop(self) -> None:
+        while True:
+            try:
+                await sleep(self.healthCheckInterval)
+
+                retired, self.retired = self.retired, []
+                for endpoint in retired:
+                    await self._closeEndpoint(endpoint)
+
+                # Benched endpoints are pinged too, a success puts them back
+                for endpoint in self.endpoints:
+                    for slot in range(endpoint.size):
+                        start = monotonic()
+                        try:
+                            client = await self._ensureOpen(endpoint, slot)
+                            await wait_for(
+                                client.request(Ping()), timeout=self.connectTimeout
+                            )
+                            endpoint.recordSuccess(monotonic() - start)
+                        except CONNECTION_ERRORS as e:
+                            loggingInstance.warning(
+                                f"XRPL connection #{slot} to {endpoint.url} failed health check: {e}. Reconnecting..."
+                            )
+                            endpoint.recordError()
+                            await self._closeSlot(endpoint, slot)
+            except CancelledError:
+                return
+            except Exception as e:
+                loggingInstance.exception(f"Error in XRPL pool health check: {e}")
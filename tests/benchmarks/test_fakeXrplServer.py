@@ -0,0 +1,65 @@
+from asyncio import gather
+from socket import socket
+
+import pytest
+import pytest_asyncio
+from xrpl.models.transactions import Payment
+from xrpl.wallet import Wallet
+
+from fakeXrplServer import FakeXrplServer
+from utils.paymentEngine import PaymentEngine
+from utils.xrplPool import XRPLConnectionPool
+
+
+WALLET = Wallet.create()
+
+
+def freePort() -> int:
+    with socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+@pytest_asyncio.fixture
+async def xrplServer():
+    server = FakeXrplServer(port=freePort(), ledgerClose=0.05)
+    await server.start()
+    yield server
+    await server.stop()
+
+
+@pytest_asyncio.fixture
+async def paymentEngine(xrplServer):
+    connectionPool = XRPLConnectionPool([xrplServer.url], size=1)
+    yield PaymentEngine(WALLET, connectionPool, retryDelay=0, pollInterval=0.02)
+    await connectionPool.close()
+
+
+def payment() -> Payment:
+    return Payment(
+        account=WALLET.classic_address,
+        destination=Wallet.create().classic_address,
+        amount="1000",
+    )
+
+
+@pytest.mark.asyncio
+async def test_concurrent_payments_validate_once_each(xrplServer, paymentEngine):
+    results = await gather(*(paymentEngine.sendPayment(payment()) for _ in range(5)))
+
+    assert all(result["result"] for result in results)
+    assert xrplServer.submitted == 5
+    assert xrplServer.sequences[WALLET.classic_address] == 6
+
+
+@pytest.mark.asyncio
+async def test_resumed_blob_is_not_applied_twice(xrplServer, paymentEngine):
+    signedTx = await paymentEngine.signPayment(payment())
+    assert (await paymentEngine.settleSigned(signedTx))["result"]
+
+    # As a restart finds it in the outbox, signed with an unknown outcome
+    result = await paymentEngine.settleSigned(signedTx)
+
+    assert result["result"] is True
+    assert len(xrplServer.transactions) == 1
+    assert xrplServer.sequences[WALLET.classic_address] == 2
@@ -0,0 +1,38 @@
+from os import chdir, path
+from tempfile import mkdtemp
+import sys
+
+TESTS_DIR = path.dirname(path.abspath(__file__))
+ROOT_DIR = path.dirname(TESTS_DIR)
+
+# Imported the way main.py sees them, plus the SQLite XparrotDB of the benchmarks
+sys.path[:0] = [path.join(ROOT_DIR, "src"), path.join(ROOT_DIR, "benchmarks")]
+
+# utils.config reads config.ini from the working directory on import
+CONFIG_TEMPLATE = """
+[BOT]
+token = tests
+
+[XRPL]
+testnet_link = wss://s.altnet.rippletest.net:51233/
+mainnet_link = wss://s1.ripple.com/
+test_mode = False
+
+[COINS]
+XRAIN = 585241494E000000000000000000000000000000
+min_nft_count = 1
+
+[DATABASE]
+db_server = localhost
+db_name = tests
+
+[LOGGING]
+level = WARNING
+queued = False
+file = {workDir}/tests.log
+"""
+
+workDir = mkdtemp(prefix="xrain-tests-")
+with open(path.join(workDir, "config.ini"), "w") as configFile:
+    configFile.write(CONFIG_TEMPLATE.format(workDir=workDir))
+chdir(workDir)
@@ -0,0 +1,12 @@
+import pytest_asyncio
+
+from fakeDatabase import createBenchmarkDB
+
+
+@pytest_asyncio.fixture
+async def benchmarkDB(tmp_path):
+    dbInstance, xrpIds = await createBenchmarkDB(
+        str(tmp_path / "rewards.sqlite3"), holders=5, nftsPerHolder=2
+    )
+    yield dbInstance, xrpIds
+    await dbInstance.dbEngine.dispose()
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from database.cooldownEngine import CooldownEngine
+from database.dbClock import DBClock
+
+
+def cooldownEngine(localOffset: timedelta = timedelta(0)) -> CooldownEngine:
+    clock = DBClock()
+    utcTime = datetime(2026, 7, 1, 12, 0)
+    clock.record(utcTime + localOffset, utcTime)
+    return CooldownEngine(clock)
+
+
+def status() -> dict:
+    return {"result": "", "timeRemaining": {"hour": 0, "minute": 0, "second": 0}}
+
+
+@pytest.mark.parametrize(
+    "now, redemption",
+    [
+        # 19:00 EDT is 23:00 UTC
+        (datetime(2026, 7, 1, 22, 59), datetime(2026, 6, 30, 23, 0)),
+        (datetime(2026, 7, 1, 23, 0), datetime(2026, 7, 1, 23, 0)),
+        # 19:00 EST is midnight UTC
+        (datetime(2026, 1, 15, 23, 59), datetime(2026, 1, 15, 0, 0)),
+        (datetime(2026, 1, 16, 0, 0), datetime(2026, 1, 16, 0, 0)),
+    ],
+)
+def test_last_redemption_is_the_latest_19_et(now, redemption):
+    assert cooldownEngine().lastRedemption(now) == redemption
+
+
+def test_redemptions_follow_the_dst_changes():
+    engine = cooldownEngine()
+
+    # Clocks go forward on 8 March and back on 1 November 2026
+    assert engine.lastRedemption(datetime(2026, 3, 8, 0, 30)) == datetime(
+        2026, 3, 8, 0, 0
+    )
+    assert engine.lastRedemption(datetime(2026, 3, 8, 23, 30)) == datetime(
+        2026, 3, 8, 23, 0
+    )
+    # 18:30 EST on 1 November, the last redemption is still 19:00 EDT
+    assert engine.lastRedemption(datetime(2026, 11, 1, 23, 30)) == datetime(
+        2026, 10, 31, 23, 0
+    )
+    assert engine.lastRedemption(datetime(2026, 11, 2, 0, 30)) == datetime(
+        2026, 11, 2, 0, 0
+    )
+
+
+def test_reward_claimed_for_a_redemption_waits_a_day():
+    engine = cooldownEngine()
+    redemption = datetime(2026, 7, 1, 23, 0)
+
+    result = engine.check("traits", redemption, status(), now=redemption)
+    assert result["result"] == "NotReady"
+    assert result["timeRemaining"] == {"hour": 24, "minute": 0, "second": 0}
+
+    result = engine.check(
+        "traits", redemption, status(), now=redemption + timedelta(days=1)
+    )
+    assert result["result"] == "Claimable"
+
+
+def test_bonus_flag_in_db_local_time_is_shifted_to_utc():
+    # The bonus flag is stamped with NOW(), here four hours behind UTC
+    engine = cooldownEngine(localOffset=timedelta(hours=-4))
+    claimedAt = datetime(2026, 7, 1, 8, 0)
+
+    result = engine.check(
+        "bonus", claimedAt, status(), now=datetime(2026, 7, 2, 11, 30)
+    )
+
+    assert result["result"] == "NotReady"
+    assert result["timeRemaining"]["minute"] == 30
+
+
+@pytest.mark.parametrize("lastClaim", [None, "", "0000-00-00 00:00:00"])
+def test_never_claimed_is_claimable(lastClaim):
+    result = cooldownEngine().check("amm", lastClaim, status())
+
+    assert result["result"] == "Claimable"
+
+
+def test_unknown_holder_is_not_found():
+    result = cooldownEngine().check("amm", None, status(), found=False)
+
+    assert result["result"] == "XrpIdNotFound"
@@ -0,0 +1,98 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy.dialects import mysql
+
+from database.claimContext import REWARD_TYPES
+from database.statements import (
+    CLAIM_FLAG,
+    LOCK_CLAIMABLE,
+    RESERVE_CLAIM,
+    RESERVE_CLAIMS,
+    RESTORE_FLAG,
+    REWARDS_ROW,
+)
+
+
+@pytest.mark.parametrize(
+    "statements",
+    [
+        CLAIM_FLAG,
+        RESTORE_FLAG,
+        RESERVE_CLAIM,
+        LOCK_CLAIMABLE,
+        RESERVE_CLAIMS,
+    ],
+)
+def test_statements_compile_for_mysql(statements):
+    for statement in statements.values():
+        statement.compile(dialect=mysql.dialect())
+    REWARDS_ROW.compile(dialect=mysql.dialect())
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("rewardType", sorted(REWARD_TYPES))
+async def test_reserve_claim_once_until_released(benchmarkDB, rewardType):
+    dbInstance, xrpIds = benchmarkDB
+    xrpId = xrpIds[0]
+    await dbInstance.getClaimContext(xrpId, rewardType, withNFT=False)
+
+    assert await dbInstance.reserveClaim(xrpId, rewardType)
+    assert not await dbInstance.reserveClaim(xrpId, rewardType)
+
+    await dbInstance.releaseClaim(xrpId, rewardType, None)
+    assert await dbInstance.reserveClaim(xrpId, rewardType)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("rewardType", sorted(REWARD_TYPES))
+async def test_reserve_claim_writes_through_a_flag_date(benchmarkDB, rewardType):
+    dbInstance, xrpIds = benchmarkDB
+    xrpId = xrpIds[0]
+    await dbInstance.getClaimContext(xrpId, rewardType, withNFT=False)
+
+    assert await dbInstance.reserveClaim(xrpId, rewardType)
+
+    flagColumn, clock = REWARD_TYPES[rewardType]
+    lastClaim = dbInstance.rowCache.peek(xrpId)[flagColumn.key]
+    assert isinstance(lastClaim, datetime)
+
+    context = await dbInstance.getClaimContext(xrpId, rewardType, withNFT=False)
+    assert context.status["result"] == "NotReady"
+
+
+@pytest.mark.asyncio
+async def test_reserve_claims_skips_reserved_holders(benchmarkDB):
+    dbInstance, xrpIds = benchmarkDB
+    await dbInstance.getClaimContext(xrpIds[0], "traits", withNFT=False)
+    assert await dbInstance.reserveClaim(xrpIds[0], "traits")
+
+    reserved = await dbInstance.reserveClaims(xrpIds, "traits")
+
+    assert sorted(reserved) == sorted(xrpIds[1:])
+    assert await dbInstance.reserveClaims(xrpIds, "traits") == []
+
+
+@pytest.mark.asyncio
+async def test_stream_claimable_pages_through_every_holder(benchmarkDB):
+    dbInstance, xrpIds = benchmarkDB
+
+    batches = [
+        batch
+        async for batch in dbInstance.streamClaimable(
+            "traits", batchSize=2, withNFT=True
+        )
+    ]
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert [xrpId for batch in batches for xrpId, x, y in batch] == sorted(xrpIds)
+
+
+@pytest.mark.asyncio
+async def test_stream_claimable_resumes_after_an_xrp_id(benchmarkDB):
+    dbInstance, xrpIds = benchmarkDB
+    xrpIds = sorted(xrpIds)
+
+    batches = [batch async for batch in dbInstance.streamClaimable("traits", xrpIds[2])]
+
+    assert [xrpId for batch in batches for xrpId, x, y in batch] == xrpIds[3:]
@@ -0,0 +1,75 @@
+import pytest
+from sqlalchemy import update
+
+from database.claimContext import REWARD_TYPES
+from database.models.rewardstable import RewardsTable
+
+
+async def setRow(dbInstance, xrpId, **values):
+    # A write made by another process, none of this one's caches see it
+    async with dbInstance.asyncSessionMaker() as session:
+        async with session.begin():
+            await session.execute(
+                update(RewardsTable).where(RewardsTable.xrpId == xrpId).values(**values)
+            )
+
+
+@pytest.mark.asyncio
+async def test_cooldown_is_answered_from_the_snapshot(benchmarkDB):
+    dbInstance, xrpIds = benchmarkDB
+    xrpId = xrpIds[0]
+    assert await dbInstance.reserveClaim(xrpId, "traits")
+    await dbInstance.loadEligibility()
+    dbInstance.rowCache.invalidate(xrpId)
+
+    await setRow(dbInstance, xrpId, **{REWARD_TYPES["traits"][0].key: None})
+    context = await dbInstance.getClaimContext(xrpId, "traits", withNFT=False)
+
+    assert context.status["result"] == "NotReady"
+
+
+@pytest.mark.asyncio
+async def test_nft_count_raised_after_the_load_is_read_from_the_db(benchmarkDB):
+    dbInstance, xrpIds = benchmarkDB
+    xrpId = xrpIds[0]
+    await dbInstance.loadEligibility()
+
+    await setRow(dbInstance, xrpId, penaltyTraits3DRewards=100)
+    context = await dbInstance.getClaimContext(
+        xrpId, "amm", minNftCount=50, withNFT=False
+    )
+
+    assert context.status["result"] == "Claimable"
+
+
+@pytest.mark.asyncio
+async def test_released_holders_are_read_again_on_refresh(benchmarkDB):
+    dbInstance, xrpIds = benchmarkDB
+    xrpId = xrpIds[0]
+    assert await dbInstance.reserveClaim(xrpId, "traits")
+    await dbInstance.loadEligibility()
+
+    # Released by another shard, the flag goes back to its older date
+    await setRow(dbInstance, xrpId, **{REWARD_TYPES["traits"][0].key: None})
+    async with dbInstance.asyncSessionMaker() as session:
+        await dbInstance.eligibility.refresh(
+            session, dbInstance.getLastRedemption(), [xrpId]
+        )
+
+    assert dbInstance.eligibility.context(xrpId, "traits").lastClaim is None
+
+
+@pytest.mark.asyncio
+async def test_missed_releases_rebuild_the_snapshot(benchmarkDB):
+    dbInstance, xrpIds = benchmarkDB
+    xrpId = xrpIds[0]
+    assert await dbInstance.reserveClaim(xrpId, "traits")
+    await dbInstance.loadEligibility()
+
+    await setRow(dbInstance, xrpId, **{REWARD_TYPES["traits"][0].key: None})
+    async with dbInstance.asyncSessionMaker() as session:
+        await dbInstance.eligibility.refresh(
+            session, dbInstance.getLastRedemption(), None
+        )
+
+    assert dbInstance.eligibility.context(xrpId, "traits").lastClaim is None
@@ -0,0 +1,41 @@
+import pytest
+
+from database.nftIndex import NFTIndex
+from database.nftLinks import IPFS_GATEWAY, default_images, update_nftLink
+
+
+def nftRow(nftLink, nftGroupName="Unknown Group"):
+    return ("token", 1, nftLink, nftGroupName, 0)
+
+
+def test_ipfs_links_are_stored_in_gateway_form():
+    assert update_nftLink("ipfs://bafy/1.png") == f"{IPFS_GATEWAY}bafy/1.png"
+
+
+def test_gateway_links_are_kept():
+    link = f"{IPFS_GATEWAY}bafy/1.png"
+    assert update_nftLink(link) == link
+
+
+@pytest.mark.asyncio
+async def test_dead_link_without_placeholder_keeps_the_nft():
+    index = NFTIndex()
+    index._store("holder", (nftRow("https://example.com/1.png"),))
+    index.deadLinks.add("https://example.com/1.png")
+
+    nft = await index.pick(None, "holder")
+
+    assert nft is not None
+    assert nft[0] == "token"
+    assert nft[2] is None
+
+
+@pytest.mark.asyncio
+async def test_dead_link_falls_back_to_the_group_placeholder():
+    index = NFTIndex()
+    index._store("holder", (nftRow("https://example.com/1.png", "XParrots"),))
+    index.deadLinks.add("https://example.com/1.png")
+
+    nft = await index.pick(None, "holder")
+
+    assert nft[2] == default_images["XParrots"]
@@ -0,0 +1,109 @@
+from asyncio import Event, create_task, sleep
+
+import pytest
+
+from utils.claimScheduler import ClaimScheduler, SchedulerBusy
+
+
+async def hold(scheduler, started: list, release: Event, name: str, positions=None):
+    async def onQueued(position):
+        positions.append((name, position))
+
+    async with scheduler.admit(onQueued if positions is not None else None):
+        started.append(name)
+        await release.wait()
+
+
+@pytest.mark.asyncio
+async def test_waiting_claims_are_admitted_in_arrival_order():
+    scheduler = ClaimScheduler(maxActive=1, maxQueued=10)
+    started, positions, release = [], [], Event()
+
+    tasks = [
+        create_task(hold(scheduler, started, release, name, positions))
+        for name in ("first", "second", "third")
+    ]
+    await sleep(0)
+
+    assert started == ["first"]
+    assert positions == [("second", 1), ("third", 2)]
+
+    release.set()
+    for task in tasks:
+        await task
+    assert started == ["first", "second", "third"]
+    assert scheduler.stats()["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_claims_past_the_queue_limit_are_shed():
+    scheduler = ClaimScheduler(maxActive=1, maxQueued=1)
+    started, release = [], Event()
+    tasks = [
+        create_task(hold(scheduler, started, release, name))
+        for name in ("active", "queued")
+    ]
+    await sleep(0)
+
+    with pytest.raises(SchedulerBusy, match="queueFull"):
+        async with scheduler.admit():
+            pass
+
+    release.set()
+    for task in tasks:
+        await task
+
+
+@pytest.mark.asyncio
+async def test_claims_waiting_too_long_are_shed():
+    scheduler = ClaimScheduler(maxActive=1, queueTimeout=0.01)
+    started, release = [], Event()
+    task = create_task(hold(scheduler, started, release, "active"))
+    await sleep(0)
+
+    with pytest.raises(SchedulerBusy, match="queueTimeout"):
+        async with scheduler.admit():
+            pass
+    assert scheduler.stats()["queued"] == 0
+
+    release.set()
+    await task
+    assert scheduler.stats()["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_gives_its_place_to_the_next():
+    scheduler = ClaimScheduler(maxActive=1)
+    started, release = [], Event()
+    tasks = [
+        create_task(hold(scheduler, started, release, name))
+        for name in ("active", "cancelled", "next")
+    ]
+    await sleep(0)
+
+    tasks[1].cancel()
+    release.set()
+    await tasks[0]
+    await tasks[2]
+
+    assert started == ["active", "next"]
+    assert scheduler.stats()["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_downstream_limit_caps_concurrent_calls():
+    scheduler = ClaimScheduler(limits={"xrpl": 1, "db": 0})
+    inside, peak = [0], [0]
+
+    async def call():
+        async with scheduler.limit("xrpl"):
+            inside[0] += 1
+            peak[0] = max(peak[0], inside[0])
+            await sleep(0)
+            inside[0] -= 1
+
+    for task in [create_task(call()) for _ in range(3)]:
+        await task
+
+    assert peak == [1]
+    assert "dbAvailable" not in scheduler.stats()
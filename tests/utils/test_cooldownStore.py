@@ -0,0 +1,90 @@
+from configparser import ConfigParser
+
+import pytest
+
+from utils import cooldownStore as cooldownStoreModule
+from utils.cooldownStore import (
+    CooldownBackend,
+    CooldownStore,
+    MemoryCooldownBackend,
+    SQLiteCooldownBackend,
+    createCooldownBackend,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cooldownStoreModule, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryCooldownBackend()
+    return SQLiteCooldownBackend(str(tmp_path / "cooldowns.sqlite3"))
+
+
+@pytest.mark.asyncio
+async def test_key_is_held_until_its_cooldown_ends(backend, clock):
+    assert await backend.acquire("claim:1", 10) == 0
+    clock[0] += 4
+
+    assert await backend.acquire("claim:1", 10) == 6
+    assert await backend.acquire("claim:2", 10) == 0
+
+    clock[0] += 6
+    assert await backend.acquire("claim:1", 10) == 0
+    await backend.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_cooldowns_are_shared_between_backends(tmp_path, clock):
+    path = str(tmp_path / "cooldowns.sqlite3")
+    first, second = SQLiteCooldownBackend(path), SQLiteCooldownBackend(path)
+
+    assert await first.acquire("claim:1", 10) == 0
+    assert await second.acquire("claim:1", 10) == 10
+
+    await first.close()
+    await second.close()
+
+
+@pytest.mark.asyncio
+async def test_full_memory_backend_drops_the_soonest_expiry(clock):
+    backend = MemoryCooldownBackend(maxEntries=2)
+    await backend.acquire("short", 5)
+    await backend.acquire("long", 50)
+
+    await backend.acquire("new", 10)
+
+    assert len(backend) == 2
+    assert await backend.acquire("short", 5) == 0
+    assert await backend.acquire("long", 50) == 50
+
+
+@pytest.mark.asyncio
+async def test_store_keys_cooldowns_by_command_and_user(clock):
+    store = CooldownStore(duration=10)
+
+    assert await store.hit("bonus-xrain", 1) == 0
+    assert await store.hit("bonus-xrain", 1) == 10
+    assert await store.hit("bonus-xrain", 2) == 0
+    assert await store.hit("xrain-amm-claim", 1) == 0
+
+
+def test_backends_must_implement_acquire():
+    class Incomplete(CooldownBackend):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_unknown_backend_is_refused():
+    config = ConfigParser()
+    config.read_dict({"BOT": {"cooldown_backend": "redis"}})
+
+    with pytest.raises(ValueError):
+        createCooldownBackend(config["BOT"])
@@ -0,0 +1,135 @@
+import pytest
+import pytest_asyncio
+
+from utils.coordinator import (
+    Coordinator,
+    CoordinatorClient,
+    CoordinatorCooldownBackend,
+    InFlightClaims,
+)
+
+
+ADDRESS = "rHotWallet"
+
+
+@pytest_asyncio.fixture
+async def coordinatorClient(tmp_path):
+    coordinator = Coordinator(str(tmp_path / "coordinator.sock"))
+    await coordinator.start()
+    client = CoordinatorClient(coordinator.socketPath)
+    yield client
+    await client.close()
+    await coordinator.close()
+
+
+def test_sequences_wait_for_the_first_ledger_read():
+    coordinator = Coordinator("unused.sock")
+
+    assert coordinator.nextSequence(ADDRESS) is None
+    assert coordinator.syncSequence(ADDRESS, 10, force=False) == 10
+    assert coordinator.nextSequence(ADDRESS) == 11
+
+
+def test_later_sync_does_not_reset_the_stream():
+    coordinator = Coordinator("unused.sock")
+    coordinator.syncSequence(ADDRESS, 10, force=False)
+
+    # A second worker read the ledger before the first payment validated
+    assert coordinator.syncSequence(ADDRESS, 10, force=False) == 11
+
+
+def test_forced_resync_only_moves_the_stream_forward():
+    coordinator = Coordinator("unused.sock")
+    coordinator.syncSequence(ADDRESS, 10, force=False)
+    for _ in range(4):
+        coordinator.nextSequence(ADDRESS)
+
+    # The ledger is behind the stream, its sequence is a gap to fill first
+    assert coordinator.syncSequence(ADDRESS, 12, force=True) == 12
+    assert coordinator.nextSequence(ADDRESS) == 15
+
+    assert coordinator.syncSequence(ADDRESS, 20, force=True) == 20
+    assert coordinator.nextSequence(ADDRESS) == 21
+
+
+@pytest.mark.asyncio
+async def test_released_sequence_is_handed_out_first():
+    coordinator = Coordinator("unused.sock")
+    coordinator.syncSequence(ADDRESS, 10, force=False)
+    coordinator.nextSequence(ADDRESS)
+
+    await coordinator.handle("seqRelease", {"address": ADDRESS, "sequence": 10})
+
+    assert coordinator.nextSequence(ADDRESS) == 10
+    assert coordinator.nextSequence(ADDRESS) == 12
+
+
+@pytest.mark.asyncio
+async def test_invalidated_stream_is_read_from_the_ledger_again():
+    coordinator = Coordinator("unused.sock")
+    coordinator.syncSequence(ADDRESS, 10, force=False)
+
+    await coordinator.handle("seqInvalidate", {"address": ADDRESS})
+
+    assert coordinator.nextSequence(ADDRESS) is None
+    assert coordinator.syncSequence(ADDRESS, 30, force=False) == 30
+
+
+def test_lease_is_held_until_it_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("utils.coordinator.monotonic", lambda: now[0])
+    coordinator = Coordinator("unused.sock")
+
+    assert coordinator.lease("traits:rHolder", "0", ttl=10)
+    assert not coordinator.lease("traits:rHolder", "1", ttl=10)
+
+    now[0] += 10
+    assert coordinator.lease("traits:rHolder", "1", ttl=10)
+
+
+@pytest.mark.asyncio
+async def test_workers_share_leases_and_cooldowns(coordinatorClient):
+    first = InFlightClaims(coordinatorClient)
+    second = InFlightClaims(coordinatorClient)
+    second.owner = "1"
+
+    assert await first.acquire("traits:rHolder")
+    assert not await second.acquire("traits:rHolder")
+
+    # Only the owner can lift its lease
+    await second.release("traits:rHolder")
+    assert not await second.acquire("traits:rHolder")
+    await first.release("traits:rHolder")
+    assert await second.acquire("traits:rHolder")
+
+    cooldowns = CoordinatorCooldownBackend(coordinatorClient)
+    assert await cooldowns.acquire("bonus-xrain:1", 10) == 0
+    assert await cooldowns.acquire("bonus-xrain:1", 10) > 0
+
+
+@pytest.mark.asyncio
+async def test_unknown_op_fails_only_its_request(coordinatorClient):
+    with pytest.raises(RuntimeError):
+        await coordinatorClient.request("unknown")
+
+    assert "leases" in await coordinatorClient.request("stats")
+
+
+def test_releases_are_read_once_from_the_last_id():
+    coordinator = Coordinator("unused.sock")
+    lastId, released = coordinator.releasedSince(None)
+    assert released == []
+
+    coordinator.releases.append((next(coordinator.releaseIds), "rHolder"))
+    lastId, released = coordinator.releasedSince(lastId)
+    assert released == ["rHolder"]
+    assert coordinator.releasedSince(lastId) == (lastId, [])
+
+
+def test_releases_dropped_from_the_log_ask_for_a_rebuild():
+    coordinator = Coordinator("unused.sock", maxReleases=2)
+    for xrpId in ("rFirst", "rSecond", "rThird"):
+        coordinator.releases.append((next(coordinator.releaseIds), xrpId))
+
+    assert coordinator.releasedSince(0) == (3, None)
+    assert coordinator.releasedSince(1) == (3, ["rSecond", "rThird"])
@@ -0,0 +1,51 @@
+import pytest
+
+from utils import ledgerTracker as ledgerTrackerModule
+from utils.ledgerTracker import LedgerTracker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ledgerTrackerModule, "monotonic", lambda: now[0])
+    return now
+
+
+def test_fields_are_unknown_until_the_stream_reports(clock):
+    tracker = LedgerTracker(None)
+
+    assert tracker.autofillFields() is None
+
+
+def test_last_ledger_is_offset_from_the_validated_ledger(clock):
+    tracker = LedgerTracker(None, ledgerOffset=20, feeCushion=1.0)
+    # The subscribe response, then a ledger closing
+    tracker.update({"ledger_index": 100, "fee_base": 10})
+    tracker.update({"ledger_index": 101})
+
+    assert tracker.autofillFields() == {"fee": "10", "last_ledger_sequence": 121}
+
+
+def test_fee_follows_the_server_load(clock):
+    tracker = LedgerTracker(None, feeCushion=1.2)
+    tracker.update({"ledger_index": 100, "base_fee": 10})
+    tracker.update({"load_factor": 512, "load_base": 256})
+
+    assert tracker.fee() == 24
+
+
+def test_fee_above_the_maximum_is_left_to_autofill(clock):
+    tracker = LedgerTracker(None, feeCushion=1.0, maxFee=100)
+    tracker.update({"ledger_index": 100, "fee_base": 10, "load_factor": 256 * 20})
+
+    assert tracker.fee() is None
+    assert tracker.autofillFields() is None
+
+
+def test_quiet_stream_is_no_longer_trusted(clock):
+    tracker = LedgerTracker(None, maxAge=15)
+    tracker.update({"ledger_index": 100, "fee_base": 10})
+
+    clock[0] += 15
+    assert not tracker.isFresh()
+    assert tracker.autofillFields() is None
@@ -0,0 +1,183 @@
+import pytest
+from xrpl.asyncio.clients import XRPLRequestFailureException
+from xrpl.models.response import Response, ResponseStatus
+from xrpl.models.transactions import Payment
+from xrpl.transaction import sign
+from xrpl.wallet import Wallet
+
+from utils import paymentEngine as paymentEngineModule
+from utils.paymentEngine import PaymentEngine, paymentRejected
+
+
+WALLET = Wallet.create()
+
+LAST_LEDGER = 100
+
+
+class FakeConnectionPool:
+    async def run(self, function, hedge=False):
+        return await function(None)
+
+
+class FakeSequenceAllocator:
+    def __init__(self) -> None:
+        self.released = []
+        self.resyncs = 0
+
+    def release(self, sequence: int) -> None:
+        self.released.append(sequence)
+
+    async def resync(self) -> None:
+        self.resyncs += 1
+
+    def invalidate(self) -> None:
+        pass
+
+
+def signedPayment(sequence: int = 10) -> Payment:
+    payment = Payment(
+        account=WALLET.classic_address,
+        destination=Wallet.create().classic_address,
+        amount="1000",
+        sequence=sequence,
+        fee="12",
+        last_ledger_sequence=LAST_LEDGER,
+    )
+    return sign(payment, WALLET)
+
+
+def paymentEngine(engineResult: str, polls: list) -> PaymentEngine:
+    # Submits answer engineResult, each validation poll answers the next
+    # (validated ledger, final result) of polls
+    engine = PaymentEngine(
+        WALLET,
+        FakeConnectionPool(),
+        pollInterval=0,
+        sequenceAllocator=FakeSequenceAllocator(),
+    )
+    polls = iter(polls)
+
+    async def submit(signedTx):
+        return engineResult
+
+    async def poll(signedTx, client):
+        return next(polls)
+
+    async def lookup(txHash, client=None):
+        raise AssertionError("tefPAST_SEQ must wait for validation")
+
+    engine._submit = submit
+    engine._poll = poll
+    engine._lookup = lookup
+    return engine
+
+
+@pytest.mark.asyncio
+async def test_past_seq_payment_that_applied_is_not_signed_again():
+    # Not in the first validated ledger yet, a lone lookup would miss it
+    engine = paymentEngine(
+        "tefPAST_SEQ", [(LAST_LEDGER - 2, None), (LAST_LEDGER - 1, "tesSUCCESS")]
+    )
+
+    result = await engine.settleSigned(signedPayment())
+
+    assert result["result"] is True
+    assert result["retry"] is False
+    assert engine.sequenceAllocator.resyncs == 0
+
+
+@pytest.mark.asyncio
+async def test_past_seq_payment_retried_once_past_last_ledger():
+    engine = paymentEngine(
+        "tefPAST_SEQ",
+        [(LAST_LEDGER - 1, None), (LAST_LEDGER, None), (LAST_LEDGER + 1, None)],
+    )
+
+    result = await engine.settleSigned(signedPayment())
+
+    assert result["result"] is False
+    assert result["retry"] is True
+    assert engine.sequenceAllocator.resyncs == 1
+
+
+@pytest.mark.asyncio
+async def test_rejected_payment_frees_its_sequence():
+    engine = paymentEngine("temBAD_AMOUNT", [])
+
+    result = await engine.settleSigned(signedPayment(sequence=42))
+
+    assert result["error"] == "temBAD_AMOUNT"
+    assert engine.sequenceAllocator.released == [42]
+    assert paymentRejected(result["error"])
+
+
+@pytest.mark.asyncio
+async def test_refusal_after_a_submit_timeout_is_not_signed_again(monkeypatch):
+    # The first submit may have reached the node, a later noCurrent says
+    # nothing about it
+    answers = iter(
+        [
+            TimeoutError("submit timed out"),
+            Response(status=ResponseStatus.ERROR, result={"error": "noCurrent"}),
+            Response(status=ResponseStatus.ERROR, result={"error": "noCurrent"}),
+        ]
+    )
+
+    async def submit(signedTx, client):
+        answer = next(answers)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    monkeypatch.setattr(paymentEngineModule, "submit", submit)
+    engine = PaymentEngine(
+        WALLET,
+        FakeConnectionPool(),
+        retryDelay=0,
+        sequenceAllocator=FakeSequenceAllocator(),
+    )
+
+    result = await engine.settleSigned(signedPayment(sequence=42))
+
+    assert result["result"] is False
+    assert result["retry"] is False
+    assert not paymentRejected(result["error"])
+    assert engine.sequenceAllocator.released == []
+
+
+@pytest.mark.asyncio
+async def test_busy_node_while_polling_keeps_polling_the_same_hash():
+    engine = paymentEngine("tesSUCCESS", [])
+    answers = iter(
+        [
+            XRPLRequestFailureException({"error": "noCurrent"}),
+            (LAST_LEDGER - 1, "tesSUCCESS"),
+        ]
+    )
+
+    async def poll(signedTx, client):
+        answer = next(answers)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    engine._poll = poll
+
+    result = await engine.settleSigned(signedPayment())
+
+    assert result["result"] is True
+    assert result["retry"] is False
+
+
+@pytest.mark.asyncio
+async def test_node_refusal_frees_its_sequence():
+    engine = paymentEngine("noCurrent", [])
+
+    result = await engine.settleSigned(signedPayment(sequence=42))
+
+    assert result["retry"] is True
+    assert engine.sequenceAllocator.released == [42]
+
+
+def test_connection_timeout_is_not_a_rejection():
+    assert not paymentRejected("Connection timeout after 3 retries")
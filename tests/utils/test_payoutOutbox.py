@@ -0,0 +1,128 @@
+import pytest
+import pytest_asyncio
+from xrpl.models.transactions import Payment
+from xrpl.transaction import sign
+from xrpl.wallet import Wallet
+
+from utils.payoutOutbox import PayoutOutbox, SettlementWorkers
+
+
+WALLET = Wallet.create()
+DESTINATION = Wallet.create().classic_address
+
+
+class FakePaymentEngine:
+    # Answers settleSigned with result and records the blobs it was handed
+    def __init__(self, result: dict) -> None:
+        self.result = result
+        self.settled = []
+
+    async def settleSigned(self, signedTx):
+        self.settled.append(signedTx.get_hash())
+        return dict(self.result)
+
+    async def sendPayment(self, transaction, onSigned=None):
+        raise AssertionError("a signed payout must not be signed again")
+
+
+class FakeXRPClient:
+    def __init__(self, result: dict) -> None:
+        self.paymentEngine = FakePaymentEngine(result)
+
+    def invalidateBalance(self, xrpId, token) -> None:
+        pass
+
+
+@pytest_asyncio.fixture
+async def outbox(tmp_path):
+    outbox = PayoutOutbox(str(tmp_path / "payouts.sqlite3"))
+    yield outbox
+    await outbox.close()
+
+
+async def signedPayout(outbox) -> tuple[dict, str]:
+    # A payout that was signed before the process died, as a restart finds it
+    payoutId = await outbox.enqueue(
+        {
+            "payoutKey": f"traits:{DESTINATION}:None",
+            "xrpId": DESTINATION,
+            "rewardType": "traits",
+            "amount": 1.0,
+            "coinHex": "XRP",
+        }
+    )
+    signedTx = sign(
+        Payment(
+            account=WALLET.classic_address,
+            destination=DESTINATION,
+            amount="1000000",
+            sequence=7,
+            fee="12",
+            last_ledger_sequence=100,
+        ),
+        WALLET,
+    )
+    await outbox.markSigned(payoutId, signedTx)
+
+    payouts = await outbox.nextBatch(1)
+    return payouts[0], signedTx.get_hash()
+
+
+def settlementWorkers(outbox, result: dict, settled: list) -> SettlementWorkers:
+    async def onSettled(payout, result):
+        settled.append((payout["payoutId"], result["result"]))
+
+    return SettlementWorkers(outbox, FakeXRPClient(result), onSettled=onSettled)
+
+
+@pytest.mark.asyncio
+async def test_signed_payout_resumes_with_its_stored_blob(outbox):
+    payout, txHash = await signedPayout(outbox)
+    settled = []
+    workers = settlementWorkers(
+        outbox, {"result": True, "error": None, "hash": txHash, "retry": False}, settled
+    )
+
+    await workers.settle(payout)
+
+    assert workers.xrplClient.paymentEngine.settled == [txHash]
+    assert await outbox.counts() == {"settled": 1}
+    assert settled == [(payout["payoutId"], True)]
+
+
+@pytest.mark.asyncio
+async def test_signed_payout_with_unknown_outcome_stays_signed(outbox):
+    payout, txHash = await signedPayout(outbox)
+    settled = []
+    workers = settlementWorkers(
+        outbox,
+        {
+            "result": False,
+            "error": "Connection timeout after 3 retries",
+            "hash": txHash,
+            "retry": False,
+        },
+        settled,
+    )
+
+    await workers.settle(payout)
+
+    assert await outbox.counts() == {"signed": 1}
+    assert (await outbox.nextBatch(1))[0]["attempts"] == 1
+    assert settled == []
+
+
+@pytest.mark.asyncio
+async def test_expired_signed_payout_goes_back_to_pending(outbox):
+    payout, txHash = await signedPayout(outbox)
+    settled = []
+    workers = settlementWorkers(
+        outbox, {"result": False, "error": None, "hash": txHash, "retry": True}, settled
+    )
+
+    await workers.settle(payout)
+
+    pending = (await outbox.nextBatch(1))[0]
+    assert pending["state"] == "pending"
+    assert pending["txBlob"] is None
+    assert settled == []
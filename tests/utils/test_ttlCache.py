@@ -0,0 +1,69 @@
+import pytest
+
+from utils import ttlCache as ttlCacheModule
+from utils.ttlCache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ttlCacheModule, "monotonic", lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = TTLCache(ttl=10)
+    cache.set("key", "value")
+
+    clock[0] += 9
+    assert cache.get("key") == "value"
+
+    clock[0] += 1
+    assert cache.get("key", "missing") == "missing"
+    assert "key" not in cache
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_dropped_when_full(clock):
+    cache = TTLCache(maxSize=2)
+    cache.set("first", 1)
+    cache.set("second", 2)
+    cache.get("first")
+
+    cache.set("third", 3)
+
+    assert "first" in cache
+    assert "second" not in cache
+    assert "third" in cache
+
+
+def test_peek_leaves_order_and_counters_alone(clock):
+    cache = TTLCache(maxSize=2)
+    cache.set("first", 1)
+    cache.set("second", 2)
+
+    assert cache.peek("first") == 1
+    cache.set("third", 3)
+
+    assert "first" not in cache
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_hits_and_misses_are_counted(clock):
+    cache = TTLCache()
+    cache.set("key", None)
+
+    assert cache.get("key", "missing") is None
+    assert cache.get("other") is None
+
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_invalidate_drops_an_entry(clock):
+    cache = TTLCache()
+    cache.set("key", 1)
+
+    cache.invalidate("key")
+    cache.invalidate("never set")
+
+    assert cache.get("key") is None
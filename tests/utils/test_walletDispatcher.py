@@ -0,0 +1,131 @@
+import pytest
+from xrpl.models.transactions import Payment
+from xrpl.transaction import sign
+from xrpl.wallet import Wallet
+
+from utils.walletDispatcher import WalletDispatcher
+
+
+XRAIN = "585241494E000000000000000000000000000000"
+ISSUER = Wallet.create().classic_address
+DESTINATION = Wallet.create().classic_address
+
+
+class FakeEngine:
+    def __init__(self, result: dict) -> None:
+        self.wallet = Wallet.create()
+        self.result = result
+        self.sent = []
+
+    async def sendPayment(self, transaction, onSigned=None):
+        self.sent.append(transaction)
+        return dict(self.result)
+
+
+def walletDispatcher(count=2, result=None, **kwargs) -> WalletDispatcher:
+    result = result or {"result": True, "error": None, "hash": None}
+    dispatcher = WalletDispatcher(
+        [FakeEngine(result) for _ in range(count)], None, **kwargs
+    )
+    for wallet in dispatcher.wallets:
+        wallet.xrpBalance = 100.0
+        wallet.balances = {XRAIN: 1000.0}
+    return dispatcher
+
+
+def payment(value: str = "10", destination: str = DESTINATION) -> Payment:
+    # An issued currency amount as buildPayment passes it
+    return Payment(
+        account=ISSUER,
+        destination=destination,
+        amount={"currency": XRAIN, "issuer": ISSUER, "value": value},
+    )
+
+
+@pytest.mark.asyncio
+async def test_payment_goes_out_from_the_picked_wallet_and_is_debited():
+    dispatcher = walletDispatcher(count=1)
+    wallet = dispatcher.wallets[0]
+
+    result = await dispatcher.sendPayment(payment("10"))
+
+    assert result["result"] is True
+    assert wallet.engine.sent[0].account == wallet.address
+    assert wallet.balance(XRAIN) == 990.0
+
+
+@pytest.mark.asyncio
+async def test_failed_payment_gives_the_debit_back():
+    dispatcher = walletDispatcher(
+        count=1, result={"result": False, "error": "tecPATH_DRY", "hash": None}
+    )
+
+    await dispatcher.sendPayment(payment("10"))
+
+    assert dispatcher.wallets[0].balance(XRAIN) == 1000.0
+
+
+def test_least_in_flight_wallet_is_picked():
+    dispatcher = walletDispatcher()
+    busy, idle = dispatcher.wallets
+    busy.inFlight = 3
+
+    for _ in range(4):
+        assert dispatcher.pick(DESTINATION, XRAIN, 1.0) is idle
+
+
+def test_wallet_below_the_minimum_balance_leaves_the_rotation():
+    dispatcher = walletDispatcher(minBalance=100.0)
+    short, funded = dispatcher.wallets
+    short.balances[XRAIN] = 105.0
+
+    for _ in range(4):
+        assert dispatcher.pick(DESTINATION, XRAIN, 10.0) is funded
+
+
+def test_wallet_low_on_xrp_pays_nothing():
+    dispatcher = walletDispatcher(minXrp=20.0)
+    low, funded = dispatcher.wallets
+    low.xrpBalance = 19.0
+
+    for _ in range(4):
+        assert dispatcher.pick(DESTINATION, XRAIN, 1.0) is funded
+
+
+@pytest.mark.asyncio
+async def test_no_wallet_able_to_pay_is_reported():
+    dispatcher = walletDispatcher(minBalance=100.0)
+
+    result = await dispatcher.sendPayment(payment("950"))
+
+    assert result["error"] == "NoHotWalletAvailable"
+    assert all(wallet.balance(XRAIN) == 1000.0 for wallet in dispatcher.wallets)
+
+
+def test_hash_strategy_keeps_a_destination_on_one_wallet():
+    dispatcher = walletDispatcher(count=4, strategy="hash")
+
+    picks = {dispatcher.pick(DESTINATION, XRAIN, 1.0) for _ in range(8)}
+
+    assert len(picks) == 1
+
+
+@pytest.mark.asyncio
+async def test_signed_payment_from_an_unknown_wallet_is_not_settled():
+    dispatcher = walletDispatcher()
+    stranger = Wallet.create()
+    signed = sign(
+        Payment(
+            account=stranger.classic_address,
+            destination=DESTINATION,
+            amount="1000",
+            sequence=1,
+            fee="12",
+        ),
+        stranger,
+    )
+
+    result = await dispatcher.settleSigned(signed)
+
+    assert result["error"] == "UnknownHotWallet"
+    assert result["retry"] is False
@@ -0,0 +1,52 @@
+import pytest
+from xrpl.models.response import Response, ResponseStatus
+
+from utils.config import xrplConfig
+from utils.xrplCommands import XRPClient
+
+
+XRAIN = "585241494E000000000000000000000000000000"
+ISSUER = "rh3tLHbXwZsp7eciw2Qp8g7bN9RnyGa2pF"
+
+
+def trustlines(*lines):
+    return Response(
+        status=ResponseStatus.SUCCESS,
+        result={
+            "lines": [
+                {"account": account, "currency": XRAIN, "balance": balance}
+                for account, balance in lines
+            ]
+        },
+    )
+
+
+def xrplClient(response) -> XRPClient:
+    client = XRPClient(xrplConfig)
+
+    async def request(request, hedge=False):
+        return response
+
+    client.request = request
+    return client
+
+
+@pytest.mark.asyncio
+async def test_trustline_balance_only_counts_the_issuer():
+    client = xrplClient(trustlines(("rImpostor", "5000"), (ISSUER, "12.5")))
+
+    assert await client.getTrustlineBalance("rHolder", XRAIN, ISSUER) == 12.5
+
+
+@pytest.mark.asyncio
+async def test_same_currency_from_another_issuer_is_no_balance():
+    client = xrplClient(trustlines(("rImpostor", "5000")))
+
+    assert await client.getTrustlineBalance("rHolder", XRAIN, ISSUER) is False
+
+
+@pytest.mark.asyncio
+async def test_balance_without_a_configured_issuer_is_unavailable():
+    client = xrplClient(trustlines((ISSUER, "12.5")))
+
+    assert await client.getAccountBalance("rHolder", XRAIN, None) is False
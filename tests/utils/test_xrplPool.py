@@ -0,0 +1,117 @@
+from asyncio import sleep
+
+import pytest
+from xrpl.models.response import Response, ResponseStatus
+
+from utils.xrplPool import XRPLConnectionPool
+
+
+PRIMARY = "wss://primary.invalid/"
+BACKUP = "wss://backup.invalid/"
+
+
+class FakeClient:
+    def __init__(self, url: str) -> None:
+        self.url = url
+
+    def is_open(self) -> bool:
+        return True
+
+    async def close(self) -> None:
+        pass
+
+
+def connectionPool(**kwargs) -> XRPLConnectionPool:
+    # Endpoints are never dialled, each slot holds a client that knows its url
+    pool = XRPLConnectionPool([PRIMARY, BACKUP], size=1, **kwargs)
+
+    async def ensureOpen(endpoint, slot):
+        return FakeClient(endpoint.url)
+
+    pool._ensureOpen = ensureOpen
+    return pool
+
+
+def answers(responses: dict):
+    # An operation answering per endpoint, exceptions are raised
+    async def operation(client):
+        answer = responses[client.url]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    return operation
+
+
+def response(**result) -> Response:
+    status = ResponseStatus.ERROR if "error" in result else ResponseStatus.SUCCESS
+    return Response(status=status, result=result)
+
+
+@pytest.mark.asyncio
+async def test_connection_error_fails_over_to_the_next_endpoint():
+    pool = connectionPool()
+
+    result = await pool.run(answers({PRIMARY: ConnectionError(), BACKUP: "backup"}))
+
+    assert result == "backup"
+    assert pool.endpoints[0].failures == 1
+    assert pool.ranked()[0].url == BACKUP
+
+
+@pytest.mark.asyncio
+async def test_busy_node_fails_over_to_the_next_endpoint():
+    pool = connectionPool()
+
+    result = await pool.run(
+        answers({PRIMARY: response(error="noCurrent"), BACKUP: response(ok=True)})
+    )
+
+    assert result.result == {"ok": True}
+
+
+@pytest.mark.asyncio
+async def test_every_node_busy_hands_back_the_node_answer():
+    pool = connectionPool()
+
+    result = await pool.run(
+        answers(
+            {PRIMARY: response(error="noCurrent"), BACKUP: response(error="tooBusy")}
+        )
+    )
+
+    assert result.result["error"] == "tooBusy"
+
+
+@pytest.mark.asyncio
+async def test_every_endpoint_down_raises_the_last_error():
+    pool = connectionPool()
+
+    with pytest.raises(TimeoutError):
+        await pool.run(answers({PRIMARY: ConnectionError(), BACKUP: TimeoutError()}))
+
+
+@pytest.mark.asyncio
+async def test_slow_hedged_read_is_answered_by_the_backup():
+    pool = connectionPool(hedgeDelay=0.01)
+
+    async def operation(client):
+        if client.url == PRIMARY:
+            await sleep(1)
+        return client.url
+
+    assert await pool.run(operation, hedge=True) == BACKUP
+
+
+@pytest.mark.asyncio
+async def test_failing_endpoint_is_benched_behind_the_others():
+    pool = connectionPool()
+    primary = pool.endpoints[0]
+    for _ in range(primary.maxFailures):
+        primary.recordError()
+
+    assert primary.isDown()
+    assert [endpoint.url for endpoint in pool.ranked()] == [BACKUP, PRIMARY]
+
+    primary.recordSuccess(0.01)
+    assert not primary.isDown()